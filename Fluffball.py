@@ -8,21 +8,53 @@ idea: A game for up to 4 players with fluffy balls, donuts, cookies and cats
 """
 
 import pygame
-import random
 import os
 import time
 import math
+import asyncio
+import multiprocessing
+import collections
+import bisect
+import itertools
+import struct
+import fluffnet
+import pacing
+import surfaces
+import camera
+import timers
+import randomness
+import memtrack
+import assets
+import sfx
+import telemetry
+import profiles
+import shmframes
+import roundstats
+import profiler
+try:
+    import numpy
+except ImportError:
+    numpy = None    # Fluffball against Fluffball one pair at a time then
 
 def randomize_color(color, delta=50):
-    d=random.randint(-delta, delta)
+    d=Game.rng.effects.randint(-delta, delta)
     color = color + d
     color = min(255,color)
     color = max(0, color)
     return color
 
+fonts = {}  # { (name, size, bold): font }, pygame.font.SysFont is slow
+
+def get_font(name, size, bold=False):
+    """returns a SysFont, every font is only made once"""
+    key = (name, size, bold)
+    if key not in fonts:
+        fonts[key] = pygame.font.SysFont(name, size, bold=bold)
+    return fonts[key]
+
 def make_text(msg="pygame is cool", fontcolor=(255, 0, 255), fontsize=42, font=None):
     """returns pygame surface with text. You still need to blit the surface."""
-    myfont = pygame.font.SysFont(font, fontsize)
+    myfont = get_font(font, fontsize)
     mytext = myfont.render(msg, True, fontcolor)
     mytext = mytext.convert_alpha()
     return mytext
@@ -32,7 +64,7 @@ def write(background, text, x=50, y=150, color=(0,0,0),
         """write text on pygame surface. """
         if fontsize is None:
             fontsize = 24
-        font = pygame.font.SysFont('mono', fontsize, bold=True)
+        font = get_font('mono', fontsize, bold=True)
         fw, fh = font.size(text)
         surface = font.render(text, True, color)
         if center: # center text around x,y
@@ -44,6 +76,72 @@ def distance(point_1=(0, 0), point_2=(0, 0)):
     """Returns the distance between two points"""
     return math.sqrt((point_1[0] - point_2[0]) ** 2 + (point_1[1] - point_2[1]) ** 2)
 
+def mask_radius(mask):
+    """radius of a disc with the area of mask (the pixels that collide)"""
+    return math.sqrt(mask.count() / math.pi)
+
+def time_of_impact(pos1, step1, pos2, step2, radius):
+    """two discs start at pos1 and pos2 and move by step1 and step2 (the
+       whole way of this frame, not per second). returns the part of the
+       frame (0..1) after which they are radius (both radii) apart, or None
+       if they do not meet in this frame or are touching from the start"""
+    dx = pos1.x - pos2.x
+    dy = pos1.y - pos2.y
+    vx = step1.x - step2.x
+    vy = step1.y - step2.y
+    c = dx * dx + dy * dy - radius * radius
+    b = dx * vx + dy * vy
+    if c <= 0 or b >= 0:
+        return None     # touching already, or moving apart
+    a = vx * vx + vy * vy
+    discriminant = b * b - a * c
+    if discriminant < 0:
+        return None     # passing by
+    t = (-b - math.sqrt(discriminant)) / a
+    return t if t <= 1 else None
+
+# ---- many Fluffballs at once (numpy): which pairs are worth a closer look ----
+def overlapping_rects(rects):
+    """rects: (n, 4) array of left, top, right, bottom. returns a (n, n)
+       bool array, True where two rects overlap like Rect.colliderect.
+       masks can only overlap where their rects do"""
+    left, top, right, bottom = rects.T
+    overlap = ((left[:, None] < right[None, :]) & (left[None, :] < right[:, None]) &
+               (top[:, None] < bottom[None, :]) & (top[None, :] < bottom[:, None]))
+    numpy.fill_diagonal(overlap, False)
+    return overlap
+
+def impact_pairs(pos, step, radius):
+    """time_of_impact for every pair of discs: they start at pos and move
+       by step. returns i, j, t (i < j) of the pairs that meet in this frame"""
+    d = pos[:, None, :] - pos[None, :, :]
+    v = step[:, None, :] - step[None, :, :]
+    reach = radius[:, None] + radius[None, :]
+    c = (d * d).sum(axis=2) - reach * reach
+    b = (d * v).sum(axis=2)
+    a = (v * v).sum(axis=2)
+    discriminant = b * b - a * c
+    i, j = numpy.nonzero(numpy.triu((c > 0) & (b < 0) & (discriminant >= 0), 1))
+    t = (-b[i, j] - numpy.sqrt(discriminant[i, j])) / a[i, j]
+    near = t <= 1
+    return i[near], j[near], t[near]
+
+def fluff_pairs(fluffs):
+    """for every Fluffball in fluffs the indices (in the order of fluffs)
+       of the others that may touch it (overlapping rects) and of the ones
+       it may have gone through in this step (impact_pairs). the same
+       tests as Viewer.fluff_phase without numpy decide on these only"""
+    rects = numpy.array([(f.rect.left, f.rect.top, f.rect.right, f.rect.bottom) for f in fluffs])
+    pos = numpy.array([(f.pos.x, f.pos.y) for f in fluffs])
+    last = numpy.array([(f.last_pos.x, f.last_pos.y) for f in fluffs])
+    radius = numpy.array([f.radius for f in fluffs])
+    overlap = overlapping_rects(rects)
+    passing = numpy.zeros_like(overlap)
+    i, j, _ = impact_pairs(last, pos - last, radius)
+    passing[i, j] = passing[j, i] = True
+    return ([numpy.nonzero(row)[0].tolist() for row in overlap],
+            [numpy.nonzero(row)[0].tolist() for row in passing])
+
 def elastic_collision(sprite1, sprite2):
         """elasitc collision between 2 VectorSprites (calculated as disc's).
            The function alters the dx and dy movement vectors of both sprites.
@@ -62,8 +160,8 @@ def elastic_collision(sprite1, sprite2):
         cbdys = sprite1.move.y - sy
         distancesquare = dirx * dirx + diry * diry
         if distancesquare == 0:
-            dirx = random.randint(0,11) - 5.5
-            diry = random.randint(0,11) - 5.5
+            dirx = Game.rng.physics.randint(0,11) - 5.5
+            diry = Game.rng.physics.randint(0,11) - 5.5
             distancesquare = dirx * dirx + diry * diry
         dp = (bdxs * dirx + bdys * diry) # scalar product
         dp /= distancesquare # divide by distance * distance.
@@ -80,24 +178,61 @@ def elastic_collision(sprite1, sprite2):
 class Game():
     difficulty = 1
     players = 1
+    quality = 1.0         # effects: 1.0 = all particles, less when the computer is too slow
+    quality_auto = True   # QualityGovernor may change quality
+    rotation_step = 1     # rotated images are rounded to this many degrees
+    static_layer = True   # draw car wheels and food from a prebuilt StaticLayer
+    debug_surfaces = False  # warn about sprite images that are blitted the slow way
+    kitty_lod = True      # kitties far away from all Fluffballs move their paws less often
+    kitty_near = 200      # pixels, nearer kitties are updated in every frame
+    kitty_budget = 8      # far kitties per frame, round-robin
+    world_size = 1        # the playfield is world_size x world_size screens
+    split_screen = False  # one camera for every Fluffball instead of one for all
+    throttle_far = False  # sprites far away from all cameras move only every throttle_every frames
+    throttle_every = 8
+    sound_buffer = 512    # mixer buffer in samples: smaller is faster, but may crackle
+    sound_channels = 8    # sound effects at the same time, see sfx.py
+    swept = True          # collisions of fast Fluffballs along the whole way of a frame, not only where it ends
+    batch_fluffs = True   # numpy picks the Fluffball pairs that collide_mask has to test (if numpy is there)
+    bots = True           # Fluffballs without keys or joystick look for food on their own
+    keyboards = None      # key sets in use (0 ... 4), None: one for every player without a joystick
+    push = 300            # pixels per second per second of a pressed key or a full stick (10 per frame at 30 fps)
+    rng = randomness.RandomService()   # every random number of the world, one stream per subsystem
     
 class Flytext(pygame.sprite.Sprite):
     def __init__(self, x, y, text="hallo", color=(255, 0, 0),
-                 dx=0, dy=-50, duration=2, acceleration_factor = 1.0, delay = 0, fontsize=22):
-        """a text flying upward and for a short time and disappearing"""
+                 dx=0, dy=-50, duration=2, acceleration_factor = 1.0, delay = 0, fontsize=22, fixed=False):
+        """a text flying upward and for a short time and disappearing.
+           fixed: x, y are screen pixels (messages), not world pixels"""
         self._layer = 7  # order of sprite layers (before / behind other sprites)
         pygame.sprite.Sprite.__init__(self, self.groups)  # THIS LINE IS IMPORTANT !!
         self.text = text
+        self.fixed = fixed
         self.r, self.g, self.b = color[0], color[1], color[2]
         self.dx = dx
         self.dy = dy
         self.x, self.y = x, y
         self.duration = duration  # duration of flight in seconds
         self.acc = acceleration_factor  # if < 1, Text moves slower. if > 1, text moves faster.
+        self.fontsize = fontsize
         self.image = make_text(self.text, (self.r, self.g, self.b), fontsize)  # font 22
         self.rect = self.image.get_rect()
         self.rect.center = (self.x, self.y)
         self.time = 0 - delay
+        self.expiry = None
+        self.schedule_expiry()
+
+    def schedule_expiry(self):
+        """kill after duration (also after loading, when time was set).
+           a timer of Flytext.scheduler, the clock of the texts: it also
+           runs in the menu, where the world stands still"""
+        self.scheduler.cancel(self.expiry)
+        self.expiry = self.scheduler.after(self.duration - self.time, self.kill)
+
+    def kill(self):
+        self.scheduler.cancel(self.expiry)
+        self.expiry = None
+        pygame.sprite.Sprite.kill(self)   # remove Sprite from screen and from groups
 
     def update(self, seconds):
         self.time += seconds
@@ -109,8 +244,6 @@ class Flytext(pygame.sprite.Sprite):
             self.dy *= self.acc  # slower and slower
             self.dx *= self.acc
             self.rect.center = (self.x, self.y)
-            if self.time > self.duration:
-                self.kill()      # remove Sprite from screen and from groups
                 
 
 class VectorSprite(pygame.sprite.Sprite):
@@ -130,6 +263,9 @@ class VectorSprite(pygame.sprite.Sprite):
         self.rect.center = (int(self.pos.x), -int(self.pos.y))
         if self.angle != 0:
             self.set_angle(self.angle)
+        self.expiry = None
+        self.schedule_expiry()
+        self.updated = None   # world time of the last update while it sleeps, see Viewer.update_throttled and kitty_far
         self.start()
         
     def start(self):
@@ -152,7 +288,7 @@ class VectorSprite(pygame.sprite.Sprite):
         if "static" not in kwargs:
             self.static = False
         if "pos" not in kwargs:
-            self.pos = pygame.math.Vector2(random.randint(0, Viewer.width),-50)
+            self.pos = pygame.math.Vector2(Game.rng.sprites.randint(0, Viewer.world_width),-50)
         if "move" not in kwargs:
             self.move = pygame.math.Vector2(0,0)
         if "radius" not in kwargs:
@@ -162,7 +298,8 @@ class VectorSprite(pygame.sprite.Sprite):
         if "height" not in kwargs:
             self.height = self.radius * 2
         if "color" not in kwargs:       #self.color = None
-            self.color = (random.randint(0,255), random.randint(0,255), random.randint(0,255))
+            rnd = Game.rng.sprites
+            self.color = (rnd.randint(0,255), rnd.randint(0,255), rnd.randint(0,255))
         if "hitpoints" not in kwargs:
             self.hitpoints = 100
         self.hitpointsfull = self.hitpoints # makes a copy
@@ -207,31 +344,55 @@ class VectorSprite(pygame.sprite.Sprite):
         if "dangerhigh" not in kwargs:
             self.dangerhigh = False
         if "fluffball_color" not in kwargs:
-            self.fluffball_color = random.choice(["fluffballb.", "fluffballp.", "fluffballt.", "fluffballr."])
+            self.fluffball_color = Game.rng.sprites.choice(["fluffballb.", "fluffballp.", "fluffballt.", "fluffballr."])
 
     def kill(self):
         if self.number in self.numbers:
            del VectorSprite.numbers[self.number] # remove Sprite from numbers dict
+        if getattr(self, "expiry", None) is not None:
+            self.scheduler.cancel(self.expiry)
+            self.expiry = None
         pygame.sprite.Sprite.kill(self)
 
+    def schedule_expiry(self):
+        """kill at max_age. a timer of the scheduler, so nobody has
+           to compare age and max_age in every frame"""
+        self.scheduler.cancel(self.expiry)
+        self.expiry = None
+        if self.max_age is not None:
+            self.expiry = self.scheduler.after(self.max_age - self.age, self.kill)
+
     def create_image(self):
         if self.picture is not None:
             self.image = self.picture.copy()
         else:
             self.image = pygame.Surface((self.width,self.height))
             self.image.fill((self.color))
-        self.image = self.image.convert_alpha()
+        self.image = surfaces.prepare(self.image)
         self.image0 = self.image.copy()
         self.rect= self.image.get_rect()
         self.width = self.rect.width
         self.height = self.rect.height
 
+    rotated = {}   # { (imagename, angle): rotated image }, for sprites with an imagename
+
+    def rotated_image(self):
+        """self.image0 rotated by self.angle, rounded to Game.rotation_step.
+           sprites that share a picture (self.imagename) share the rotations"""
+        step = Game.rotation_step
+        angle = round(self.angle / step) * step
+        if getattr(self, "imagename", None) is None:
+            return surfaces.prepare(pygame.transform.rotate(self.image0, angle if step > 1 else self.angle))
+        key = (self.imagename, angle % 360)
+        if key not in VectorSprite.rotated:
+            VectorSprite.rotated[key] = surfaces.prepare(pygame.transform.rotate(self.image0, angle))
+        return VectorSprite.rotated[key]
+
     def rotate(self, by_degree):
         """rotates a sprite and changes it's angle by by_degree"""
         self.angle += by_degree
         oldcenter = self.rect.center
-        self.image = pygame.transform.rotate(self.image0, self.angle)
-        self.image.convert_alpha()
+        self.image = self.rotated_image()
         self.rect = self.image.get_rect()
         self.rect.center = oldcenter
 
@@ -239,22 +400,33 @@ class VectorSprite(pygame.sprite.Sprite):
         """rotates a sprite and changes it's angle to degree"""
         self.angle = degree
         oldcenter = self.rect.center
-        self.image = pygame.transform.rotate(self.image0, self.angle)
-        self.image.convert_alpha()
+        self.image = self.rotated_image()
         self.rect = self.image.get_rect()
         self.rect.center = oldcenter
         
     def ai(self):
         pass
 
+    def resting(self):
+        """True if update would only count the age. a resting sleeper is
+           not updated at all (see Viewer.sort_sleepers), whatever moves it
+           calls catch_up first"""
+        return False
+
+    def catch_up(self):
+        """a sleeper gets the time it slept, before its movement changes"""
+        if self.updated is not None:
+            now = self.scheduler.now
+            if now > self.updated:
+                self.update(now - self.updated)
+            self.updated = now
+
     def update(self, seconds):
         """calculate movement, position and bouncing on edge"""
         self.ai()
         # ----- kill because... ------
         if self.hitpoints <= 0:
             self.kill()
-        if self.max_age is not None and self.age > self.max_age:
-            self.kill()
         if self.max_distance is not None and self.distance_traveled > self.max_distance:
             self.kill()
         # ---- movement with/without boss ----
@@ -282,7 +454,7 @@ class VectorSprite(pygame.sprite.Sprite):
                 self.pos.x = 0
                 self.move.x *= -1
             elif self.warp_on_edge:
-                self.pos.x = Viewer.width 
+                self.pos.x = Viewer.world_width 
         # -------- upper edge -----
         if self.pos.y  > 0:
             if self.kill_on_edge:
@@ -291,13 +463,13 @@ class VectorSprite(pygame.sprite.Sprite):
                 self.pos.y = 0
                 self.move.y *= -1
             elif self.warp_on_edge:
-                self.pos.y = -Viewer.height
+                self.pos.y = -Viewer.world_height
         # -------- right edge -----                
-        if self.pos.x  > Viewer.width:
+        if self.pos.x  > Viewer.world_width:
             if self.kill_on_edge:
                 self.kill()
             elif self.bounce_on_edge:
-                self.pos.x = Viewer.width
+                self.pos.x = Viewer.world_width
                 self.move.x *= -1
             elif self.warp_on_edge:
                 self.pos.x = 0
@@ -305,7 +477,7 @@ class VectorSprite(pygame.sprite.Sprite):
         if self.dangerhigh:
             y = self.dangerhigh
         else:
-            y = Viewer.height
+            y = Viewer.world_height
         if self.pos.y   < -y:
             if self.kill_on_edge:
                 self.hitpoints = 0
@@ -322,7 +494,11 @@ class Fluffball(VectorSprite):
         self._layer = 2
         self.reifendamage = 0
         
+    def start(self):
+        self.last_pos = pygame.math.Vector2(self.pos)   # where the last step began, see Viewer.sweep
+        
     def update(self, seconds):
+        self.last_pos.update(self.pos)
         VectorSprite.update(self, seconds)
         if self.reifendamage > 0:
             self.reifendamage -= 5
@@ -332,10 +508,21 @@ class Fluffball(VectorSprite):
         self.image = Viewer.images[self.fluffball_color]
         self.image0 = self.image.copy()
         self.rect = self.image.get_rect()
+        self.radius = mask_radius(pygame.mask.from_surface(self.image))
 
 class Kitty(VectorSprite):
+    # per frame chances of the old Kitty.update (at 30 fps) as events per second,
+    # the scheduler draws the waiting time once instead of rolling in every frame
+    sleep_rate = timers.rate(0.0007)
+    glow_rate = timers.rate(0.001)
+    grid = None   # camera.SpatialGrid of the far kitties, see Viewer.kitty_phase
     
     def _overwrite_parameters(self):
+        self.timers = {}   # { name: Timer }
+        self.paws = []
+        self.near = True   # near a Fluffball, see Viewer.kitty_phase
+        self.spot = None   # (rect.center, sleep) where the paws of a far kitty are
+        self.gridpoint = None
         Paw(bossnumber = self.number, side="right",sticky_with_boss=True)
         Paw(bossnumber = self.number, side="left",sticky_with_boss=True)
         self.chance_to_flap = 0.005
@@ -350,14 +537,87 @@ class Kitty(VectorSprite):
         self.glow2_time = 0
         self.i = 0
         
-    def start_glowing(self):
-        self.glow = True
-        self.glow_time = self.age + 0.25
+    def start(self):
+        self.schedule()
+        
+    @property
+    def chance_to_flap(self):
+        return self._chance_to_flap
+        
+    @chance_to_flap.setter
+    def chance_to_flap(self, chance):
+        # the paws change it while the kitty plays, then sitting ends sooner
+        changed = chance != getattr(self, "_chance_to_flap", None)
+        self._chance_to_flap = chance
+        if changed and "state" in self.timers and self.state == "sit":
+            self.schedule_state()
+        
+    def set_timer(self, name, timer):
+        self.scheduler.cancel(self.timers.pop(name, None))
+        if timer is not None:
+            self.timers[name] = timer
+        
+    def schedule(self):
+        """draws the times of the next state changes (also after loading).
+           while sleeping only waking up and the "Z" come, everything else waits"""
+        for name in list(self.timers):
+            self.set_timer(name, None)
+        if self.sleep:
+            self.set_timer("wake", self.scheduler.after(self.sleep_time - self.age, self.wake_up))
+            self.schedule_z()
+            return
+        self.set_timer("sleep", self.scheduler.after_random(Kitty.sleep_rate, self.start_sleeping))
+        self.set_timer("glow", self.scheduler.after_random(Kitty.glow_rate, self.start_glowing))
+        if self.glow or self.glow2:
+            t = self.glow_time if self.glow else self.glow2_time
+            self.set_timer("glowstep", self.scheduler.after(t - self.age, self.glow_step))
+        self.schedule_state()
+        
+    def schedule_state(self):
+        """next change between sitting and flapping"""
+        chance = self.chance_to_flap if self.state == "sit" else self.chance_to_sit
+        self.set_timer("state", self.scheduler.after_random(timers.rate(chance), self.change_state))
+        
+    def schedule_z(self):
+        self.set_timer("z", self.scheduler.after_random(timers.rate(0.03 * Game.quality), self.z_text))
         
+    def kill(self):
+        for name in list(self.timers):
+            self.set_timer(name, None)
+        VectorSprite.kill(self)
+        
+    def start_glowing(self):
+        if not (self.glow or self.glow2):
+            self.glow = True
+            self.glow_time = self.age + 0.25
+            if not self.sleep:   # key 3 on a sleeping kitty: glows after waking up
+                self.set_timer("glowstep", self.scheduler.after(0.25, self.glow_step))
+        if not self.sleep:
+            self.set_timer("glow", self.scheduler.after_random(Kitty.glow_rate, self.start_glowing))
         
     def end_glowing(self):
         self.glow2 = True
         self.glow2_time = self.age + 0.25    
+        self.set_timer("glowstep", self.scheduler.after(0.25, self.glow_step))
+        
+    def glow_step(self):
+        """glowing eyes: every 0.25 seconds one image up to kitty14, then back"""
+        if self.glow:
+            self.next_image()
+            if self.i == 14:
+                self.glow = False
+                self.end_glowing()
+                return
+            self.glow_time = self.age + 0.25
+        elif self.glow2:
+            self.previous_image()
+            if self.i == 0:
+                self.glow2 = False
+                return
+            self.glow2_time = self.age + 0.25
+        else:
+            return
+        self.set_timer("glowstep", self.scheduler.after(0.25, self.glow_step))
         
     def next_image(self):
         if self.i < 14:
@@ -370,77 +630,79 @@ class Kitty(VectorSprite):
             self.handle_image(self.images[self.i])
             
     def start_sleeping(self):
+        self.catch_up()
         self.sleep = True
-        self.sleep_time = self.age + random.randint(3,20)
+        self.sleep_time = self.age + Game.rng.kitty.randint(3,20)
         #self.sleep_image = ("kittys")
         self.image = self.sleep_image
         self.rect = self.image.get_rect()
         self.rect.center = (self.pos.x, -self.pos.y)
+        self.move = pygame.math.Vector2(0,0)
+        self.schedule()
         
+    def wake_up(self):
+        self.image = self.notsleep_image
+        self.rect = self.image.get_rect()
+        self.rect.center = (self.pos.x, -self.pos.y)
+        self.sleep = False
+        self.schedule()
         
+    def z_text(self):
+        # zzzzz
+        rnd = Game.rng.kitty
+        color = (rnd.randint(0,255), rnd.randint(0,255), rnd.randint(0,255))
+        dx = rnd.random()
+        fontsize = rnd.randint(10,50)
+        if self.updated is None:   # else it sleeps far from every camera, nobody sees the text
+            Flytext(x = self.pos.x, y =  -self.pos.y-50, text="Z", color=color,
+                    dx = dx,dy = -10,
+                    duration=3, fontsize=fontsize)
+        self.schedule_z()
         
-    def update(self,seconds):
-        VectorSprite.update(self,seconds)
-        # will ich glühende Augen haben?
-        
-           
-        if self.sleep:
-              self.image = self.sleep_image
-              #return
-              self.move = pygame.math.Vector2(0,0)
-              
-              # zzzzz
-              if random.random() < 0.03:     #0,01
-                  Flytext(x = self.pos.x, y =  -self.pos.y-50, text="Z", color=(random.randint(0,255), random.randint(0,255), random.randint(0,255)),
-                          dx = random.random(),dy = -10,
-                          duration=3, fontsize=random.randint(10,50))
-              
-              if self.age > self.sleep_time:
-                  self.image = self.notsleep_image
-                  self.rect = self.image.get_rect()
-                  self.rect.center = (self.pos.x, -self.pos.y)
-        
-                  self.sleep = False
-              else:
-                  return    
-        
-        
-        if random.random()<0.0007: #0.0007:
-            self.start_sleeping()
-                
-        
-        if random.random()<0.001:      # 30 x pro sekunde
-            self.start_glowing()
-        if self.glow:
-            if self.age > self.glow_time:
-                self.next_image()
-                self.glow_time = self.age + 0.25
-                if self.i == 14:
-                    self.glow = False
-                    self.end_glowing()
-        
-        
+    def change_state(self):
+        self.catch_up()
+        if self.state == "sit":
+            self.state="flap"
+            v=pygame.math.Vector2(150,0)
+            v.rotate_ip(Game.rng.kitty.randint(0,360))
+            self.move=v 
+        else:
+            self.state="sit"
+            self.move=pygame.math.Vector2(0,0)
+        self.schedule_state()
         
-        if self.glow2:
-            if self.age > self.glow2_time:
-                self.previous_image()
-                self.glow2_time = self.age + 0.25
-                if self.i == 0:
-                    self.glow2 = False
+    def resting(self):
+        return not self.move
         
-        if self.state == "sit":
-            if random.random() < self.chance_to_flap:
-                self.state="flap"
-                v=pygame.math.Vector2(150,0)
-                v.rotate_ip(random.randint(0,360))
-                self.move=v 
-        elif self.state == "flap":
-            if random.random() < self.chance_to_sit:
-                self.state="sit"
-                self.move=pygame.math.Vector2(0,0)
-                
-        elif random.random() <= 0.05:
-                self.kitty.start_gowing
+    def update(self,seconds):
+        if self.near or self.move:
+            VectorSprite.update(self,seconds)
+        else:
+            # a far kitty sitting still: of VectorSprite.update only the age changes
+            self.age += seconds
+            self.wallbounce()
+            self.rect.center = ( round(self.pos.x, 0), -round(self.pos.y, 0) )
+        # sleeping, glowing and flapping come from the scheduler
+        if self.sleep:
+            self.image = self.sleep_image    # keys 1 and 2 change the image
+            self.move.x = self.move.y = 0
+        if not self.near:
+            self.follow()
+            
+    def follow(self):
+        """the paws of a far kitty are not updated: they are only placed
+           again when it moved or fell asleep, and so is its grid entry"""
+        spot = (self.rect.center, self.sleep)
+        if spot == self.spot:
+            return
+        self.spot = spot
+        for p in self.paws:
+            p.place()
+        point = self.rect.center
+        if Kitty.grid.key(point) != Kitty.grid.key(self.gridpoint):
+            Kitty.grid.remove(self, self.gridpoint)
+            Kitty.grid.insert(self, point)
+        self.gridpoint = point
     
     def create_image(self):
         self.images = ["kitty0","kitty1", "kitty2", "kitty3", "kitty4", "kitty5", "kitty6", "kitty7", "kitty8", "kitty9", "kitty10", "kitty11", "kitty12", "kitty13", "kitty14"]
@@ -452,8 +714,7 @@ class Kitty(VectorSprite):
             
     def handle_image(self, i):
             self.image = Viewer.images[i]
-            self.image.convert_alpha()
-            self.image0 = self.image.copy()
+            self.image0 = self.image    # for rotating, never blitted
             
             self.rect = self.image.get_rect()
             self.rect.center = (self.pos.x, -self.pos.y)
@@ -464,6 +725,7 @@ class Paw(VectorSprite):
     def _overwrite_parameters(self):
         self.pos = pygame.math.Vector2(0,0)
         self.boss = VectorSprite.numbers[self.bossnumber]
+        self.boss.paws.append(self)
         self.angle = 270
         #self.correction()
     
@@ -482,7 +744,7 @@ class Paw(VectorSprite):
     def flap(self):
         self.boss.chance_to_flap = 0.001
         #self.correction()
-        a=random.randint(240,300) #240, 300
+        a=Game.rng.paw.randint(240,300) #240, 300
         #("flapwinkel", a)
         if self.side == "right":
             self.set_angle(a)
@@ -494,14 +756,18 @@ class Paw(VectorSprite):
         
         if angle < 90 and angle > -90:
             if self.side == "right":
-                self.set_angle(angle + random.randint(-5,5))
+                self.set_angle(angle + Game.rng.paw.randint(-5,5))
         #elif angle >= 90 and angle <= 270: 
         else:
             if self.side == "left":
-                self.set_angle(angle + random.randint(-5,5))
+                self.set_angle(angle + Game.rng.paw.randint(-5,5))
         
     def update(self, seconds):
         VectorSprite.update(self,seconds)
+        self.place()
+        
+    def place(self):
+        """next to the kitty, out of sight while it sleeps"""
         self.correction()  
         if self.boss.sleep:
         
@@ -515,9 +781,9 @@ class Paw(VectorSprite):
         self.set_angle(180)
         
     def create_image(self):
+        self.imagename = "paw"
         self.image = Viewer.images["paw"]
-        self.image.convert_alpha()
-        self.image0 = self.image.copy()
+        self.image0 = self.image
         self.rect = self.image.get_rect()
         
 class Crumb(VectorSprite):
@@ -541,12 +807,14 @@ class Crumb(VectorSprite):
         b = randomize_color(b,20)
         self.image = pygame.Surface((10,10))
         pygame.draw.circle(self.image, (r,g,b), (5,5), 5)
+        rnd = Game.rng.effects
         if self.color == (220,160,40):
-            pygame.draw.circle(self.image, (90,50,0), (random.randint(2,7), random.randint(2,7)), random.randint(0,2))
-        pygame.draw.circle(self.image, (0,0,0), (random.randint(2,7), random.randint(2,7)), random.randint(0,4))
+            pygame.draw.circle(self.image, (90,50,0), (rnd.randint(2,7), rnd.randint(2,7)), rnd.randint(0,2))
+        pygame.draw.circle(self.image, (0,0,0), (rnd.randint(2,7), rnd.randint(2,7)), rnd.randint(0,4))
         self.image.set_colorkey((0,0,0))
+        self.image0 = self.image    # for rotating, never blitted
+        self.image = surfaces.prepare(self.image)
         self.rect= self.image.get_rect()
-        self.image0 = self.image.copy()
 
     def update(self, seconds):
         VectorSprite.update(self, seconds)
@@ -557,13 +825,19 @@ class Explosion():
     
     def __init__(self, pos, what="Spark", maxspeed=150, minspeed=20, color=(255,255,0),maxduration=2.5,gravityy=3.7,sparksmin=5,sparksmax=20,acc=1.0, min_angle=0, max_angle=360):
 
-        for s in range(random.randint(sparksmin,sparksmax)):
+        sparks = Game.rng.effects.randint(sparksmin,sparksmax)
+        if Game.quality < 1.0:
+            sparks = max(1, int(sparks * Game.quality))
+        # every angle, speed and duration of the burst in one go
+        batch = Game.rng.batch("effects")
+        angles = batch.integers(int(min_angle), int(max_angle) + 1, sparks)
+        speeds = batch.integers(minspeed, maxspeed + 1, sparks)     #150
+        durations = batch.random(sparks)
+        for a, speed, duration in zip(angles, speeds, durations):
             v = pygame.math.Vector2(1,0) # vector aiming right (0°)
-            a = random.randint(int(min_angle),int(max_angle))
             v.rotate_ip(a)
             g = pygame.math.Vector2(0, - gravityy)
-            speed = random.randint(minspeed, maxspeed)     #150
-            duration = random.random() * maxduration
+            duration *= maxduration
             if what == "Spark":     
                 Spark(pos=pygame.math.Vector2(pos.x, pos.y), angle= a, move=v*speed,
                   max_age = duration, color=color, gravity = g)
@@ -578,6 +852,8 @@ class Donut(VectorSprite):
         self.image = Viewer.images["donut"]
         self.image0 = self.image.copy()
         self.rect = self.image.get_rect()
+        self.mask = pygame.mask.from_surface(self.image)   # never changes
+        self.radius = mask_radius(self.mask)
         
 class Cookie(VectorSprite):
     
@@ -585,6 +861,8 @@ class Cookie(VectorSprite):
         self.image = Viewer.images["cookie"]
         self.image0 = self.image.copy()
         self.rect = self.image.get_rect()
+        self.mask = pygame.mask.from_surface(self.image)   # never changes
+        self.radius = mask_radius(self.mask)
         
 class Autoreifen(VectorSprite):
     
@@ -592,6 +870,8 @@ class Autoreifen(VectorSprite):
         self.image = Viewer.images["car wheel"]
         self.image0 = self.image.copy()
         self.rect = self.image.get_rect()
+        self.mask = pygame.mask.from_surface(self.image)   # never changes
+        self.radius = mask_radius(self.mask)
         
 class Spark(VectorSprite):
 
@@ -615,8 +895,9 @@ class Spark(VectorSprite):
         pygame.draw.line(self.image, (r,g,b),
                           (5,5), (2,5), 1)
         self.image.set_colorkey((0,0,0))
+        self.image0 = self.image    # for rotating, never blitted
+        self.image = surfaces.prepare(self.image)
         self.rect= self.image.get_rect()
-        self.image0 = self.image.copy()
 
     def update(self, seconds):
         VectorSprite.update(self, seconds)
@@ -625,22 +906,443 @@ class Spark(VectorSprite):
 
 
 
+class BlitLayers(pygame.sprite.LayeredUpdates):
+    """LayeredUpdates that draws every layer with one Surface.blits call
+       instead of one blit per sprite. the layers keep their order:
+       Fluffball 2, VectorSprite 4, Flytext 7, ...
+       hidden sprites (hide) stay in the group, but draw does not even
+       look at them: self.shown are the others, in the drawing order.
+       draw_calls and blitted count until the viewer sets them to 0"""
+
+    def __init__(self, *sprites, **kwargs):
+        self.order = {}     # { sprite: (layer, number of the add) }, like self.sprites()
+        self.adds = itertools.count()
+        self.shown = []     # the sprites that are not hidden, by self.order
+        self.keys = []      # their self.order, for bisect
+        self.hidden = set()
+        pygame.sprite.LayeredUpdates.__init__(self, *sprites, **kwargs)
+        self.draw_calls = 0
+        self.blitted = 0
+
+    def add_internal(self, sprite, layer=None):
+        pygame.sprite.LayeredUpdates.add_internal(self, sprite, layer)
+        self.order[sprite] = (self._spritelayers[sprite], next(self.adds))    # last of its layer
+        if sprite not in self.hidden:
+            self.insert_shown(sprite)
+
+    def remove_internal(self, sprite):
+        pygame.sprite.LayeredUpdates.remove_internal(self, sprite)
+        if sprite in self.hidden:
+            self.hidden.discard(sprite)
+        else:
+            self.remove_shown(sprite)
+        del self.order[sprite]
+
+    def change_layer(self, sprite, new_layer):
+        shown = sprite not in self.hidden
+        if shown:
+            self.remove_shown(sprite)
+        pygame.sprite.LayeredUpdates.change_layer(self, sprite, new_layer)
+        self.order[sprite] = (new_layer, next(self.adds))
+        if shown:
+            self.insert_shown(sprite)
+
+    def hide(self, sprite):
+        """sprite is not drawn until show(sprite)"""
+        if sprite in self.order and sprite not in self.hidden:
+            self.remove_shown(sprite)
+            self.hidden.add(sprite)
+
+    def show(self, sprite):
+        """drawn again, at its old place"""
+        if sprite in self.hidden:
+            self.hidden.discard(sprite)
+            self.insert_shown(sprite)
+
+    def insert_shown(self, sprite):
+        key = self.order[sprite]
+        i = bisect.bisect(self.keys, key)
+        self.keys.insert(i, key)
+        self.shown.insert(i, sprite)
+
+    def remove_shown(self, sprite):
+        i = bisect.bisect_left(self.keys, self.order[sprite])
+        del self.keys[i]
+        del self.shown[i]
+
+    def draw(self, surface, area=None, offset=(0, 0), fixed=False, sprites=None):
+        """blits the sprites that touch area (None: all of them), moved
+           by -offset. fixed: only sprites with .fixed == fixed (texts on
+           the screen, not in the world). sprites: only these of the group,
+           in the order of the layers (default: all that are not hidden)"""
+        if sprites is None:
+            sprites = self.shown
+        rects = [sprite.rect for sprite in sprites]
+        visible = range(len(sprites)) if area is None else area.collidelistall(rects)
+        layers = self._spritelayers   # { sprite: layer }, get_layer_of_sprite without the call
+        ox, oy = offset
+        batch = []
+        layer = None
+        for i in visible:
+            sprite = sprites[i]
+            if getattr(sprite, "fixed", False) != fixed:
+                continue
+            if layers[sprite] != layer:
+                self.blit_batch(surface, batch)
+                batch = []
+                layer = layers[sprite]
+            batch.append((sprite.image, rects[i].move(-ox, -oy)))
+        self.blit_batch(surface, batch)
+
+    def blit_batch(self, surface, batch):
+        if batch:
+            surface.blits(batch, doreturn=False)
+            self.draw_calls += 1
+            self.blitted += len(batch)
+
+
+class WatchedGroup(pygame.sprite.Group):
+    """Group that collects its new sprites in self.added, while that is
+       a list (None: nobody is interested)"""
+
+    def __init__(self, *sprites, added=None):
+        self.added = added
+        pygame.sprite.Group.__init__(self, *sprites)
+
+    def add_internal(self, sprite, layer=None):
+        pygame.sprite.Group.add_internal(self, sprite)
+        if self.added is not None:
+            self.added.append(sprite)
+
+
+class StaticLayer(pygame.sprite.Group):
+    """group for the sprites that never move (car wheels, donuts, cookies).
+       they are painted once onto a copy of the background, in square
+       tiles of the world. only the tiles that a camera shows are made,
+       so drawing all of them is a few blits. when one is eaten (kill)
+       or a new one comes, only its rect is painted again.
+       self.grid finds them by position (see camera.SpatialGrid)"""
+    tilesize = 512
+    maxtiles = 64    # least recently shown tiles are forgotten
+
+    def __init__(self, background):
+        pygame.sprite.Group.__init__(self)
+        self.grid = camera.SpatialGrid(StaticLayer.tilesize // 2)
+        self.points = {}    # { sprite: center in the grid }
+        self.margin = 0     # half the size of the largest sprite
+        self.added = []
+        self.set_background(background)
+
+    def set_background(self, background):
+        self.background = background
+        self.tiles = collections.OrderedDict()   # { (tx, ty): Surface }
+        self.dirty = []
+
+    def add_internal(self, sprite, layer=None):
+        pygame.sprite.Group.add_internal(self, sprite)
+        self.added.append(sprite)   # has no rect yet, create_image comes later
+
+    def remove_internal(self, sprite):
+        pygame.sprite.Group.remove_internal(self, sprite)
+        self.dirty.append(sprite.rect.copy())
+        if sprite in self.points:
+            self.grid.remove(sprite, self.points.pop(sprite))
+
+    def sync(self):
+        """puts the new sprites into the grid"""
+        for sprite in self.added:
+            if sprite in self.points or not self.has(sprite):
+                continue
+            self.points[sprite] = sprite.rect.center
+            self.grid.insert(sprite, sprite.rect.center)
+            self.margin = max(self.margin, sprite.rect.width // 2 + 1, sprite.rect.height // 2 + 1)
+            self.dirty.append(sprite.rect.copy())
+        self.added = []
+
+    def query(self, area):
+        """static sprites that touch area (world pixels), in drawing order"""
+        self.sync()
+        sprites = [sprite for sprite in self.grid.query(area, self.margin) if area.colliderect(sprite.rect)]
+        sprites.sort(key=lambda sprite: sprite.number)
+        return sprites
+
+    def paint(self, surface, area, origin, background=True):
+        """background and static sprites of area (world pixels) on surface,
+           origin is the world point at (0, 0) of surface"""
+        ox, oy = origin
+        surface.set_clip(area.move(-ox, -oy))
+        if background:
+            bw, bh = self.background.get_size()
+            for y in range(area.top // bh * bh, area.bottom, bh):
+                for x in range(area.left // bw * bw, area.right, bw):
+                    surface.blit(self.background, (x - ox, y - oy))
+        for sprite in self.query(area):
+            surface.blit(sprite.image, sprite.rect.move(-ox, -oy))
+        surface.set_clip(None)
+
+    def tile(self, key):
+        """the tile (tx, ty), made if it is not there"""
+        image = self.tiles.get(key)
+        if image is None:
+            size = StaticLayer.tilesize
+            image = pygame.Surface((size, size)).convert()
+            self.paint(image, pygame.Rect(key[0] * size, key[1] * size, size, size),
+                       (key[0] * size, key[1] * size))
+            self.tiles[key] = image
+            while len(self.tiles) > StaticLayer.maxtiles:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return image
+
+    def refresh(self):
+        """paints the dirty rects again in the tiles that are made"""
+        self.sync()
+        if not self.dirty:
+            return
+        size = StaticLayer.tilesize
+        for area in self.dirty:
+            for ty in range(area.top // size, (area.bottom - 1) // size + 1):
+                for tx in range(area.left // size, (area.right - 1) // size + 1):
+                    if (tx, ty) in self.tiles:
+                        self.paint(self.tiles[(tx, ty)], area, (tx * size, ty * size))
+        self.dirty = []
+
+    def draw_view(self, surface, cam):
+        """background and all static sprites that cam shows"""
+        view = cam.rect
+        if not Game.static_layer:
+            self.paint(surface, view, view.topleft)
+            return
+        self.refresh()
+        size = StaticLayer.tilesize
+        for ty in range(view.top // size, (view.bottom - 1) // size + 1):
+            for tx in range(view.left // size, (view.right - 1) // size + 1):
+                surface.blit(self.tile((tx, ty)), (tx * size - view.left, ty * size - view.top))
+        self.prefetch(cam)
+
+    def prefetch(self, cam):
+        """makes one missing tile half a tile ahead of a moving camera,
+           so that scrolling does not have to make a whole row at once"""
+        dx, dy = cam.moved
+        if not (dx or dy):
+            return
+        size = StaticLayer.tilesize
+        step = size // 2
+        ahead = cam.rect.move(step * ((dx > 0) - (dx < 0)), step * ((dy > 0) - (dy < 0))).clip(cam.world)
+        for ty in range(ahead.top // size, (ahead.bottom - 1) // size + 1):
+            for tx in range(ahead.left // size, (ahead.right - 1) // size + 1):
+                if (tx, ty) not in self.tiles:
+                    self.tile((tx, ty))
+                    return
+
+    def draw_sprites(self, surface, cam):
+        """only the static sprites, without background"""
+        self.paint(surface, cam.rect, cam.rect.topleft, background=False)
+
+# ---- gameplay events: the collision phase only emits them, ----
+# ---- ScoreSystem and EffectSystem consume them afterwards    ----
+FoodEaten = collections.namedtuple("FoodEaten", "fluff food pos")
+TireHit = collections.namedtuple("TireHit", "fluff tire pos hungry")   # hungry: food was left when the step began
+FluffCollision = collections.namedtuple("FluffCollision", "fluff other")
+KittyPlay = collections.namedtuple("KittyPlay", "kitty fluff angle")
+GameOver = collections.namedtuple("GameOver", "won")
+
+class EventQueue():
+    """gameplay events of one simulation step"""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+    def drain(self):
+        """returns all events and starts a new, empty list"""
+        events = self.events
+        self.events = []
+        return events
+
+class ScoreSystem():
+    """counts collisions with car wheels and decides when the game is over"""
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+
+    def consume(self, events):
+        v = self.viewer
+        for event in list(events):
+            if isinstance(event, TireHit):
+                if event.hungry:
+                    v.collisions += 1
+                if v.collisions == 100 and not v.gameOver:
+                    v.gameOver = True
+                    v.exittime = v.playtime + 3
+                    events.append(GameOver(False))
+            elif isinstance(event, FoodEaten):
+                if event.fluff in v.players:
+                    v.eaten[v.players.index(event.fluff)] += 1
+                if len(v.foodgroup) == 0 and not v.gameOver:
+                    v.gameOver = True
+                    v.exittime = v.playtime + 3
+                    events.append(GameOver(True))
+            elif isinstance(event, FluffCollision):
+                v.bumps += 1
+
+class EffectSystem():
+    """texts, crumbs, sparks and paw animations for the events of one step.
+       events of the same kind are merged: five donuts eaten at the same
+       time make one crumb explosion, not five"""
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+
+    def consume(self, events):
+        v = self.viewer
+        food = {}     # { Donut or Cookie: [FoodEaten, ...] }
+        tires = {}    # { fluffball: TireHit }, one spark burst per Fluffball
+        for event in events:
+            if isinstance(event, FoodEaten):
+                food.setdefault(event.food.__class__, []).append(event)
+                v.sfx.play("mjam")
+            elif isinstance(event, TireHit):
+                tires.setdefault(event.fluff, event)
+                v.sfx.play("tire")
+            elif isinstance(event, FluffCollision):
+                v.sfx.play("bump")
+            elif isinstance(event, KittyPlay):
+                for p in event.kitty.paws:
+                    p.play(angle=event.angle)
+                v.sfx.play("kitty")
+            elif isinstance(event, GameOver) and not v.headless:
+                if event.won:
+                    Flytext(Viewer.width/2,Viewer.height/2,"Alles gemampft... Päuschen!", (0,0,255), duration=10, fontsize=145, fixed=True)
+                else:
+                    Flytext(Viewer.width/2,Viewer.height/2,"Game over", (0,0,0), duration=10, fontsize=350, fixed=True)
+        if v.headless:
+            return     # the network server needs no texts and crumbs
+        for kind, eaten in food.items():
+            pos = pygame.math.Vector2(0, 0)
+            for event in eaten:
+                pos += event.pos
+            pos /= len(eaten)
+            for f in set(event.fluff for event in eaten):
+                if kind is Donut:
+                    Flytext(f.pos.x,-f.pos.y,text="Mjam",color=(240,80,190),duration=5,fontsize=30)
+                else:
+                    Flytext(f.pos.x,-f.pos.y,text="Knusper, Knusper!",color=(210,110,10),duration=5,fontsize=30)
+            if kind is Donut:
+                Explosion(pos=pos, what ="Crumb", maxspeed=900, minspeed=500, color=(210,110,210), maxduration=1.5, gravityy=0, sparksmin=100, sparksmax=300, acc=0.9)
+            else:
+                Explosion(pos=pos, what ="Crumb", maxspeed=150, minspeed=50, color=(220,160,40), maxduration=1.5, gravityy=0, sparksmin=100, sparksmax=300, acc=1.05)
+        for f, event in tires.items():
+            if v.crazytime_cooldown <= v.playtime:
+                v.crazytime = v.playtime + 0.1
+                v.crazytime_cooldown = v.playtime + 0.75
+                Flytext(f.pos.x,-f.pos.y,text="Uargh, ein Autoreifen!",color=(1,1,1),duration=5,fontsize=40)
+            #(self, pos, maxspeed=150, minspeed=20, color=(255,255,0),maxduration=2.5,gravity=3.7,sparksmin=5,sparksmax=20):
+            dist = event.pos - event.tire.pos
+            point = event.tire.pos + dist * 0.5
+            a = -dist.angle_to(pygame.math.Vector2(1,0))
+            Explosion(pos=point, min_angle=a-15, max_angle=a+15, what ="Spark", maxspeed=100, minspeed=50, color=(0,0,0), maxduration=2.5, gravityy=0, sparksmin=10, sparksmax=30)
+
+
+class QualityGovernor():
+    """watches how long a frame takes to compute (without the waiting in
+       clock.tick) and changes Game.quality so the game keeps its fps:
+       fewer crumbs and sparks, fewer "Z" texts, coarser rotations"""
+    levels = ((1.0, 1), (0.75, 2), (0.5, 5), (0.3, 10), (0.15, 15))  # (quality, rotation_step)
+
+    def __init__(self, fps):
+        self.fps = fps
+        self.level = 0
+        self.worktime = 0.0     # smoothed milliseconds per frame
+        self.cooldown = 0.0     # seconds until the next change
+        self.headroom = 0.0     # seconds the game was fast enough
+
+    def apply(self):
+        Game.quality, Game.rotation_step = QualityGovernor.levels[self.level]
+
+    def set_level(self, level):
+        self.level = max(0, min(len(QualityGovernor.levels) - 1, level))
+        self.apply()
+
+    def frame_done(self, milliseconds, seconds):
+        """milliseconds: work of this frame, seconds: time since the last frame"""
+        self.worktime += (milliseconds - self.worktime) * 0.1
+        if not Game.quality_auto:
+            return
+        budget = 1000 / self.fps
+        self.cooldown -= seconds
+        if self.worktime > budget * 0.9:
+            self.headroom = 0
+            if self.cooldown <= 0 and self.level < len(QualityGovernor.levels) - 1:
+                self.set_level(self.level + 1)
+                self.cooldown = 0.5
+        elif self.worktime < budget * 0.6:
+            self.headroom += seconds
+            if self.headroom > 2 and self.level > 0:
+                self.set_level(self.level - 1)
+                self.headroom = 0
+                self.cooldown = 0.5
+        else:
+            self.headroom = 0
+
+# ---- savegame format, see Viewer.world_to_bytes ----
+SAVE_KINDS = (Fluffball, Kitty, Paw, Donut, Cookie, Autoreifen, Crumb, Spark)
+SAVE_MAGIC = b"FLUF"
+SAVE_VERSION = 4
+# magic, version, next sprite number, sprites, flytexts, playtime, collisions,
+# difficulty, players, gameOver, exittime, number of kitty1, world_size
+SAVE_HEADER = struct.Struct("!4sHIIIdIBBBdiB")
+SAVE_HEADER_V1 = struct.Struct("!4sHIIIdIBBBdi")   # without world_size
+SAVE_RANDOM = struct.Struct("!B625IBd")   # random.getstate(): version, mt state, gauss
+# version 3: seed of Game.rng, number of streams, then for every stream:
+# length of the name, name, SAVE_RANDOM. version 1 and 2: one SAVE_RANDOM
+SAVE_STREAMS = struct.Struct("!QB")
+# version 4: then the number of batches (Game.rng.batch), for every batch:
+# length of the name, name, kind (0 random.Random: SAVE_RANDOM, 1 numpy: SAVE_PCG64)
+SAVE_BATCHES = struct.Struct("!B")
+SAVE_PCG64 = struct.Struct("!QQQQBI")   # state and inc (128 bit, high and low half), has_uint32, uinteger
+# kind, number, pos x y, move x y, age, angle, hitpoints, max_age (nan = None),
+# bossnumber (-1 = None), flags (see SAVE_FLAGS), layer
+SAVE_SPRITE = struct.Struct("!BI8fiBB")
+SAVE_FLAGS = ("bounce_on_edge", "warp_on_edge", "kill_on_edge", "sticky_with_boss",
+              "kill_with_boss", "static")
+SAVE_EXTRA = {"Fluffball": struct.Struct("!BBi"),      # color, player slot (255 = none), reifendamage
+              "Kitty": struct.Struct("!BBBBfffBf"),     # flap, glow, glow2, sleep, sleep_time, glow_time, glow2_time, i, chance_to_flap
+              "Paw": struct.Struct("!B"),               # right side
+              "Crumb": struct.Struct("!BBBfff"),        # color, gravity, acc
+              "Spark": struct.Struct("!BBBff"),         # color, gravity
+              }
+# x, y, dx, dy, duration, acc, time, r, g, b, fontsize, fixed, length of text
+SAVE_FLYTEXT = struct.Struct("!7fBBBBBH")
+SAVE_FLYTEXT_V1 = struct.Struct("!7fBBBBH")      # without fixed
+
+
 class Viewer(object):
     width = 0
     height = 0
+    world_width = 0     # the playfield, see Game.world_size
+    world_height = 0
     images={}
     
-    menu =  {"main":         ["Resume", "Hilfe", "Credits", "Settings","Fluffbälle", "Steuerung"],
+    menu =  {"main":         ["Resume", "Neues Spiel", "Hilfe", "Credits", "Settings","Fluffbälle", "Steuerung"],
             "Hilfe":         ["zurück", "Fluffball", "Donut", "Cookie", "Autoreifen", "Katze", "Spielziel"],
             "Credits":       ["zurück", "Ines Schnabl", "Martin Schnabl","Bilder","Musik" ],
             "Settings":      ["zurück", 
                               #"Screenresolution", 
-                              "Fullscreen", "Schwierigkeit"],
+                              "Fullscreen", "Schwierigkeit", "Spielfeld", "Kamera", "Effekte", "Bildrate", "Taktung"],
+            "Spielfeld":     ["zurück", "Normal", "Groß", "Riesig"],
+            "Kamera":        ["zurück", "Gemeinsam", "Geteilt"],
+            "Effekte":       ["zurück", "Automatisch", "Hoch", "Mittel", "Niedrig"],
+            "Bildrate":      ["zurück", "30 FPS", "60 FPS", "120 FPS"],
+            "Taktung":       ["zurück", "Schlafen", "Warten", "Hybrid", "VSync"],
             "Resolution":    ["zurück", ],
             "Fullscreen":    ["zurück", "Fullscreen Ein", "Fullscreen Aus"],
             "Schwierigkeit": ["zurück", "Easy", "Medium", "Hard", "Impossible"],
             "Fluffbälle":    ["zurück", "Spieler", "Farbe"],
-            "Spieler":       ["zurück", "1 Spieler", "2 Spieler","3 Spieler", "4 Spieler"],
+            "Spieler":       ["zurück", "1 Spieler", "2 Spieler","3 Spieler", "4 Spieler", "8 Spieler", "16 Spieler"],
             "Farbe":         ["zurück", "Fluffball 1", "Fluffball 2","Fluffball 3", "Fluffball 4"],
             "Fluffball 1":   ["zurück", "rot", "gelb", "grün", "türkis", "blau", "violett"],
             "Fluffball 2":   ["zurück", "rot", "gelb", "grün", "türkis", "blau", "violett"],
@@ -651,6 +1353,7 @@ class Viewer(object):
             
             
     descr = {"Resume" :           ["Zurück zum Spiel"],                                           #resume
+             "Neues Spiel" :      ["Eine neue Runde mit den", "gleichen Fluffbällen."],
              "Martin Schnabl" :   ["Mein großer Bruder hat","mich zum Programmieren","inspiriert und","mir Python erklärt.","","(Für einen großen Bruder","ist er voll in Ordnung.)"],
              "Ines Schnabl":      ["Mein Ziel ist es mehr","Flauschigkeit in die Welt","zu bringen.","","Das ist mein erstes Spiel,","das ich selber program-","miert habe."],
              "Bilder":            ["Katzen gezeichnet von","Ines Schnabl.","","Andere Bilder:","Lizenzfrei","von www.pixabay.com"],
@@ -671,8 +1374,20 @@ class Viewer(object):
              "2 Spieler":         ["Steuerung:", "Fluffball 1, mit Pfeiltasten", "Fluffball 2, mit w a s d"],
              "3 Spieler":         ["Steuerung:", "Fluffball 1, mit Pfeiltasten", "Fluffball 2, mit w a s d", "Fluffball 3, mit i j k l"],
              "4 Spieler":         ["Steuerung:", "Fluffball 1, mit Pfeiltasten", "Fluffball 2, mit w a s d", "Fluffball 3, mit i j k l", "Fluffball 4, mit g v b n"],
+             "8 Spieler":         ["Party!", "Fluffball 1 bis 4 wie bei", "4 Spielern, dann ein", "Fluffball für jeden", "weiteren Joystick.", "Die anderen suchen", "das Futter allein."],
+             "16 Spieler":        ["Große Party!", "Fluffball 1 bis 4 wie bei", "4 Spielern, dann ein", "Fluffball für jeden", "weiteren Joystick.", "Die anderen suchen", "das Futter allein."],
              "Farbe":             ["Ändere die Farbe",  "der Fluffbälle."],
-             "Steuerung":         ["Fluffball 1, mit Pfeiltasten", "Fluffball 2, mit w a s d", "Fluffball 3, mit i j k l", "Fluffball 4, mit g v b n", "", "mit m öffnet man das Menü"],
+             "Effekte":           ["Weniger Krümel und Funken,", "wenn der Computer zu", "langsam ist.", "", "F3 zeigt, wie lange", "jeder Teil eines Bildes", "dauert."],
+             "Automatisch":       ["Die Effekte werden", "automatisch weniger, wenn", "das Spiel ruckelt."],
+             "Spielfeld":         ["Wie groß die Wiese ist.", "", "Normal: ein Bildschirm", "Groß: 2 x 2 Bildschirme", "Riesig: 4 x 4 Bildschirme", "", "Bei Groß und Riesig", "fährt die Kamera mit."],
+             "Kamera":            ["Gemeinsam: eine Kamera", "für alle Fluffbälle.", "", "Geteilt: jeder Fluffball", "hat seinen eigenen Teil", "des Bildschirms."],
+             "Bildrate":          ["Wie viele Bilder pro", "Sekunde gezeichnet werden.", "60 oder 120 nur auf", "schnellen Computern."],
+             "Taktung":           ["Wie das Spiel auf das", "nächste Bild wartet.", "", "F3 zeigt, wie genau", "die Bilder kommen."],
+             "Schlafen":          ["Braucht am wenigsten", "Strom, ruckelt aber", "manchmal ein bisschen."],
+             "Warten":            ["Ganz genau, braucht aber", "einen ganzen Prozessorkern."],
+             "Hybrid":            ["Schläft fast bis zum", "nächsten Bild und wartet", "dann genau. (Standard)"],
+             "VSync":             ["Wartet auf den Bildschirm.", "Die Bildrate ist dann", "die des Bildschirms."],
+             "Steuerung":         ["Fluffball 1, mit Pfeiltasten", "Fluffball 2, mit w a s d", "Fluffball 3, mit i j k l", "Fluffball 4, mit g v b n", "Gamepads steuern Fluffball", "1 bis 4 (in der Reihenfolge", "des Einsteckens)", "", "mit m öffnet man das Menü", "F5 speichert, F9 lädt"],
              "Spielziel":         ["Gewinnen: Alle Cookies und", "Donuts gegessen.","", "Verlieren: Fluffball trifft", "100-mal oder öfter auf", "einen Autoreifen."]
              }
     menu_images = {"Fluffball"  : "fluffball_menu",
@@ -687,15 +1402,72 @@ class Viewer(object):
                    "türkis"     : "fluffballt.",
                    "violett"    : "fluffballp.",
                    }
+    # every image: name, file in data, size. the pictures of the menu
+    # first, they load while the menu is already there (see assets.py)
+    image_files = [("fluffball_menu", "Fluffballlöwenzahn.png", (300, 300)),
+                   ("donut_menu", "donut.png", (300, 300)),
+                   ("cookie_menu", "cookie.png", (275, 275)),
+                   ("car wheel_menu", "car_wheel.png", (300, 300)),
+                   ("baby cat_menu", "kitty0.png", (400, 300)),
+                   ("fluffballb.", "Fluffballlöwenzahnb.png", (90,90)),
+                   ("fluffballgb.", "Fluffballlöwenzahngb.png", (90,90)),
+                   ("fluffballgn.", "Fluffballlöwenzahngn.png", (90,90)),
+                   ("fluffballp.", "Fluffballlöwenzahnp.png", (90,90)),
+                   ("fluffballt.", "Fluffballlöwenzahnt.png", (90,90)),
+                   ("fluffballr.", "Fluffballlöwenzahnr.png", (90,90)),
+                   ("kitty0", "kitty0.png", (250,175)),
+                   ("kitty1", "kitty1.png", (250,175)),
+                   ("kitty2", "kitty2.png", (250,175)),
+                   ("kitty3", "kitty3.png", (250,175)),
+                   ("kitty4", "kitty4.png", (250,175)),
+                   ("kitty5", "kitty5.png", (250,175)),
+                   ("kitty6", "kitty6.png", (250,175)),
+                   ("kitty7", "kitty7.png", (250,175)),
+                   ("kitty8", "kitty8.png", (250,175)),
+                   ("kitty9", "kitty9.png", (250,175)),
+                   ("kitty10", "kitty10.png", (250,175)),
+                   ("kitty11", "kitty11.png", (250,175)),
+                   ("kitty12", "kitty12.png", (250,175)),
+                   ("kitty13", "kitty13.png", (250,175)),
+                   ("kitty14", "kitty14.png", (250,175)),
+                   ("kittys", "kittys.png", (170,150)),
+                   ("paw", "paw1.png", (50,150)),
+                   ("baby cat", "kitty0.png", (125, 175)),
+                   ("donut", "donut.png", (100,100)),
+                   ("cookie", "cookie.png", (80,80)),
+                   ("car wheel", "car_wheel.png", (100,100)),
+                   ]
+    # sound effects, name: (synth(frequency, seconds, volume, end frequency, noise),
+    # priority, per frame, seconds between two). data/sfx/name.wav instead, if there is one
+    sounds = {"mjam":         ((600, 0.15, 0.5, 380, 0.0), 2, 1, 0.1),
+              "tire":         ((90, 0.25, 0.8, 50, 0.4), 3, 1, 0.2),
+              "kitty":        ((700, 0.3, 0.3, 1000, 0.0), 1, 1, 1.5),
+              "bump":         ((220, 0.06, 0.4, 160, 0.1), 1, 1, 0.15),
+              "menu move":    ((1200, 0.03, 0.3, None, 0.0), 4, 1, 0.0),
+              "menu command": ((880, 0.08, 0.4, 660, 0.0), 4, 1, 0.0),
+              }
+    colornames = {"blau": "fluffballb.", "violett": "fluffballp.", "türkis": "fluffballt.",
+                  "rot": "fluffballr.", "gelb": "fluffballgb.", "grün": "fluffballgn."}
+    FluffFarbList = ["fluffballb.","fluffballgb.","fluffballgn.","fluffballp.","fluffballt.","fluffballr."]
  
     history = ["main"]
     cursor = 0
     name = "main"
     fullscreen = False
 
-    def __init__(self, width=640, height=400, fps=30):
+    def __init__(self, width=640, height=400, fps=30, headless=False, strategy="hybrid", seed=None):
         """Initialize pygame, window, background, font,...
-           default arguments """
+           default arguments. headless: no window and no music (server)
+           strategy: how to wait for the next frame, see pacing.py
+           seed: same seed and same input -> same game, see randomness.py"""
+        self.headless = headless
+        if seed is not None:
+            Game.rng.reseed(seed)
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+        else:
+            sfx.pre_init(Game.sound_buffer)   # low latency for the sound effects
         pygame.init()
         Viewer.width = width    # make global readable
         Viewer.height = height
@@ -704,9 +1476,42 @@ class Viewer(object):
         self.background.fill((255,255,255)) # fill background white
         self.clock = pygame.time.Clock()
         self.fps = fps
+        self.pacer = pacing.FramePacer(fps, strategy)
         self.playtime = 0.0
         self.collisions = 0
-        self.fluffs = []
+        self.bumps = 0          # Fluffball against Fluffball in this round
+        self.gameOver = False
+        self.exittime = 0
+        self.crazytime = 0
+        self.crazytime_cooldown = 0
+        self.events = EventQueue()
+        self.scheduler = timers.Scheduler(Game.rng.timers)   # sleeping kitties, max_age, ...
+        self.texttimers = timers.Scheduler()    # Flytext expiry, runs in the menu too
+        self.score = ScoreSystem(self)
+        self.effects = EffectSystem(self)
+        self.governor = QualityGovernor(fps)
+        self.overlay = False    # F3
+        self.phase_times = {}   # { phase: smoothed milliseconds }
+        self.last_phase_times = {}   # { phase: milliseconds of the last frame }
+        self.kitty_slice = 0    # round-robin position for far kitties
+        self.near_kitties = []  # kitties near a Fluffball, see kitty_phase
+        self.far_kitties = []   # the others, round-robin
+        self.kittygrid = camera.SpatialGrid(256)   # the far kitties by position
+        self.frame = 0          # number of simulation steps
+        self.awake = []         # sprites near a camera, see update_throttled
+        self.sleepers = []      # buckets of the far ones
+        self.memory = None      # memtrack.MemoryTracker, see track_memory
+        self.telemetry = None   # telemetry.Telemetry, see export_telemetry
+        self.stats = None       # roundstats.StatsStore, see record_stats
+        self.sampler = profiler.SamplingProfiler(classes=(pygame.sprite.Sprite,))   # F6 or --sampling
+        self.flamegraph = profiler.DEFAULT_FILE   # the sampler writes its stacks there when it stops
+        self.session = None     # id of this session in self.stats
+        self.round_start = 0.0  # playtime at the start of the round
+        self.round_frames = [0, 0.0, 0.0]   # frames, milliseconds, worst milliseconds of the round
+        self.round_done = False
+        self.eaten = [0] * Viewer.max_players   # food of every player slot in this round
+        self.draw_counts = (0, 0)   # Surface.blits calls and sprites of the last draw_sprites
+        self.players = [None] * Viewer.max_players   # the Fluffball of every player slot
         # ------ background images ------
         self.backgroundfilenames = [] # every .jpg file in folder 'data'
         try:
@@ -714,15 +1519,23 @@ class Viewer(object):
                 for file in files:
                     if file[-4:] == ".jpg" or file[-5:] == ".jpeg":
                         self.backgroundfilenames.append(file)
-            random.shuffle(self.backgroundfilenames) # remix sort order
+            Game.rng.world.shuffle(self.backgroundfilenames) # remix sort order
         except:
             print("no folder 'data' or no jpg files in it")
         # ------ joysticks ----
         pygame.joystick.init()
-        self.joysticks = [pygame.joystick.Joystick(x) for x in range(pygame.joystick.get_count())]
-        for j in self.joysticks:
-            j.init()
-        self.prepare_sprites()
+        self.joysticks = {}    # { instance_id: Joystick }
+        self.joyorder = []     # instance_ids in order of plugging in, joystick 0 -> Fluffball 1
+        self.joystate = {}     # { instance_id: {"axes": [x, y], "hat": (x, y)} }
+        for x in range(pygame.joystick.get_count()):
+            self.add_joystick(x)
+        # the images load on a worker thread while the menu is shown,
+        # the world is made when they are all there (see load_step)
+        self.loader = assets.AssetLoader([(name, os.path.join("data", filename), size)
+                                          for name, filename, size in Viewer.image_files], Viewer.images)
+        self.loader.start()
+        if headless:
+            self.finish_loading()   # no menu, the server needs the world now
         self.loadbackground()
         # --- create screen resolution list ---
         li = ["zurück"]
@@ -738,15 +1551,218 @@ class Viewer(object):
         #Viewer.menu["Screenresolution"] = ["zurück","1430x800","800x600"]
         self.set_screenresolution()
         #print("Spiele meine Musik")
-        pygame.mixer.init()
-        pygame.mixer.music.load(os.path.join("data", "FOUNTAIN.wav"))
-        pygame.mixer.music.play(loops=-1)
+        if not headless:
+            pygame.mixer.init()
+            pygame.mixer.music.load(os.path.join("data", "FOUNTAIN.wav"))
+            pygame.mixer.music.play(loops=-1)
+        self.sfx = sfx.SoundEngine(Game.sound_channels, enabled=not headless)
+        self.load_sounds()
+
+    def load_sounds(self):
+        """every sound of Viewer.sounds, made once"""
+        if not self.sfx.enabled:
+            return
+        for name, (tone, priority, per_frame, interval) in Viewer.sounds.items():
+            filename = os.path.join("data", "sfx", name.replace(" ", "_") + ".wav")
+            sound = filename if os.path.exists(filename) else sfx.synth(*tone)
+            self.sfx.add(name, sound, priority, per_frame, interval)
 
 
 
     def getFluffFarbe():
-        return Viewer.FluffFarbList[random.randint(0,len(Viewer.FluffFarbList)-1)]
-        
+        return Viewer.FluffFarbList[Game.rng.world.randint(0,len(Viewer.FluffFarbList)-1)]
+
+    # ------ joysticks / gamepads ------
+    joy_deadzone = 0.15   # analog sticks never rest exactly at 0.0
+
+    def add_joystick(self, device_index):
+        """init a joystick. called at start and for every JOYDEVICEADDED event.
+           pygame also sends JOYDEVICEADDED for joysticks that were already
+           plugged in at start, so doubles are ignored"""
+        j = pygame.joystick.Joystick(device_index)
+        j.init()
+        iid = j.get_instance_id()
+        if iid in self.joysticks:
+            return
+        self.joysticks[iid] = j
+        self.joyorder.append(iid)
+        self.joystate[iid] = {"axes": [0.0, 0.0], "hat": (0, 0)}
+
+    def remove_joystick(self, instance_id):
+        """joystick was unplugged (JOYDEVICEREMOVED)"""
+        if instance_id in self.joysticks:
+            del self.joysticks[instance_id]
+            del self.joystate[instance_id]
+            self.joyorder.remove(instance_id)
+
+    def handle_joystick_event(self, event):
+        """event-driven joystick state: hotplug, sticks and hats.
+           returns True if the event was a joystick event"""
+        if event.type == pygame.JOYDEVICEADDED:
+            self.add_joystick(event.device_index)
+        elif event.type == pygame.JOYDEVICEREMOVED:
+            self.remove_joystick(event.instance_id)
+        elif event.type == pygame.JOYAXISMOTION:
+            if event.instance_id in self.joystate and event.axis < 2:
+                self.joystate[event.instance_id]["axes"][event.axis] = event.value
+        elif event.type == pygame.JOYHATMOTION:
+            if event.instance_id in self.joystate and event.hat == 0:
+                self.joystate[event.instance_id]["hat"] = event.value
+        elif event.type in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.JOYBALLMOTION):
+            pass
+        else:
+            return False
+        return True
+
+    def joystick_direction(self, instance_id):
+        """returns (x, y) between -1 and 1, y is up. analog stick
+           proportional, the hat (digital cross) gives full speed"""
+        state = self.joystate[instance_id]
+        x, y = state["axes"]
+        if abs(x) < Viewer.joy_deadzone:
+            x = 0
+        if abs(y) < Viewer.joy_deadzone:
+            y = 0
+        hx, hy = state["hat"]
+        if hx != 0:
+            x = hx
+        if hy != 0:
+            y = -hy    # hat up is +1, stick up is -1
+        return x, -y
+
+    def joystick_menu_event(self, event):
+        """translates joystick events into the keys used by the menu.
+           other events are returned unchanged"""
+        key = None
+        if event.type == pygame.JOYHATMOTION:
+            if event.value[1] == 1:
+                key = pygame.K_UP
+            elif event.value[1] == -1:
+                key = pygame.K_DOWN
+        elif event.type == pygame.JOYAXISMOTION and event.axis == 1:
+            # only when the stick crosses the threshold, not while holding it
+            old = self.joystate.get(event.instance_id, {"axes": [0, 0]})["axes"][1]
+            if event.value < -0.5 <= old:
+                key = pygame.K_UP
+            elif event.value > 0.5 >= old:
+                key = pygame.K_DOWN
+        elif event.type == pygame.JOYBUTTONDOWN:
+            if event.button == 0:
+                key = pygame.K_RETURN
+        self.handle_joystick_event(event)
+        if key is None:
+            return event
+        return pygame.event.Event(pygame.KEYDOWN, key=key)
+
+    max_players = 16
+    player_keys = ((pygame.K_RIGHT, pygame.K_LEFT, pygame.K_UP, pygame.K_DOWN),   # right, left, up, down
+                   (pygame.K_d, pygame.K_a, pygame.K_w, pygame.K_s),
+                   (pygame.K_l, pygame.K_j, pygame.K_i, pygame.K_k),
+                   (pygame.K_n, pygame.K_v, pygame.K_g, pygame.K_b))
+    playerstart = ((4, 4), (1.33, 4), (4, 1.33), (1.33, 1.33))  # Viewer.width // x, -Viewer.height // y
+
+    @property
+    def fluff(self):
+        """Fluffball 1"""
+        return self.players[0]
+
+    def player_fluff(self, slot):
+        """the Fluffball of a player slot or None"""
+        f = self.players[slot]
+        if f is not None and f.alive():
+            return f
+        return None
+
+    def player_start(self, slot):
+        """where the Fluffball of slot starts: the four corners, the party
+           players (slot 4 and more) on a circle around the middle"""
+        if slot < len(Viewer.playerstart):
+            x, y = Viewer.playerstart[slot]
+            return pygame.math.Vector2(Viewer.width//x, -Viewer.height//y)
+        angle = (slot - len(Viewer.playerstart)) * 360 / (Viewer.max_players - len(Viewer.playerstart))
+        ring = pygame.math.Vector2(min(Viewer.width, Viewer.height) // 3, 0).rotate(angle)
+        return pygame.math.Vector2(Viewer.width // 2 + ring.x, -Viewer.height // 2 + ring.y)
+
+    def spawn_player(self, slot, color=None):
+        """makes the Fluffball of a player slot, if it is not there"""
+        if self.player_fluff(slot) is None:
+            self.players[slot] = Fluffball(bounce_on_edge=True, pos=self.player_start(slot),
+                                           fluffball_color=color or Viewer.getFluffFarbe())
+
+    def set_players(self, n):
+        """n Fluffballs: new ones for the free slots, the ones after n go away"""
+        Game.players = max(1, min(Viewer.max_players, n))
+        for slot in range(Viewer.max_players):
+            f = self.player_fluff(slot)
+            if slot < Game.players:
+                self.spawn_player(slot)
+            elif f is not None:
+                f.kill()
+                self.players[slot] = None
+        Flytext(Viewer.width//2,Viewer.height//4,text="{} Fluffb{} im Spiel".format(
+                Game.players, "all" if Game.players == 1 else "älle"),
+                color=(0,255,255),duration=5,fontsize=50, fixed=True)
+
+    def player_fluffs(self):
+        """Fluffballs in player order: Fluffball 1, Fluffball 2, ..."""
+        return [f for f in self.players if f is not None and f.alive()]
+
+    def controllers(self):
+        """who steers which player slot: a list with ("keys", key set) or
+           ("joystick", instance_id) for every slot, None for the slots
+           nobody has (bots, see Game.bots). the key sets come first
+           (Game.keyboards), the joysticks get the next slots in the order
+           they were plugged in, so no slot has two of them"""
+        keyboards = Game.keyboards
+        if keyboards is None:
+            keyboards = Game.players - len(self.joyorder)
+        keyboards = max(0, min(len(Viewer.player_keys), keyboards))
+        owners = [("keys", n) for n in range(keyboards)] + [("joystick", iid) for iid in self.joyorder]
+        owners = owners[:Viewer.max_players]
+        return owners + [None] * (Viewer.max_players - len(owners))
+
+    def direction(self, owner, pressed_keys):
+        """(x, y) between -1 and 1 of a controller, y is up"""
+        kind, what = owner
+        if kind == "keys":
+            right, left, up, down = Viewer.player_keys[what]
+            return pressed_keys[right] - pressed_keys[left], pressed_keys[up] - pressed_keys[down]
+        return self.joystick_direction(what)
+
+    def handle_input(self, seconds):
+        """reads keyboard and joysticks and accelerates the Fluffballs
+           (Game.push, a half stick pushes half as much).
+           called once at the start of each simulation step, after the
+           event queue was emptied, so the newest input is used"""
+        pressed_keys = pygame.key.get_pressed()
+        if pressed_keys[pygame.K_t]:
+            # alle pfoten von kitty1 suchen
+            for p in self.pawgroup:
+                if p.bossnumber == self.kitty1.number:
+                    p.play(angle=100)
+        push = Game.push * seconds
+        for slot, owner in enumerate(self.controllers()):
+            f = self.player_fluff(slot)
+            if f is None:
+                continue
+            if owner is None:
+                # ---- party: no keys and no joystick for this one ----
+                if Game.bots:
+                    self.steer_bot(f, seconds)
+                continue
+            x, y = self.direction(owner, pressed_keys)
+            if x != 0 or y != 0:
+                f.move += pygame.math.Vector2(x * push, y * push)
+
+    def steer_bot(self, f, seconds):
+        """rolls towards the nearest food, like a player holding a key"""
+        food = [e.pos for e in self.foodgroup]
+        if not food:
+            return
+        target = min(food, key=f.pos.distance_squared_to)
+        if target != f.pos:
+            f.move += (target - f.pos).normalize() * (Game.push * seconds)
+
     def loadbackground(self):
         
         self.background = pygame.Surface(self.screen.get_size()).convert()
@@ -754,115 +1770,154 @@ class Viewer(object):
         self.background = pygame.transform.scale(self.background,
                           (Viewer.width,Viewer.height))
         self.background.convert()
+        if hasattr(self, "staticgroup"):
+            self.staticgroup.set_background(self.background)
         
     def set_screenresolution(self):
        # print(self.width, self.height)
+        flags = pygame.DOUBLEBUF
         if Viewer.fullscreen:
-             self.screen = pygame.display.set_mode((self.width, self.height), pygame.DOUBLEBUF|pygame.FULLSCREEN)
-        else:
-             self.screen = pygame.display.set_mode((self.width, self.height), pygame.DOUBLEBUF)
+            flags |= pygame.FULLSCREEN
+        self.screen, self.pacer.vsync = pacing.set_mode((self.width, self.height), flags,
+                                                        self.pacer.strategy == "vsync")
         self.loadbackground()
+
+    def set_fps(self, fps):
+        """target fps, can change while the game runs"""
+        self.fps = fps
+        self.pacer.set_fps(fps)
+        self.pacer.reset()
+        self.governor.fps = fps
+
+    def set_pacing(self, strategy):
+        """"tick", "busy", "hybrid" or "vsync", see pacing.py"""
+        vsync = self.pacer.strategy == "vsync"
+        self.pacer.set_strategy(strategy)
+        if vsync != (strategy == "vsync"):
+            self.set_screenresolution()    # vsync is a flag of the display mode
+        self.pacer.reset()
         
-    def load_sprites(self):
-        Viewer.images["kitty0"] = pygame.image.load(os.path.join("data", "kitty0.png")).convert_alpha()
-        Viewer.images["kitty0"] = pygame.transform.scale(Viewer.images["kitty0"], (250,175))
-        Viewer.images["kitty1"] = pygame.image.load(os.path.join("data", "kitty1.png")).convert_alpha()
-        Viewer.images["kitty1"] = pygame.transform.scale(Viewer.images["kitty1"], (250,175))
-        Viewer.images["kitty2"] = pygame.image.load(os.path.join("data", "kitty2.png")).convert_alpha()
-        Viewer.images["kitty2"] = pygame.transform.scale(Viewer.images["kitty2"], (250,175))
-        Viewer.images["kitty3"] = pygame.image.load(os.path.join("data", "kitty3.png")).convert_alpha()
-        Viewer.images["kitty3"] = pygame.transform.scale(Viewer.images["kitty3"], (250,175))
-        Viewer.images["kitty4"] = pygame.image.load(os.path.join("data", "kitty4.png")).convert_alpha()
-        Viewer.images["kitty4"] = pygame.transform.scale(Viewer.images["kitty4"], (250,175))
-        Viewer.images["kitty5"] = pygame.image.load(os.path.join("data", "kitty5.png")).convert_alpha()
-        Viewer.images["kitty5"] = pygame.transform.scale(Viewer.images["kitty5"], (250,175))
-        Viewer.images["kitty6"] = pygame.image.load(os.path.join("data", "kitty6.png")).convert_alpha()
-        Viewer.images["kitty6"] = pygame.transform.scale(Viewer.images["kitty6"], (250,175))
-        Viewer.images["kitty7"] = pygame.image.load(os.path.join("data", "kitty7.png")).convert_alpha()
-        Viewer.images["kitty7"] = pygame.transform.scale(Viewer.images["kitty7"], (250,175))
-        Viewer.images["kitty8"] = pygame.image.load(os.path.join("data", "kitty8.png")).convert_alpha()
-        Viewer.images["kitty8"] = pygame.transform.scale(Viewer.images["kitty8"], (250,175))
-        Viewer.images["kitty9"] = pygame.image.load(os.path.join("data", "kitty9.png")).convert_alpha()
-        Viewer.images["kitty9"] = pygame.transform.scale(Viewer.images["kitty9"], (250,175))
-        Viewer.images["kitty10"] = pygame.image.load(os.path.join("data", "kitty10.png")).convert_alpha()
-        Viewer.images["kitty10"] = pygame.transform.scale(Viewer.images["kitty10"], (250,175))
-        Viewer.images["kitty11"] = pygame.image.load(os.path.join("data", "kitty11.png")).convert_alpha()
-        Viewer.images["kitty11"] = pygame.transform.scale(Viewer.images["kitty11"], (250,175))
-        Viewer.images["kitty12"] = pygame.image.load(os.path.join("data", "kitty12.png")).convert_alpha()
-        Viewer.images["kitty12"] = pygame.transform.scale(Viewer.images["kitty12"], (250,175))
-        Viewer.images["kitty13"] = pygame.image.load(os.path.join("data", "kitty13.png")).convert_alpha()
-        Viewer.images["kitty13"] = pygame.transform.scale(Viewer.images["kitty13"], (250,175))
-        Viewer.images["kitty14"] = pygame.image.load(os.path.join("data", "kitty14.png")).convert_alpha()
-        Viewer.images["kitty14"] = pygame.transform.scale(Viewer.images["kitty14"], (250,175))
-        
-        Viewer.images["kittys"] = pygame.image.load(os.path.join("data", "kittys.png")).convert_alpha()
-        Viewer.images["kittys"] = pygame.transform.scale(Viewer.images["kittys"], (170,150))
-        #Viewer.images["kittys"].set_colorkey((255,255,255))
-        #Viewer.images["kittys"].convert_alpha()
-        Viewer.images["paw"] = pygame.image.load(os.path.join("data", "paw1.png")).convert_alpha()
-        Viewer.images["paw"] = pygame.transform.scale(Viewer.images["paw"], (50,150))
-        
-        Viewer.images["fluffballb."] = pygame.image.load(os.path.join("data", "Fluffballlöwenzahnb.png")).convert_alpha()
-        Viewer.images["fluffballb."] = pygame.transform.scale(Viewer.images["fluffballb."], (90,90))
-        Viewer.images["fluffballgb."] = pygame.image.load(os.path.join("data", "Fluffballlöwenzahngb.png")).convert_alpha()
-        Viewer.images["fluffballgb."] = pygame.transform.scale(Viewer.images["fluffballgb."], (90,90))
-        Viewer.images["fluffballgn."] = pygame.image.load(os.path.join("data", "Fluffballlöwenzahngn.png")).convert_alpha()
-        Viewer.images["fluffballgn."] = pygame.transform.scale(Viewer.images["fluffballgn."], (90,90))
-        Viewer.images["fluffballp."] = pygame.image.load(os.path.join("data", "Fluffballlöwenzahnp.png")).convert_alpha()
-        Viewer.images["fluffballp."] = pygame.transform.scale(Viewer.images["fluffballp."], (90,90))
-        Viewer.images["fluffballt."] = pygame.image.load(os.path.join("data", "Fluffballlöwenzahnt.png")).convert_alpha()
-        Viewer.images["fluffballt."] = pygame.transform.scale(Viewer.images["fluffballt."], (90,90))
-        Viewer.images["fluffball_menu"] = pygame.image.load(os.path.join("data", "Fluffballlöwenzahn.png")).convert_alpha()
-        Viewer.images["fluffball_menu"] = pygame.transform.scale(Viewer.images["fluffball_menu"], (300, 300))
-        Viewer.images["fluffballr."] = pygame.image.load(os.path.join("data", "Fluffballlöwenzahnr.png")).convert_alpha()
-        Viewer.images["fluffballr."] = pygame.transform.scale(Viewer.images["fluffballr."], (90,90))
-        Viewer.images["donut_menu"] = pygame.image.load(os.path.join("data", "donut.png")).convert_alpha()
-        Viewer.images["donut_menu"] = pygame.transform.scale(Viewer.images["donut_menu"], (300, 300))
-        Viewer.images["cookie_menu"] = pygame.image.load(os.path.join("data", "cookie.png")).convert_alpha()
-        Viewer.images["cookie_menu"] = pygame.transform.scale(Viewer.images["cookie_menu"], (275, 275))
-        Viewer.images["car wheel_menu"] = pygame.image.load(os.path.join("data", "car_wheel.png")).convert_alpha()
-        Viewer.images["car wheel_menu"] = pygame.transform.scale(Viewer.images["car wheel_menu"], (300, 300))
-        Viewer.images["baby cat"] = pygame.image.load(os.path.join("data", "kitty0.png")).convert_alpha()
-        Viewer.images["baby cat_menu"] = pygame.transform.scale(Viewer.images["baby cat"], (400, 300))
-        Viewer.images["baby cat"] = pygame.transform.scale(Viewer.images["baby cat"], (125, 175))
-        Viewer.images["donut"] = pygame.image.load(os.path.join("data", "donut.png")).convert_alpha()
-        Viewer.images["donut"] = pygame.transform.scale(Viewer.images["donut"], (100,100))
-        Viewer.images["cookie"] = pygame.image.load(os.path.join("data", "cookie.png")).convert_alpha()
-        Viewer.images["cookie"] = pygame.transform.scale(Viewer.images["cookie"], (80,80))
-        Viewer.images["car wheel"] = pygame.image.load(os.path.join("data", "car_wheel.png")).convert_alpha()
-        Viewer.images["car wheel"] = pygame.transform.scale(Viewer.images["car wheel"], (100,100))
-        
-        Viewer.FluffFarbList=["fluffballb.","fluffballgb.","fluffballgn.","fluffballp.","fluffballt.","fluffballr."]
-        
-    def prepare_sprites(self):
-        """painting on the surface and create sprites"""
-        self.load_sprites()
-        self.allgroup =  pygame.sprite.LayeredUpdates() # for drawing
+    def make_groups(self):
+        """new, empty sprite groups"""
+        self.allgroup =  BlitLayers() # for drawing
+        self.movegroup = WatchedGroup()   # updated in every step, without the far kitties
+        self.staticgroup = StaticLayer(self.background)  # car wheels and food, never move
+        self.cameras = [camera.Camera(Viewer.screenrect(), (Viewer.world_width, Viewer.world_height))]
         self.explosiongroup = pygame.sprite.Group()
         self.foodgroup = pygame.sprite.Group()
         self.fluffgroup = pygame.sprite.Group()
         self.car_wheelgroup = pygame.sprite.Group()
         self.flytextgroup = pygame.sprite.Group()
-        self.kittygroup = pygame.sprite.Group()
+        self.kittygroup = WatchedGroup(added=[])    # new kitties for kitty_phase
         self.collisiongroup = pygame.sprite.Group()
         self.pawgroup = pygame.sprite.Group()
         
-        Kitty.groups = self.allgroup, self.kittygroup
-        Paw.groups = self.allgroup, self.pawgroup
-        VectorSprite.groups = self.allgroup
-        Flytext.groups = self.allgroup
+        Kitty.groups = self.allgroup, self.movegroup, self.kittygroup
+        Kitty.grid = self.kittygrid
+        Paw.groups = self.allgroup, self.movegroup, self.pawgroup
+        VectorSprite.groups = self.allgroup, self.movegroup
+        VectorSprite.scheduler = self.scheduler
+        Flytext.scheduler = self.texttimers
+        Flytext.groups = self.allgroup, self.movegroup
         Explosion.groups = self.allgroup, self.explosiongroup
-        Donut.groups = self.allgroup, self.foodgroup, self.collisiongroup
-        Fluffball.groups = self.allgroup, self.fluffgroup, self.collisiongroup
-        Cookie.groups = self.allgroup, self.foodgroup, self.collisiongroup
-        Autoreifen.groups = self.allgroup, self.car_wheelgroup, self.collisiongroup
-        Flytext.groups = self.allgroup, self.flytextgroup
+        Donut.groups = self.staticgroup, self.foodgroup, self.collisiongroup
+        Fluffball.groups = self.allgroup, self.movegroup, self.fluffgroup, self.collisiongroup
+        Cookie.groups = self.staticgroup, self.foodgroup, self.collisiongroup
+        Autoreifen.groups = self.staticgroup, self.car_wheelgroup, self.collisiongroup
+        Flytext.groups = self.allgroup, self.movegroup, self.flytextgroup
         #Babycat.groups = self.allgroup, self.babycatgroup, self.collisiongroup
-        Spark.groups = self.allgroup 
-        Crumb.groups = self.allgroup
-   
+        Spark.groups = self.allgroup, self.movegroup
+        Crumb.groups = self.allgroup, self.movegroup
+
+    def teardown_world(self):
+        """kills every sprite of the old world. VectorSprite.numbers and the
+           groups would keep all of them alive otherwise"""
+        if not hasattr(self, "allgroup"):
+            return    # there is no world yet
+        self.finish_round("aborted")
+        for sprite in self.allgroup.sprites() + self.staticgroup.sprites():
+            sprite.kill()
+        for group in (self.allgroup, self.movegroup, self.staticgroup, self.explosiongroup, self.foodgroup,
+                      self.fluffgroup, self.car_wheelgroup, self.flytextgroup, self.kittygroup,
+                      self.collisiongroup, self.pawgroup):
+            group.empty()
+        VectorSprite.numbers.clear()
+        VectorSprite.number = 0
+        self.scheduler.clear()
+        self.texttimers.clear()
+        # a new world starts at time 0, so a loaded savegame goes on the
+        # same way every time it is loaded
+        self.scheduler.now = 0.0
+        self.kitty_slice = 0
+        self.kittygroup.added = []
+        self.near_kitties = []
+        self.far_kitties = []
+        self.kittygrid.clear()
+        self.frame = 0
+        self.movegroup.added = None    # nobody sleeps in the new world
+        self.events.drain()
+        self.players = [None] * Viewer.max_players
+        self.kitty1 = None
+        self.collisions = 0
+        self.bumps = 0
+        self.gameOver = False
+        self.exittime = 0
+        self.crazytime = 0
+        self.crazytime_cooldown = 0
+        self.round_start = self.playtime
+        self.round_frames = [0, 0.0, 0.0]
+        self.round_done = False
+        self.eaten = [0] * Viewer.max_players
+
+    def new_round(self):
+        """starts a new round without loading anything again,
+           with the same players and colors"""
+        colors = [f and f.fluffball_color for f in self.players]
+        self.prepare_sprites()
+        self.fluff.fluffball_color = colors[0] or self.fluff.fluffball_color
+        self.fluff.create_image()
+        self.fluff.rect.center = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
+        for slot in range(1, Game.players):
+            self.spawn_player(slot, colors[slot])
+
+    def screenrect():
+        return pygame.Rect(0, 0, Viewer.width, Viewer.height)
+
+    def set_world(self):
+        """size of the playfield from Game.world_size"""
+        Viewer.world_width = Viewer.width * Game.world_size
+        Viewer.world_height = Viewer.height * Game.world_size
+
+    def near_static(self, x, y, radius, group):
+        """True if a sprite of group (a static one) is nearer than radius to (x, y)"""
+        area = pygame.Rect(0, 0, radius * 2, radius * 2)
+        area.center = (x, -y)
+        for s in self.staticgroup.query(area):
+            if s in group and distance((x, y), s.pos) < radius:
+                return True
+        return False
+
+    def load_step(self, budget=0.004):
+        """in every menu frame: a few more images (budget seconds),
+           and the world as soon as all of them are there"""
+        if self.loader.finish(budget) and not hasattr(self, "allgroup"):
+            self.prepare_sprites()
 
-        self.fluffs.clear()
+    def finish_loading(self):
+        """waits for the images that are still loading and makes the
+           world, if there is none yet"""
+        self.loader.finish()
+        if not hasattr(self, "allgroup"):
+            self.prepare_sprites()
+
+    def prepare_sprites(self):
+        """painting on the surface and create sprites"""
+        self.loader.finish()   # the images stay loaded, the first world waits for them
+        self.teardown_world()
+        self.set_world()
+        self.make_groups()
+        screens = Game.world_size ** 2   # more of everything on a larger playfield
+        rnd = Game.rng.world
         
         self.kitty1 = Kitty(pos=pygame.math.Vector2(200,-100))
         self.kitty2 = Kitty(pos=pygame.math.Vector2(900,-300))
@@ -870,14 +1925,18 @@ class Viewer(object):
         
         
         
-        self.fluff = Fluffball(bounce_on_edge=True, pos=pygame.math.Vector2(Viewer.width//4,-Viewer.height//4),
-        fluffball_color=Viewer.getFluffFarbe())
+        self.spawn_player(0)
        
             
-        for x in range(Game.difficulty*6-1):
+        for x in range((Game.difficulty*6-1) * screens):
+            tries = 0
             while True:
-                autoreifen_x = random.randint(0, Viewer.width)
-                autoreifen_y = -random.randint(0, Viewer.height)
+                # on "Impossible" there is often no place left that is 200 pixel
+                # away from all other car wheels, so they may come closer later
+                tries += 1
+                mindistance = 200 if tries < 300 else 120
+                autoreifen_x = rnd.randint(0, Viewer.world_width)
+                autoreifen_y = -rnd.randint(0, Viewer.world_height)
                 if distance((autoreifen_x, autoreifen_y), self.fluff.pos) < 100:
                     continue
                 elif distance((autoreifen_x, autoreifen_y), (Viewer.width//1.33,-Viewer.height//4)) < 100:
@@ -887,39 +1946,30 @@ class Viewer(object):
                 elif distance((autoreifen_x, autoreifen_y), (Viewer.width//1.33,-Viewer.height//1.33)) < 100:
                     continue
                     
-                for w in self.car_wheelgroup:
-                    if distance((autoreifen_x, autoreifen_y),w.pos) < 200:
-                        break
-                else:
+                if not self.near_static(autoreifen_x, autoreifen_y, mindistance, self.car_wheelgroup):
                     Autoreifen(pos=pygame.math.Vector2(autoreifen_x, autoreifen_y))
                     break
-        for x in range(10):
+        for x in range(10 * screens):
             while True:
-                donut_x = random.randint(0, Viewer.width)
-                donut_y = -random.randint(0, Viewer.height)
-                for w in self.car_wheelgroup:
-                    if distance((donut_x, donut_y), w.pos) < 50:
-                        break
-                else:
-                    Donut(pos=pygame.math.Vector2(random.randint(0,Viewer.width),-random.randint(0,Viewer.height)))
+                donut_x = rnd.randint(0, Viewer.world_width)
+                donut_y = -rnd.randint(0, Viewer.world_height)
+                if not self.near_static(donut_x, donut_y, 50, self.car_wheelgroup):
+                    Donut(pos=pygame.math.Vector2(rnd.randint(0,Viewer.world_width),-rnd.randint(0,Viewer.world_height)))
                     break
-        for x in range(10):
+        for x in range(10 * screens):
             while True:
-                cookie_x = random.randint(0, Viewer.width)
-                cookie_y = -random.randint(0, Viewer.height)
-                for w in self.car_wheelgroup:
-                    if distance((cookie_x, cookie_y), w.pos) < 50:
-                        break
-                else:
-                    Cookie(pos=pygame.math.Vector2(random.randint(0,Viewer.width),-random.randint(0,Viewer.height)))
+                cookie_x = rnd.randint(0, Viewer.world_width)
+                cookie_y = -rnd.randint(0, Viewer.world_height)
+                if not self.near_static(cookie_x, cookie_y, 50, self.car_wheelgroup):
+                    Cookie(pos=pygame.math.Vector2(rnd.randint(0,Viewer.world_width),-rnd.randint(0,Viewer.world_height)))
                     break
         
         if Game.difficulty == 4:
-            for x in range(25):
-                Kitty(warp_on_edge=True, pos=pygame.math.Vector2(random.randint(0,Viewer.width),-random.randint(0,Viewer.height)))
+            for x in range(25 * screens):
+                Kitty(warp_on_edge=True, pos=pygame.math.Vector2(rnd.randint(0,Viewer.world_width),-rnd.randint(0,Viewer.world_height)))
         else:
-            for x in range(Game.difficulty*3):
-                Kitty(warp_on_edge=True, pos=pygame.math.Vector2(random.randint(0,Viewer.width),-random.randint(0,Viewer.height)))
+            for x in range(Game.difficulty*3 * screens):
+                Kitty(warp_on_edge=True, pos=pygame.math.Vector2(rnd.randint(0,Viewer.world_width),-rnd.randint(0,Viewer.world_height)))
     
     def menu_run(self):
         """Not The mainloop"""
@@ -928,11 +1978,14 @@ class Viewer(object):
         self.menu = True  #self.menu_run()
         while running:
             #pygame.mixer.music.pause()
-            milliseconds = self.clock.tick(self.fps) #
+            milliseconds = self.pacer.wait()
             seconds = milliseconds / 1000
             text = Viewer.menu[Viewer.name][Viewer.cursor]
+            self.sfx.frame(seconds)
+            self.load_step()
             # -------- events ------
             for event in pygame.event.get():
+                event = self.joystick_menu_event(event)
                 if event.type == pygame.QUIT:
                     return -1 # running = False
                 # ------- pressed and released key ------
@@ -942,15 +1995,16 @@ class Viewer(object):
                     if event.key == pygame.K_UP:
                         Viewer.cursor -= 1
                         Viewer.cursor = max(0, Viewer.cursor) # not < 0
-                        #Viewer.menusound.play()
+                        self.sfx.play("menu move")
                     if event.key == pygame.K_DOWN:
                         Viewer.cursor += 1
                         Viewer.cursor = min(len(Viewer.menu[Viewer.name])-1,Viewer.cursor) # not > menu entries
-                        #Viewer.menusound.play()
+                        self.sfx.play("menu move")
                     if event.key == pygame.K_RETURN:
+                        self.finish_loading()   # the commands need the world
+                        self.sfx.play("menu command")
                         if text == "quit":
                             return -1
-                            Viewer.menucommandsound.play()
                         elif text in Viewer.menu:
                             # changing to another menu
                             Viewer.history.append(text) 
@@ -958,6 +2012,9 @@ class Viewer(object):
                             Viewer.cursor = 0
                         elif text == "Resume":
                             return
+                        elif text == "Neues Spiel":
+                            self.new_round()
+                            return
                         elif text == "zurück":
                             Viewer.history = Viewer.history[:-1] # remove last entry
                             Viewer.cursor = 0
@@ -972,162 +2029,14 @@ class Viewer(object):
                                 Viewer.height = y
                                 self.set_screenresolution()
                                 self.prepare_sprites()
-                        elif Viewer.name == "Fluffball 1":
-                            if text == "blau":
-                                self.fluff.fluffball_color = "fluffballb."
-                                self.fluff.create_image()
-                                self.fluff.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                            elif text == "violett":
-                                self.fluff.fluffball_color = "fluffballp."
-                                self.fluff.create_image()
-                                self.fluff.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                            elif text == "türkis":
-                                self.fluff.fluffball_color = "fluffballt."
-                                self.fluff.create_image()
-                                self.fluff.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                            elif text == "rot":
-                                self.fluff.fluffball_color = "fluffballr."
-                                self.fluff.create_image()
-                                self.fluff.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y)) 
-                            elif text == "gelb":
-                                self.fluff.fluffball_color = "fluffballgb."
-                                self.fluff.create_image()
-                                self.fluff.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                            elif text == "grün":
-                                self.fluff.fluffball_color = "fluffballgn."
-                                self.fluff.create_image()
-                                self.fluff.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))   
-                        elif Viewer.name == "Fluffball 2":
-                            if len(self.fluffgroup) >= 2:
-                                if text == "blau":
-                                    self.fluff2.fluffball_color = "fluffballb."
-                                    self.fluff2.create_image()
-                                    self.fluff2.rect.center  = (int(self.fluff2.pos.x), -int(self.fluff2.pos.y))
-                                elif text == "violett":
-                                    self.fluff2.fluffball_color = "fluffballp."
-                                    self.fluff2.create_image()
-                                    self.fluff2.rect.center  = (int(self.fluff2.pos.x), -int(self.fluff2.pos.y))
-                                elif text == "türkis":
-                                    self.fluff2.fluffball_color = "fluffballt."
-                                    self.fluff2.create_image()
-                                    self.fluff2.rect.center  = (int(self.fluff2.pos.x), -int(self.fluff2.pos.y))
-                                elif text == "rot":
-                                    self.fluff2.fluffball_color = "fluffballr."
-                                    self.fluff2.create_image()
-                                    self.fluff2.rect.center  = (int(self.fluff2.pos.x), -int(self.fluff2.pos.y))
-                                elif text == "gelb":
-                                    self.fluff2.fluffball_color = "fluffballgb."
-                                    self.fluff2.create_image()
-                                    self.fluff2.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "grün":
-                                    self.fluff2.fluffball_color = "fluffballgn."
-                                    self.fluff2.create_image()
-                                    self.fluff2.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                        elif Viewer.name == "Fluffball 3":
-                            if len(self.fluffgroup) >= 3:
-                                if text == "blau":
-                                    self.fluff3.fluffball_color = "fluffballb."
-                                    self.fluff3.create_image()
-                                    self.fluff3.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "violett":
-                                    self.fluff3.fluffball_color = "fluffballp."
-                                    self.fluff3.create_image()
-                                    self.fluff3.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "türkis":
-                                    self.fluff3.fluffball_color = "fluffballt."
-                                    self.fluff3.create_image()
-                                    self.fluff3.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "rot":
-                                    self.fluff3.fluffball_color = "fluffballr."
-                                    self.fluff3.create_image()
-                                    self.fluff3.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y)) 
-                                elif text == "gelb":
-                                    self.fluff3.fluffball_color = "fluffballgb."
-                                    self.fluff3.create_image()
-                                    self.fluff3.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "grün":
-                                    self.fluff3.fluffball_color = "fluffballgn."
-                                    self.fluff3.create_image()
-                                    self.fluff3.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                        elif Viewer.name == "Fluffball 4":
-                            if len(self.fluffgroup) >= 4:
-                                if text == "blau":
-                                    self.fluff4.fluffball_color = "fluffballb."
-                                    self.fluff4.create_image()
-                                    self.fluff4.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "violett":
-                                    self.fluff4.fluffball_color = "fluffballp."
-                                    self.fluff4.create_image()
-                                    self.fluff4.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "türkis":
-                                    self.fluff4.fluffball_color = "fluffballt."
-                                    self.fluff4.create_image()
-                                    self.fluff4.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "rot":
-                                    self.fluff4.fluffball_color = "fluffballr."
-                                    self.fluff4.create_image()
-                                    self.fluff4.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y)) 
-                                elif text == "gelb":
-                                    self.fluff4.fluffball_color = "fluffballgb."
-                                    self.fluff4.create_image()
-                                    self.fluff4.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))
-                                elif text == "grün":
-                                    self.fluff4.fluffball_color = "fluffballgn."
-                                    self.fluff4.create_image()
-                                    self.fluff4.rect.center  = (int(self.fluff.pos.x), -int(self.fluff.pos.y))  
-                        elif text == "2 Spieler":
-                            Game.players = 2
-                            if len(self.fluffgroup) > 2:
-                                self.fluff3.kill()
-                            if len(self.fluffgroup) > 3:
-                                self.fluff4.kill()
-                            if len(self.fluffgroup) < 2:
-                                self.fluff2 = Fluffball(bounce_on_edge=True, pos=pygame.math.Vector2(Viewer.width//1.33,-Viewer.height//4),fluffball_color=Viewer.getFluffFarbe())
-                                if len(self.fluffs) < 2:
-                                    self.fluffs.append(self.fluff2)
-                                Flytext(Viewer.width//2,Viewer.height//4,text="2 Fluffbälle im Spiel",color=(0,255,255),duration=5,fontsize=50)
-                        elif text == "1 Spieler":
-                            Game.players = 1
-                            if len(self.fluffgroup) > 3:
-                                self.fluff2.kill()
-                                self.fluff3.kill()
-                                self.fluff4.kill()
-                            if len(self.fluffgroup) > 2:
-                                self.fluff2.kill()
-                                self.fluff3.kill()
-                            if len(self.fluffgroup) > 1:
-                                self.fluff2.kill()
-                            
-                            
-                            Flytext(Viewer.width//2,Viewer.height//4,text="1 Fluffball im Spiel",color=(0,255,255),duration=5,fontsize=50) 
-                        elif text == "3 Spieler":
-                            Game.players = 3
-                            if len(self.fluffgroup) == 1:
-                                self.fluff2 = Fluffball(bounce_on_edge=True, pos=pygame.math.Vector2(Viewer.width//1.33,-Viewer.height//4),fluffball_color=Viewer.getFluffFarbe())
-                                if len(self.fluffs) < 2:
-                                    self.fluffs.append(self.fluff2)
-                            if len(self.fluffgroup) == 2:
-                                self.fluff3 = Fluffball(bounce_on_edge=True, pos=pygame.math.Vector2(Viewer.width//4,-Viewer.height//1.33),fluffball_color=Viewer.getFluffFarbe())
-                                if len(self.fluffs) < 3:
-                                    self.fluffs.append(self.fluff3)
-                            if len(self.fluffgroup) > 3:
-                                self.fluff4.kill()
-                            Flytext(Viewer.width//2,Viewer.height//4,text="3 Fluffbälle im Spiel",color=(0,255,255),duration=5,fontsize=50)
-                        elif text == "4 Spieler":    
-                            Game.players = 4
-                            if len(self.fluffgroup) == 1:
-                                self.fluff2 = Fluffball(bounce_on_edge=True, pos=pygame.math.Vector2(Viewer.width//4,-Viewer.height//1.33),fluffball_color=Viewer.getFluffFarbe())
-                                if len(self.fluffs) < 2:
-                                    self.fluffs.append(self.fluff2)
-                            if len(self.fluffgroup) == 2:
-                                self.fluff3 = Fluffball(bounce_on_edge=True, pos=pygame.math.Vector2(Viewer.width//1.33,-Viewer.height//4),fluffball_color=Viewer.getFluffFarbe())
-                                if len(self.fluffs) < 3:
-                                    self.fluffs.append(self.fluff3)
-                            if len(self.fluffgroup) == 3:
-                                self.fluff4 = Fluffball(bounce_on_edge=True, pos=pygame.math.Vector2(Viewer.width//1.33,-Viewer.height//1.33),fluffball_color=Viewer.getFluffFarbe())
-                                if len(self.fluffs) < 4:
-                                    self.fluffs.append(self.fluff4)
-                            Flytext(Viewer.width//2,Viewer.height//4,text="4 Fluffbälle im Spiel",color=(0,255,255),duration=5,fontsize=50)
+                        elif Viewer.name.startswith("Fluffball ") and text in Viewer.colornames:
+                            f = self.player_fluff(int(Viewer.name.split()[1]) - 1)
+                            if f is not None:
+                                f.fluffball_color = Viewer.colornames[text]
+                                f.create_image()
+                                f.rect.center  = (int(f.pos.x), -int(f.pos.y))
+                        elif Viewer.name == "Spieler" and text.endswith(" Spieler"):
+                            self.set_players(int(text.split()[0]))
                         elif Viewer.name == "Schwierigkeit":
                             if text == "Easy":
                                 Game.difficulty = 1
@@ -1141,26 +2050,55 @@ class Viewer(object):
                             elif text == "Impossible":
                                 Game.difficulty = 4
                                 self.collisions = 0
-                            self.prepare_sprites()
+                            self.new_round()
+                        elif Viewer.name == "Effekte":
+                            Game.quality_auto = text == "Automatisch"
+                            if text == "Automatisch":
+                                self.governor.set_level(0)
+                            elif text == "Hoch":
+                                self.governor.set_level(0)
+                            elif text == "Mittel":
+                                self.governor.set_level(2)
+                            elif text == "Niedrig":
+                                self.governor.set_level(4)
+                        elif Viewer.name == "Spielfeld":
+                            sizes = {"Normal": 1, "Groß": 2, "Riesig": 4}
+                            if text in sizes:
+                                Game.world_size = sizes[text]
+                                self.new_round()
+                        elif Viewer.name == "Kamera":
+                            if text != "zurück":
+                                Game.split_screen = text == "Geteilt"
+                        elif Viewer.name == "Bildrate":
+                            if text != "zurück":
+                                self.set_fps(int(text.split()[0]))
+                        elif Viewer.name == "Taktung":
+                            pacings = {"Schlafen": "tick", "Warten": "busy", "Hybrid": "hybrid", "VSync": "vsync"}
+                            if text in pacings:
+                                self.set_pacing(pacings[text])
                         elif Viewer.name == "Fullscreen":
                             if text == "Fullscreen Ein":
-                                #Viewer.menucommandsound.play()
                                 Viewer.fullscreen = True
                                 self.set_screenresolution()
                             elif text == "Fullscreen Aus":
-                                #Viewer.menucommandsound.play()
                                 Viewer.fullscreen = False
                                 self.set_screenresolution()
                             
                         
-            # ------delete everything on screen-------
-            self.screen.blit(self.background, (0, 0))
-            
-            # -------------- UPDATE all sprites -------             
-            self.flytextgroup.update(seconds)
+            if hasattr(self, "allgroup"):
+                # ------delete everything on screen, car wheels and food-------
+                self.draw_static()
+                
+                # -------------- UPDATE all sprites -------             
+                self.flytextgroup.update(seconds)
+                self.texttimers.advance(seconds)
 
-            # ----------- clear, draw , update, flip -----------------
-            self.allgroup.draw(self.screen)
+                # ----------- clear, draw , update, flip -----------------
+                self.draw_sprites()
+            else:
+                self.screen.blit(self.background, (0, 0))
+                write(self.screen, "Laden... {:3.0%}".format(self.loader.progress),
+                      x=200, y=Viewer.height-50, color=(0,0,0), fontsize=20)
             
             
             
@@ -1168,7 +2106,8 @@ class Viewer(object):
             pygame.draw.rect(self.screen,(200,200,200),(600,90,350,370))
             pygame.draw.rect(self.screen,(230,230,230),(1000,90,350,370))
             
-            self.flytextgroup.draw(self.screen)
+            if hasattr(self, "allgroup"):
+                self.flytextgroup.draw(self.screen)
 
             # --- paint menu ----
             # ---- name of active menu and history ---
@@ -1192,35 +2131,963 @@ class Viewer(object):
                 for y, line in enumerate(lines):
                     write(self.screen, text=line, x=Viewer.width//2-100, y=100+y*30, color=(255,0,255), fontsize=20)
            # ---- menu_images -----
-            if text in Viewer.menu_images:
+            if text in Viewer.menu_images and Viewer.menu_images[text] in Viewer.images:
                 self.screen.blit(Viewer.images[Viewer.menu_images[text]], (1020,100))
                 
             # -------- next frame -------------
             pygame.display.flip()
     
-    def run(self):
-        """The mainloop"""
+    def update_world(self, seconds):
+        """one simulation step: move all sprites, collisions, kitties.
+           no drawing, so it also runs without a screen (network server)"""
+        t = time.perf_counter()
+        self.frame += 1
+        self.scheduler.advance(seconds)
+        self.texttimers.advance(seconds)
+        t = self.profile("timers", t)
+        if Game.throttle_far and Game.world_size > 1:
+            self.update_throttled(seconds)
+        else:
+            if self.movegroup.added is not None:
+                self.wake_sleepers(seconds)    # throttle_far was switched off
+            self.movegroup.update(seconds)
+        t = self.profile("update", t)
+        self.collision_phase()
+        t = self.profile("collisions", t)
+        self.fluff_phase()
+        t = self.profile("fluffs", t)
+        self.kitty_phase()
+        t = self.profile("kitties", t)
+        # ---- everything that happened in this step: score, effects ----
+        events = self.events.drain()
+        self.score.consume(events)
+        self.effects.consume(events)
+        self.profile("events", t)
+        if self.telemetry is not None:
+            for event in events:
+                if isinstance(event, GameOver):
+                    self.telemetry.count("rounds.won" if event.won else "rounds.lost")
+        if self.stats is not None:
+            for event in events:
+                if isinstance(event, GameOver):
+                    self.finish_round("won" if event.won else "lost")
+        if self.memory is not None:
+            self.memory.frame(self.live_objects)
+
+    # ------ memory (see memtrack.py) ------
+    def track_memory(self, window=300):
+        """one sample per second, a warning if something grows for
+           window seconds. F3 shows it, F4 prints where the memory is"""
+        self.memory = memtrack.MemoryTracker(interval=1.0, window=window)
+        self.memory.start()
+
+    # ------ telemetry (see telemetry.py) ------
+    def export_telemetry(self, interval=10.0, textfile=None, statsd=None):
+        """frame times, sprites and memory every interval seconds to a
+           Prometheus text file and / or StatsD (host, port)"""
+        self.telemetry = telemetry.Telemetry(interval, textfile, statsd)
+        self.telemetry.start()
+
+    # ------ round statistics (see roundstats.py) ------
+    def record_stats(self, path=roundstats.DEFAULT_FILE, cabinet=None):
+        """every round into the SQLite file path, written by a background thread"""
+        self.stats = roundstats.StatsStore(path, cabinet)
+        self.session = self.stats.start_session(Game.difficulty, Game.players, Game.rng.seed)
+
+    def round_frame(self, milliseconds):
+        """work time of one frame of the round"""
+        frames = self.round_frames
+        frames[0] += 1
+        frames[1] += milliseconds
+        if milliseconds > frames[2]:
+            frames[2] = milliseconds
+
+    def finish_round(self, outcome):
+        """queues the round (won, lost or aborted), only once per round
+           and only if it was played at all"""
+        if self.stats is None or self.round_done or self.round_frames[0] == 0:
+            return
+        self.round_done = True
+        frames, milliseconds, worst = self.round_frames
+        fluffs = [(slot, f.fluffball_color, self.eaten[slot]) for slot, f in enumerate(self.players) if f is not None]
+        self.stats.record_round(self.session, outcome, round(self.playtime - self.round_start, 2),
+                                self.collisions, len(self.foodgroup), Game.difficulty, len(fluffs),
+                                frames, milliseconds / frames, worst, fluffs)
+
+    def close_stats(self):
+        """the running round counts as aborted, then everything is written"""
+        if self.stats is not None:
+            self.finish_round("aborted")
+            self.stats.end_session(self.session)
+            self.stats.close()
+
+    # ------ sampling profiler (see profiler.py) ------
+    def toggle_sampling(self):
+        """F6: starts the sampling profiler, or stops it and writes the
+           stacks to self.flamegraph"""
+        if self.sampler.toggle():
+            text = "Profiler an"
+        else:
+            self.sampler.write(self.flamegraph)
+            text = "Profiler: " + self.flamegraph
+        Flytext(Viewer.width//2,Viewer.height//4,text=text,color=(0,255,255),duration=2,fontsize=50, fixed=True)
+
+    def stop_sampling(self):
+        if self.sampler.running:
+            self.sampler.stop()
+            self.sampler.write(self.flamegraph)
+
+    def telemetry_gauges(self):
+        """{ name: value }, once per telemetry interval"""
+        gauges = {"sprites." + name: len(getattr(self, name)) for name in
+                  ("allgroup", "staticgroup", "fluffgroup", "kittygroup", "pawgroup",
+                   "foodgroup", "car_wheelgroup", "explosiongroup", "flytextgroup")}
+        gauges["vectorsprite_numbers"] = len(VectorSprite.numbers)
+        gauges["rotated_images"] = len(VectorSprite.rotated)
+        gauges["collisions"] = self.collisions
+        gauges["quality"] = Game.quality
+        return gauges
+
+    def live_objects(self):
+        """{ name: number } of everything that could pile up"""
+        counts = collections.Counter(type(s).__name__ for s in self.allgroup)
+        counts.update(type(s).__name__ for s in self.staticgroup)
+        counts["VectorSprite.numbers"] = len(VectorSprite.numbers)
+        counts["rotated images"] = len(VectorSprite.rotated)
+        counts["fonts"] = len(fonts)
+        counts["timers"] = len(self.scheduler.heap)    # cancelled ones too
+        counts["text timers"] = len(self.texttimers.heap)
+        counts["static tiles"] = len(self.staticgroup.tiles)
+        return counts
+
+    def update_throttled(self, seconds):
+        """sprites far away from every camera (more than an eighth of a
+           screen outside of it) sleep: they are only updated every
+           Game.throttle_every frames, with the time they slept, and not
+           drawn (show_sleeper).
+           who sleeps is sorted out every Game.throttle_every frames, in
+           between only the awake sprites and one bucket of sleepers are
+           looked at, not all of them. Fluffballs, texts and new sprites
+           (crumbs, ...) are awake. resting sleepers (sitting kitties) are
+           in no bucket, they wait for what moves them (VectorSprite.catch_up).
+           the paws of far kitties are not here at all, see kitty_far"""
+        every = Game.throttle_every
+        if self.movegroup.added is None or self.frame % every == 0:
+            self.sort_sleepers(seconds)
+        else:
+            self.awake.extend(self.movegroup.added)
+        self.movegroup.added = []
+        moving = self.movegroup.spritedict    # dead ones and the paws of far kitties are not in it
+        for sprite in self.awake:
+            if sprite in moving:
+                sprite.update(seconds)
+        now = self.scheduler.now
+        for sprite in self.sleepers[self.frame % len(self.sleepers)]:
+            if sprite in moving:
+                sprite.update(now - sprite.updated)
+                sprite.updated = now
+
+    def sort_sleepers(self, seconds):
+        """self.awake and self.sleepers (Game.throttle_every buckets).
+           who wakes up first gets the time it slept"""
+        active = [cam.rect.inflate(cam.rect.width // 4, cam.rect.height // 4) for cam in self.cameras]
+        sprites = self.movegroup.sprites()
+        rects = [sprite.rect for sprite in sprites]
+        near = set()
+        for area in active:
+            near.update(area.collidelistall(rects))
+        last = self.scheduler.now - seconds    # time of the last update of the awake ones
+        self.awake = []
+        self.sleepers = [[] for _ in range(Game.throttle_every)]
+        for i, sprite in enumerate(sprites):
+            if i in near or not isinstance(sprite, VectorSprite) or isinstance(sprite, Fluffball):
+                if getattr(sprite, "updated", None) is not None:
+                    if last > sprite.updated:
+                        sprite.update(last - sprite.updated)
+                    sprite.updated = None
+                    self.show_sleeper(sprite, True)
+                self.awake.append(sprite)
+            else:
+                if sprite.updated is None:
+                    sprite.updated = last
+                    self.show_sleeper(sprite, False)
+                if not sprite.resting():
+                    self.sleepers[i % Game.throttle_every].append(sprite)
+
+    def wake_sleepers(self, seconds):
+        """everybody is awake again, with the time they slept"""
+        last = self.scheduler.now - seconds
+        for sprite in self.movegroup.sprites():
+            if getattr(sprite, "updated", None) is not None:
+                if last > sprite.updated:
+                    sprite.update(last - sprite.updated)
+                sprite.updated = None
+        for sprite in list(self.allgroup.hidden):
+            self.allgroup.show(sprite)
+        self.movegroup.added = None
+
+    def show_sleeper(self, sprite, shown):
+        """nobody sees a sleeper, it is not drawn. a kitty with its paws"""
+        for s in [sprite] + getattr(sprite, "paws", []):
+            if shown:
+                self.allgroup.show(s)
+            else:
+                self.allgroup.hide(s)
+
+    # ------ cameras ------
+    def update_cameras(self):
+        """one camera for all Fluffballs, or one for each (Game.split_screen)"""
+        fluffs = self.player_fluffs()
+        n = max(1, len(fluffs)) if Game.split_screen else 1
+        world = (Viewer.world_width, Viewer.world_height)
+        if len(self.cameras) != n or self.cameras[0].world.size != world:
+            self.cameras = [camera.Camera(r, world) for r in camera.viewports(Viewer.screenrect(), n)]
+        if Game.split_screen:
+            for cam, f in zip(self.cameras, fluffs):
+                cam.look_at(f.rect.center)
+        else:
+            self.cameras[0].follow([f.rect.center for f in fluffs])
+
+    def draw_static(self, crazy=False):
+        """background, car wheels and food of every camera"""
+        if crazy:
+            # only for the eyes: its own stream, so drawing or not drawing
+            # does not change the world
+            rnd = Game.rng.draw
+            color = (rnd.randint(0,255), rnd.randint(0,255), rnd.randint(0,255))
+        for cam in self.cameras:
+            surface = self.screen.subsurface(cam.viewport)
+            if crazy:
+                surface.fill(color)
+                self.staticgroup.draw_sprites(surface, cam)
+            else:
+                self.staticgroup.draw_view(surface, cam)
+
+    def draw_sprites(self):
+        """the moving sprites, only those that a camera shows.
+           texts with fixed=True are on the screen, not in the world"""
+        self.allgroup.draw_calls = self.allgroup.blitted = 0
+        for cam in self.cameras:
+            self.allgroup.draw(self.screen.subsurface(cam.viewport), cam.rect, cam.offset)
+        if len(self.cameras) > 1:
+            for cam in self.cameras:
+                pygame.draw.rect(self.screen, (0,0,0), cam.viewport, 2)
+        texts = [t for t in self.flytextgroup if t.fixed]    # not every sprite of the world
+        if texts:
+            self.allgroup.draw(self.screen, fixed=True, sprites=sorted(texts, key=self.allgroup.get_layer_of_sprite))
+        self.draw_counts = (self.allgroup.draw_calls, self.allgroup.blitted)
+
+    def profile(self, phase, start):
+        """remembers the (smoothed) milliseconds since start for the overlay.
+           returns the time now, for the next phase"""
+        now = time.perf_counter()
+        ms = (now - start) * 1000
+        old = self.phase_times.get(phase, 0.0)
+        self.phase_times[phase] = old + (ms - old) * 0.1
+        self.last_phase_times[phase] = ms
+        return now
+
+    def draw_overlay(self):
+        """profiler overlay (F3): milliseconds per phase, quality, sprites"""
+        lines = ["{:<11}{:6.2f} ms".format(phase, ms) for phase, ms in self.phase_times.items()]
+        lines.append("{:<11}{:6.2f} ms".format("frame", self.governor.worktime))
+        lines.append("quality    {:4.0%}{}".format(Game.quality, " (auto)" if Game.quality_auto else ""))
+        lines.append("rotation   {:3} deg".format(Game.rotation_step))
+        lines.append("sprites    {:5}".format(len(self.allgroup)))
+        lines.append("blits      {:5} in {} calls".format(self.draw_counts[1], self.draw_counts[0]))
+        lines.extend(self.pacer.report())
+        lines.extend(self.sfx.report())
+        if self.telemetry is not None:
+            lines.extend(self.telemetry.report())
+        if self.stats is not None:
+            lines.extend(self.stats.report())
+        if self.sampler.running or self.sampler.samples:
+            lines.extend(self.sampler.report())
+        if self.memory is not None:
+            lines.extend(self.memory.report())
+        pygame.draw.rect(self.screen, (255,255,255), (5, 35, 250, 20 + len(lines) * 18))
+        for y, line in enumerate(lines):
+            write(self.screen, line, x=10, y=45 + y * 18, color=(0,0,120), fontsize=15)
+
+    def collision_phase(self):
+        """collisions change the movement of the Fluffballs. everything else
+           (text, crumbs, score) only goes into self.events"""
+        # a car wheel counts if there was food left before this step, also
+        # when the same step eats the last one
+        hungry = len(self.foodgroup) > 0
+        # car wheels and food that a fast Fluffball went through in this step
+        sweeps = {f: self.sweep(f) for f in self.fluffgroup} if Game.swept else {}
+        # -----------collision detection between fluffballs and food -----
+        for f in self.fluffgroup:
+            tunnel, passed = sweeps.get(f, (None, []))
+            if tunnel is None:
+                crashgroup = [e for e in self.staticgroup.query(f.rect)
+                              if e in self.foodgroup and pygame.sprite.collide_mask(f, e)]
+            else:
+                crashgroup = []   # bounced back from a car wheel before it got there
+            crashgroup += [e for e in passed if e in self.foodgroup and e not in crashgroup]
+            for e in crashgroup:
+                e.kill()
+                self.events.emit(FoodEaten(f, e, pygame.math.Vector2(e.pos)))
+        # ----------collision detection between fluffballs and car wheel----
+        for f in self.fluffgroup:
+            crashgroup = [z for z in self.staticgroup.query(f.rect)
+                          if z in self.car_wheelgroup and pygame.sprite.collide_mask(f, z)]
+            tunnel, passed = sweeps.get(f, (None, []))
+            if not crashgroup and tunnel is not None:
+                # back to where it hit the car wheel, then bounce as usual
+                t, z = tunnel
+                f.pos = f.last_pos.lerp(f.pos, t)
+                f.rect.center = (round(f.pos.x), -round(f.pos.y))
+                crashgroup = [z]
+            for z in crashgroup:
+                f.reifendamage +=100
+                #Fluffball makes a little jump if bouncing against a car wheel
+                f.move = f.move*-0.8
+                j = f.move.normalize()*25
+                f.pos += j
+                self.events.emit(TireHit(f, z, pygame.math.Vector2(f.pos), hungry))
+
+    def fluff_phase(self):
+        """Fluffball against Fluffball with the masks, one pair after the
+           other. with Game.batch_fluffs numpy first picks the pairs that
+           may touch or went through each other (fluff_pairs), the others
+           are not tested. a swept pair moves, then the pairs of the rest
+           are not known any more: they are all tested like without numpy"""
+        fluffs = self.fluffgroup.sprites()
+        pairs = None
+        if Game.batch_fluffs and numpy is not None and len(fluffs) > 1:
+            pairs = fluff_pairs(fluffs)
+        for k, f in enumerate(fluffs):
+            if pairs is None:
+                crashgroup = pygame.sprite.spritecollide(f, self.fluffgroup, False, pygame.sprite.collide_mask)
+            else:
+                crashgroup = [fluffs[b] for b in pairs[0][k] if pygame.sprite.collide_mask(f, fluffs[b])]
+            for otherf in crashgroup:
+                if f.number > otherf.number:
+                    elastic_collision(f, otherf)   
+                    self.events.emit(FluffCollision(f, otherf))
+            if not Game.swept:
+                continue
+            start = 0
+            if pairs is not None:
+                for b in pairs[1][k]:
+                    otherf = fluffs[b]
+                    if f.number > otherf.number and otherf not in crashgroup and self.sweep_fluffs(f, otherf):
+                        pairs, start = None, b + 1
+                        break
+                else:
+                    continue
+            for otherf in fluffs[start:]:
+                if f.number > otherf.number and otherf not in crashgroup:
+                    if self.sweep_fluffs(f, otherf):
+                        pairs = None
+
+    def sweep(self, f):
+        """car wheels and food that Fluffball f went through in this step
+           without touching them at the end (too fast for collide_mask).
+           returns (tunnel, passed): tunnel is (time, car wheel) for the
+           first car wheel or None, passed the food before it"""
+        step = f.pos - f.last_pos
+        if step.length_squared() < 1:
+            return None, []
+        area = f.rect.union(f.rect.move(-round(step.x), round(step.y)))
+        hits = []
+        for s in self.staticgroup.query(area):
+            radius = f.radius + s.radius
+            if f.pos.distance_squared_to(s.pos) <= radius * radius:
+                continue    # touching at the end: collide_mask decides
+            t = time_of_impact(f.last_pos, step, s.pos, pygame.math.Vector2(0, 0), radius)
+            if t is not None:
+                hits.append((t, s))
+        hits.sort(key=lambda hit: hit[0])
+        passed = []
+        for t, s in hits:
+            if s in self.car_wheelgroup:
+                return (t, s), passed
+            passed.append(s)
+        return None, passed
+
+    def sweep_fluffs(self, f, otherf):
+        """two fast Fluffballs that went through each other in this step:
+           both back to where they met, then elastic_collision.
+           returns True if they met"""
+        radius = f.radius + otherf.radius
+        if f.pos.distance_squared_to(otherf.pos) <= radius * radius:
+            return False    # touching at the end: collide_mask decides
+        t = time_of_impact(f.last_pos, f.pos - f.last_pos, otherf.last_pos,
+                           otherf.pos - otherf.last_pos, radius)
+        if t is None:
+            return False
+        for s in (f, otherf):
+            s.pos = s.last_pos.lerp(s.pos, t)
+            s.rect.center = (round(s.pos.x), -round(s.pos.y))
+        elastic_collision(f, otherf)
+        self.events.emit(FluffCollision(f, otherf))
+        return True
+
+    def kitty_phase(self):
+        """paws and flapping, kitties throw Fluffballs away.
+           level of detail: kitties near a Fluffball (Game.kitty_near) every
+           frame, the far ones round-robin, Game.kitty_budget per frame.
+           the paws of a far kitty are not updated (kitty_far) and it waits
+           in self.kittygrid: only the near ones and the grid cells around
+           the Fluffballs are looked at, not every kitty"""
+        fluffs = self.fluffgroup.sprites()
+        near = Game.kitty_near ** 2
+        if not Game.kitty_lod:
+            for k in self.far_kitties[:]:
+                self.wake_kitty(k)
+                self.near_kitties.append(k)
+        self.near_kitties.extend(self.kittygroup.added)    # new kitties are near
+        self.kittygroup.added = []
+        still = []
+        for k in self.near_kitties:
+            if not k.alive():
+                continue
+            if not Game.kitty_lod or any(k.pos.distance_squared_to(f.pos) < near for f in fluffs):
+                still.append(k)
+            else:
+                self.kitty_far(k)
+        reach = Game.kitty_near
+        for f in fluffs:
+            area = pygame.Rect(0, 0, 2 * reach, 2 * reach)
+            area.center = f.rect.center
+            for k in self.kittygrid.query(area):
+                if not k.near and k.alive() and k.pos.distance_squared_to(f.pos) < near:
+                    self.wake_kitty(k)
+                    still.append(k)
+        self.near_kitties = still
+        for k in still:
+            self.kitty_behavior(k, fluffs)
+        far = self.far_kitties
+        if far:
+            start = self.kitty_slice % len(far)
+            n = min(len(far), Game.kitty_budget)
+            for i in range(start, start + n):
+                k = far[i % len(far)]
+                if k.alive():
+                    self.kitty_behavior(k, ())   # too far away for playing
+            self.kitty_slice = start + n
+
+    def kitty_far(self, k):
+        """the paws of k are not updated in every step anymore, they only
+           follow it (Kitty.follow) and get the time they missed in wake_kitty"""
+        k.near = False
+        now = self.scheduler.now
+        for p in k.paws:
+            if p.updated is None:    # else it sleeps already (throttle_far)
+                p.updated = now
+            self.movegroup.remove(p)
+        k.spot = None
+        k.gridpoint = k.rect.center
+        self.kittygrid.insert(k, k.gridpoint)
+        self.far_kitties.append(k)
+
+    def wake_kitty(self, k):
+        """a Fluffball came near: the paws of k are updated again"""
+        self.kittygrid.remove(k, k.gridpoint)
+        self.far_kitties.remove(k)
+        k.near = True
+        now = self.scheduler.now
+        for p in k.paws:
+            if p.alive():
+                if now > p.updated:
+                    p.update(now - p.updated)
+                self.movegroup.add(p)
+            p.updated = None
+        if self.movegroup.added is not None:
+            self.movegroup.added = None    # throttle_far sorts the sleepers again
+
+    def kitty_behavior(self, k, fluffs):
+        # ----- paws in idle position or flapping ----- 
+        for p in k.paws:
+            p.stop_play()
+        if k.state == "flap":
+            for p in k.paws:
+                p.flap()
+        for f in fluffs:
+            # --------- kitty plays with ball -------
+            diff= f.pos - (k.pos - pygame.math.Vector2(0,0))
+            diff.y *= -1
+            #print ("Test " + str(diff.length()))
+            if diff.length()<100:
+
+                a=diff.angle_to(pygame.math.Vector2(1,0))
+                self.events.emit(KittyPlay(k, f, a))
+                
+                f.move = pygame.math.Vector2(0,0)
+                rv = pygame.math.Vector2(Game.rng.physics.random()*150+150,0)
+                rv=rv.rotate(Game.rng.physics.randint(0,360))
+                f.move+=rv
+
+    # ------ savegames ------
+    def world_to_bytes(self):
+        """the whole world in the compact savegame format"""
+        sprites = sorted(VectorSprite.numbers.values(), key=lambda sprite: sprite.number)
+        sprites = [sprite for sprite in sprites if sprite.__class__ in SAVE_KINDS]
+        flytexts = list(self.flytextgroup)
+        slots = {id(f): slot for slot, f in enumerate(self.players) if f is not None and f.alive()}
+        kitty1 = self.kitty1.number if self.kitty1.alive() else -1
+        data = [SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, VectorSprite.number, len(sprites),
+                                 len(flytexts), self.playtime, self.collisions, Game.difficulty,
+                                 Game.players, self.gameOver, self.exittime, kitty1, Game.world_size)]
+        data.append(self.random_to_bytes())
+        for sprite in sprites:
+            name = sprite.__class__.__name__
+            flags = 0
+            for bit, flag in enumerate(SAVE_FLAGS):
+                if getattr(sprite, flag):
+                    flags |= 1 << bit
+            data.append(SAVE_SPRITE.pack(SAVE_KINDS.index(sprite.__class__), sprite.number,
+                        sprite.pos.x, sprite.pos.y, sprite.move.x, sprite.move.y, sprite.age,
+                        sprite.angle, sprite.hitpoints,
+                        math.nan if sprite.max_age is None else sprite.max_age,
+                        -1 if sprite.bossnumber is None else sprite.bossnumber,
+                        flags, sprite._layer))
+            if name == "Fluffball":
+                data.append(SAVE_EXTRA[name].pack(Viewer.FluffFarbList.index(sprite.fluffball_color),
+                            slots.get(id(sprite), 255), sprite.reifendamage))
+            elif name == "Kitty":
+                data.append(SAVE_EXTRA[name].pack(sprite.state == "flap", sprite.glow, sprite.glow2,
+                            sprite.sleep, sprite.sleep_time, sprite.glow_time, sprite.glow2_time,
+                            sprite.i, sprite.chance_to_flap))
+            elif name == "Paw":
+                data.append(SAVE_EXTRA[name].pack(sprite.side == "right"))
+            elif name == "Crumb":
+                data.append(SAVE_EXTRA[name].pack(*sprite.color[:3], sprite.gravity.x,
+                            sprite.gravity.y, sprite.acc))
+            elif name == "Spark":
+                data.append(SAVE_EXTRA[name].pack(*sprite.color[:3], sprite.gravity.x, sprite.gravity.y))
+        for t in flytexts:
+            text = t.text.encode("utf-8")
+            data.append(SAVE_FLYTEXT.pack(t.x, t.y, t.dx, t.dy, t.duration, t.acc, t.time,
+                                          t.r, t.g, t.b, t.fontsize, t.fixed, len(text)))
+            data.append(text)
+        return b"".join(data)
+
+    def random_to_bytes(self):
+        """the state of every stream and batch of Game.rng"""
+        def packed_name(name):
+            name = name.encode("utf-8")
+            return struct.pack("!B", len(name)) + name
+        states = Game.rng.getstate()
+        data = [SAVE_STREAMS.pack(Game.rng.seed, len(states))]
+        for name, (version, mt, gauss) in states.items():
+            data.append(packed_name(name))
+            data.append(SAVE_RANDOM.pack(version, *mt, gauss is not None, gauss or 0.0))
+        batches = Game.rng.getbatches()
+        data.append(SAVE_BATCHES.pack(len(batches)))
+        for name, state in batches.items():
+            data.append(packed_name(name))
+            if isinstance(state, dict):
+                pcg = state["state"]
+                data.append(b"\x01" + SAVE_PCG64.pack(pcg["state"] >> 64, pcg["state"] & (2**64 - 1),
+                            pcg["inc"] >> 64, pcg["inc"] & (2**64 - 1), state["has_uint32"], state["uinteger"]))
+            else:
+                version, mt, gauss = state
+                data.append(b"\x00" + SAVE_RANDOM.pack(version, *mt, gauss is not None, gauss or 0.0))
+        return b"".join(data)
+
+    def random_from_bytes(self, data, offset, version):
+        """sets Game.rng from random_to_bytes at offset, returns the offset after it"""
+        def unpack_name(offset):
+            length = data[offset]
+            return data[offset+1:offset+1+length].decode("utf-8"), offset + 1 + length
+        def unpack_random(offset):
+            rnd = SAVE_RANDOM.unpack_from(data, offset)
+            return (rnd[0], rnd[1:626], rnd[627] if rnd[626] else None), offset + SAVE_RANDOM.size
+        seed, nstreams = SAVE_STREAMS.unpack_from(data, offset)
+        offset += SAVE_STREAMS.size
+        states = {}
+        for _ in range(nstreams):
+            name, offset = unpack_name(offset)
+            states[name], offset = unpack_random(offset)
+        batches = {}
+        if version >= 4:
+            nbatches, = SAVE_BATCHES.unpack_from(data, offset)
+            offset += SAVE_BATCHES.size
+            for _ in range(nbatches):
+                name, offset = unpack_name(offset)
+                kind = data[offset]
+                offset += 1
+                if kind == 1:
+                    high, low, inc_high, inc_low, has_uint32, uinteger = SAVE_PCG64.unpack_from(data, offset)
+                    offset += SAVE_PCG64.size
+                    batches[name] = {"bit_generator": "PCG64",
+                                     "state": {"state": high << 64 | low, "inc": inc_high << 64 | inc_low},
+                                     "has_uint32": has_uint32, "uinteger": uinteger}
+                else:
+                    batches[name], offset = unpack_random(offset)
+        Game.rng.reseed(seed)
+        Game.rng.setstate(states)
+        Game.rng.setbatches(batches)
+        return offset
+
+    def world_from_bytes(self, data):
+        """replaces the world with the one from world_to_bytes"""
+        self.loader.finish()
+        version = struct.unpack_from("!H", data, 4)[0]
+        header, flytext = (SAVE_HEADER_V1, SAVE_FLYTEXT_V1) if version == 1 else (SAVE_HEADER, SAVE_FLYTEXT)
+        (magic, version, number, nsprites, nflytexts, playtime, collisions, difficulty,
+         players, gameover, exittime, kitty1, *world_size) = header.unpack_from(data)
+        if magic != SAVE_MAGIC or version > SAVE_VERSION:
+            raise ValueError("not a Fluffball savegame (or from a newer version)")
+        offset = header.size
+        Game.world_size = world_size[0] if world_size else 1
+        self.set_world()
+        if version < 3:
+            offset += SAVE_RANDOM.size   # the old global random state, not used anymore
+        else:
+            # before any sprite is made: the sprites draw random numbers
+            # while loading, the same ones every time
+            offset = self.random_from_bytes(data, offset, version)
+        self.teardown_world()
+        self.make_groups()
+        slots = {}
+        for _ in range(nsprites):
+            (kind, nr, x, y, mx, my, age, angle, hitpoints, max_age, boss,
+             flags, layer) = SAVE_SPRITE.unpack_from(data, offset)
+            offset += SAVE_SPRITE.size
+            cls = SAVE_KINDS[kind]
+            name = cls.__name__
+            kwargs = {"pos": pygame.math.Vector2(x, y), "move": pygame.math.Vector2(mx, my),
+                      "hitpoints": hitpoints, "angle": angle}
+            for bit, flag in enumerate(SAVE_FLAGS):
+                kwargs[flag] = bool(flags & (1 << bit))
+            if boss >= 0:
+                kwargs["bossnumber"] = boss
+            if not math.isnan(max_age):
+                kwargs["max_age"] = max_age
+            extra = None
+            if name in SAVE_EXTRA:
+                extra = SAVE_EXTRA[name].unpack_from(data, offset)
+                offset += SAVE_EXTRA[name].size
+            if name == "Fluffball":
+                kwargs["fluffball_color"] = Viewer.FluffFarbList[extra[0]]
+            elif name == "Paw":
+                kwargs["side"] = "right" if extra[0] else "left"
+            elif name in ("Crumb", "Spark"):
+                kwargs["color"] = extra[:3]
+                kwargs["gravity"] = pygame.math.Vector2(extra[3], extra[4])
+                if name == "Crumb":
+                    kwargs["acc"] = extra[5]
+            if nr in VectorSprite.numbers:
+                # paws are made by their kitty
+                sprite = VectorSprite.numbers[nr]
+                sprite.pos = kwargs["pos"]
+                sprite.move = kwargs["move"]
+            else:
+                VectorSprite.number = nr
+                sprite = cls(**kwargs)
+            sprite.age = age
+            sprite.schedule_expiry()
+            if sprite._layer != layer:
+                self.allgroup.change_layer(sprite, layer)
+            if sprite.angle != angle:
+                sprite.set_angle(angle)
+            if name == "Fluffball":
+                sprite.reifendamage = extra[2]
+                if extra[1] != 255:
+                    slots[extra[1]] = sprite
+            elif name == "Kitty":
+                flap, sprite.glow, sprite.glow2, sprite.sleep = (bool(b) for b in extra[:4])
+                sprite.state = "flap" if flap else "sit"
+                sprite.sleep_time, sprite.glow_time, sprite.glow2_time, sprite.i = extra[4:8]
+                sprite.chance_to_flap = extra[8]
+                if sprite.sleep:
+                    sprite.image = sprite.sleep_image
+                    sprite.rect = sprite.image.get_rect()
+                else:
+                    sprite.handle_image(sprite.images[sprite.i])
+                sprite.schedule()   # timers are not saved, draw them again
+            sprite.rect.center = (round(sprite.pos.x), -round(sprite.pos.y))
+        for _ in range(nflytexts):
+            x, y, dx, dy, duration, acc, t, r, g, b, fontsize, *fixed, length = flytext.unpack_from(data, offset)
+            offset += flytext.size
+            text = data[offset:offset+length].decode("utf-8")
+            offset += length
+            f = Flytext(x, y, text, (r, g, b), dx, dy, duration, acc, fontsize=fontsize,
+                        fixed=bool(fixed and fixed[0]))
+            f.time = t
+            f.schedule_expiry()
+        # ---- Viewer and Game state ----
+        VectorSprite.number = number
+        self.playtime, self.collisions, self.exittime = playtime, collisions, exittime
+        self.round_start = self.playtime   # the statistics count from loading on
+        self.gameOver = bool(gameover)
+        Game.difficulty, Game.players = difficulty, players
+        if kitty1 in VectorSprite.numbers:
+            self.kitty1 = VectorSprite.numbers[kitty1]
+        for slot, f in slots.items():
+            if slot < Viewer.max_players:
+                self.players[slot] = f
+
+    def save_game(self, filename="fluffball.sav"):
+        with open(filename, "wb") as f:
+            f.write(self.world_to_bytes())
+
+    def load_game(self, filename="fluffball.sav"):
+        with open(filename, "rb") as f:
+            self.world_from_bytes(f.read())
+
+    def crash_dump(self):
+        """saves the world after a crash, for finding the bug later"""
+        filename = time.strftime("crash-%Y%m%d-%H%M%S.sav")
+        try:
+            self.save_game(filename)
+            print("world saved in", filename, "(seed {})".format(Game.rng.seed))
+        except Exception as e:
+            print("no crash dump:", e)
+
+    # ------ network server (see fluffnet.py) ------
+
+    def net_join(self):
+        """a client wants to play. returns its player slot or None"""
+        for slot in range(Viewer.max_players):
+            if slot not in self.netplayers:
+                self.netplayers.add(slot)
+                self.spawn_player(slot)
+                return slot
+        return None
+
+    def net_leave(self, slot):
+        self.netplayers.discard(slot)
+        f = self.player_fluff(slot)
+        if f is not None and slot > 0:
+            f.kill()
+
+    def net_input(self, slot, x, y, seconds):
+        """like handle_input, x and y between -1 and 1"""
+        f = self.player_fluff(slot)
+        if f is not None and (x != 0 or y != 0):
+            push = Game.push * seconds
+            f.move += pygame.math.Vector2(x * push, y * push)
+
+    def net_step(self, seconds):
+        """one server tick. a new round starts after game over.
+           returns False on QUIT (SDL turns SIGTERM into QUIT)"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+        self.playtime += seconds
+        if self.gameOver and self.playtime > self.exittime:
+            self.prepare_sprites()
+            for slot in self.netplayers:
+                self.spawn_player(slot)
+        start = time.perf_counter()
+        self.update_world(seconds)
+        milliseconds = (time.perf_counter() - start) * 1000
+        if self.telemetry is not None:
+            self.telemetry.frame(milliseconds, self.telemetry_gauges)
+        if self.stats is not None:
+            self.round_frame(milliseconds)
+        return True
+
+    def net_entities(self):
+        """{ number: (kind, frame, x, y, angle) } of everything a client needs to draw"""
+        entities = {}
+        kinds = self.netkinds
+        for s in self.staticgroup.sprites() + self.allgroup.sprites():
+            kind = kinds.get(s.__class__.__name__)
+            if kind is None:
+                continue
+            frame = 0
+            if kind == 1:
+                frame = Viewer.FluffFarbList.index(s.fluffball_color)
+            elif kind == 2:
+                frame = 15 if s.sleep else s.i
+            x, y = s.rect.center
+            entities[s.number] = (kind, frame, max(-32768, min(32767, x)),
+                                  max(-32768, min(32767, y)), int(s.angle) % 360)
+        return entities
+
+    def shm_records(self):
+        """net_entities with the layer, the records of shmframes.SharedFrames"""
+        return [(number, kind, frame, x, y, angle, VectorSprite.numbers[number]._layer)
+                for number, (kind, frame, x, y, angle) in self.net_entities().items()]
+
+    def net_info(self):
+        flags = fluffnet.FLAG_GAMEOVER if self.gameOver else 0
+        return self.collisions, len(self.foodgroup), flags
+
+    def serve(self, host="0.0.0.0", port=fluffnet.DEFAULT_PORT, tickrate=30):
+        """run as authoritative network server without screen"""
+        self.netplayers = set()  # occupied player slots
+        self.netkinds = {name: nr + 1 for nr, name in enumerate(fluffnet.KINDS)}
+        fluffnet.run_server(self, host, port, tickrate)
+
+    def client_run(self, host, port=fluffnet.DEFAULT_PORT):
+        """play on a Fluffball server"""
+        self.finish_loading()
+        try:
+            asyncio.run(self.client_loop(host, port))
+        finally:
+            pygame.quit()
+
+    kind_images = {2: ["kitty{}".format(i) for i in range(15)] + ["kittys"],
+                   4: "donut", 5: "cookie", 6: "car wheel"}   # fluffnet.KINDS, 1 and 3 are special
+
+    def draw_entities(self, entities, order, paws):
+        """draws { number: (kind, frame, x, y, angle) } of the network or
+           the simulation process, in order (a list of numbers).
+           paws: { angle: rotated paw image }"""
+        images = Viewer.kind_images
+        for number in order:
+            kind, frame, x, y, angle = entities[number]
+            if kind == 1:
+                image = Viewer.images[Viewer.FluffFarbList[frame % len(Viewer.FluffFarbList)]]
+            elif kind == 3:
+                a = int(angle) % 360
+                if a not in paws:
+                    paws[a] = pygame.transform.rotate(Viewer.images["paw"], a)
+                image = paws[a]
+            elif kind == 2:
+                image = Viewer.images[images[2][min(frame, 15)]]
+            else:
+                image = Viewer.images[images[kind]]
+            self.screen.blit(image, image.get_rect(center=(round(x), round(y))))
+
+    def draw_info(self, collisions, food, flags, fps):
+        write(self.screen, "FPS: {:8.3}".format(fps), x=10, y=10)
+        write(self.screen, "Collisions:{}".format(collisions), x=Viewer.width-200, y=10)
+        if flags & fluffnet.FLAG_GAMEOVER:
+            text = "Alles gemampft... Päuschen!" if food == 0 else "Game over"
+            write(self.screen, text, x=Viewer.width//2, y=Viewer.height//2, color=(0,0,255),
+                  fontsize=80, center=True)
+
+    async def client_loop(self, host, port):
+        loop = asyncio.get_running_loop()
+        client = await fluffnet.connect(host, port)
+        paws = {}   # { angle: rotated paw image }
+        running = True
+        next_frame = loop.time()
+        while running:
+            next_frame += 1 / self.fps
+            await asyncio.sleep(max(0, next_frame - loop.time()))
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    running = False
+                else:
+                    self.handle_joystick_event(event)
+            # ---- input: arrow keys or first gamepad ----
+            pressed_keys = pygame.key.get_pressed()
+            x = pressed_keys[pygame.K_RIGHT] - pressed_keys[pygame.K_LEFT]
+            y = pressed_keys[pygame.K_UP] - pressed_keys[pygame.K_DOWN]
+            if self.joyorder and x == 0 and y == 0:
+                x, y = self.joystick_direction(self.joyorder[0])
+            client.send_input(x, y)
+            # ---- draw the interpolated world, Fluffballs are below the rest ----
+            self.screen.blit(self.background, (0, 0))
+            entities = client.interpolated()
+            self.draw_entities(entities, sorted(entities, key=lambda n: (entities[n][0] != 1, n)), paws)
+            self.draw_info(*client.info, self.clock.get_fps())
+            if client.slot == fluffnet.SPECTATOR:
+                write(self.screen, "Zuschauer", x=Viewer.width//2, y=20, center=True)
+            self.clock.tick()
+            pygame.display.flip()
+        client.close()
+
+    # ------ two processes: one simulates, one draws (see shmframes.py) ------
+    def split_run(self, duration=None):
+        """the simulation runs in its own process (simulate) and writes
+           every step into shared memory, this process reads the keys and
+           joysticks and draws the newest step. F3 shows torn and skipped
+           frames and how old the drawn frame is"""
+        self.finish_loading()
+        self.shared = shmframes.SharedFrames(create=True)
+        # every setting of Game, the random numbers start from the seed
+        settings = {name: value for name, value in vars(Game).items()
+                    if not name.startswith("__") and name != "rng"}
+        connection, child = multiprocessing.Pipe()
+        # spawn, not fork: a copy of this process with its window would be no good
+        process = multiprocessing.get_context("spawn").Process(target=simulate, name="simulation", daemon=True,
+                  args=(self.shared.name, child, self.width, self.height, self.fps, Game.rng.seed, settings))
+        process.start()
+        paws = {}
+        sent = {}       # { slot: (x, y) or None for a bot }, only changes go through the pipe
+        frame = None
+        stop = None if duration is None else self.playtime + duration
+        running = True
+        try:
+            while running and process.is_alive():
+                self.playtime += self.pacer.wait() / 1000
+                if stop is not None and self.playtime >= stop:
+                    running = False
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                        running = False
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        self.overlay = not self.overlay
+                    else:
+                        self.handle_joystick_event(event)
+                # ---- input: the controllers of handle_input ----
+                pressed_keys = pygame.key.get_pressed()
+                for slot, owner in enumerate(self.controllers()[:Game.players]):
+                    direction = None if owner is None else self.direction(owner, pressed_keys)
+                    if slot not in sent or sent[slot] != direction:
+                        connection.send((slot, direction))
+                        sent[slot] = direction
+                # ---- the newest frame, or the last one again ----
+                frame = self.shared.read() or frame
+                self.screen.blit(self.background, (0, 0))
+                if frame is not None:
+                    entities = {number: (kind, image, x, y, angle)
+                                for number, kind, image, x, y, angle, layer in frame.records}
+                    order = [record[0] for record in sorted(frame.records, key=lambda r: (r[6], r[0]))]
+                    self.draw_entities(entities, order, paws)
+                    self.draw_info(*frame.info, self.pacer.get_fps())
+                if self.overlay:
+                    lines = self.shared.report() + self.pacer.report()
+                    pygame.draw.rect(self.screen, (255,255,255), (5, 35, 250, 20 + len(lines) * 18))
+                    for y, line in enumerate(lines):
+                        write(self.screen, line, x=10, y=45 + y * 18, color=(0,0,120), fontsize=15)
+                pygame.display.flip()
+        finally:
+            try:
+                connection.send(None)   # stop
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(2)
+            if process.is_alive():
+                process.terminate()
+            self.shared.close()
+            self.shared.unlink()
+            pygame.quit()
+
+    def run(self, menu=True, duration=None):
+        """The mainloop. menu False: start playing at once,
+           duration: stop after so many seconds (None: never)"""
         running = True
-        Viewer.fullscreen = True
         self.set_screenresolution()
         #pygame.mouse.set_visible(False)
         oldleft, oldmiddle, oldright  = False, False, False
         self.snipertarget = None
-        gameOver = False
-        exittime = 0
-        self.menu_run()
+        if menu:
+            self.menu_run()
+        self.finish_loading()   # the menu was left before everything was loaded
+        for slot in range(1, Game.players):
+            self.spawn_player(slot)
+        stop = None if duration is None else self.playtime + duration
        
-        crazytime = 0
-        crazytime_cooldown = 0
         while running:
             
-            milliseconds = self.clock.tick(self.fps) #
+            milliseconds = self.pacer.wait()
             seconds = milliseconds / 1000
             self.playtime += seconds
+            self.sfx.frame(seconds)
+            framestart = time.perf_counter()
+            if stop is not None and self.playtime >= stop:
+                running = False
             
-            if gameOver:
-                if self.playtime > exittime:
-                    running = False
+            if self.gameOver:
+                if self.playtime > self.exittime:
+                    self.new_round()
+                    Flytext(Viewer.width//2,Viewer.height//4,text="Neue Runde!",color=(0,255,255),duration=3,fontsize=80, fixed=True)
                     
             # -------- events ------
             for event in pygame.event.get():
@@ -1228,9 +3095,8 @@ class Viewer(object):
                     running = False
                 elif event.type == pygame.KEYUP:
                     if event.key == pygame.K_t:
-                        for p in self.pawgroup:
-                            if p.bossnumber == self.kitty1.number:
-                                p.stop_play()
+                        for p in self.kitty1.paws:
+                            p.stop_play()
                 
                         
                         
@@ -1253,173 +3119,267 @@ class Viewer(object):
                             
                     elif event.key == pygame.K_3:
                         self.kitty1.start_glowing()
-            # delete everything on screen
-            self.screen.blit(self.background, (0, 0))  # macht alles weiß
-            if self.playtime < crazytime :
-                self.screen.fill((random.randint(0,255), random.randint(0,255), random.randint(0,255)))
-                
-            # ------------ pressed keys ------
-            pressed_keys = pygame.key.get_pressed()
+                    elif event.key == pygame.K_F3:
+                        self.overlay = not self.overlay
+                    elif event.key == pygame.K_F6:
+                        self.toggle_sampling()
+                    elif event.key == pygame.K_F4 and self.memory is not None:
+                        self.memory.dump()
+                    elif event.key == pygame.K_F5:
+                        self.save_game()
+                        Flytext(Viewer.width//2,Viewer.height//4,text="gespeichert",color=(0,255,255),duration=2,fontsize=50, fixed=True)
+                    elif event.key == pygame.K_F9 and os.path.exists("fluffball.sav"):
+                        self.load_game()
+                elif event.type == pygame.JOYBUTTONDOWN and event.button == 7:
+                    # start button
+                    self.menu_run()
+                else:
+                    self.handle_joystick_event(event)
+            # ------------ pressed keys and joysticks ------
+            self.handle_input(seconds)
+            self.update_world(seconds)
+
+            # ----------- clear, draw , update, flip -----------------
+            t = time.perf_counter()
+            # delete everything on screen, paint car wheels and food
+            self.update_cameras()
+            self.draw_static(crazy=self.playtime < self.crazytime)
 
-            if pressed_keys[pygame.K_t]:
-                # alle pfoten von kitty1 suchen
-                for p in self.pawgroup:
-                    if p.bossnumber == self.kitty1.number:
-                        p.play(angle=100)
-            
-            
-            
-            if pressed_keys[pygame.K_RIGHT]:
-                self.fluff.move += pygame.math.Vector2(10,0)
-            if pressed_keys[pygame.K_LEFT]:
-                self.fluff.move += pygame.math.Vector2(-10,0)
-            if pressed_keys[pygame.K_UP]:
-                self.fluff.move += pygame.math.Vector2(0,10)
-            if pressed_keys[pygame.K_DOWN]:
-                self.fluff.move += pygame.math.Vector2(0,-10)
-                
-            if len(self.fluffgroup) >= 2:
-                if pressed_keys[pygame.K_d]:
-                    self.fluff2.move += pygame.math.Vector2(10,0)
-                if pressed_keys[pygame.K_a]:
-                    self.fluff2.move += pygame.math.Vector2(-10,0)
-                if pressed_keys[pygame.K_w]:
-                    self.fluff2.move += pygame.math.Vector2(0,10)
-                if pressed_keys[pygame.K_s]:
-                    self.fluff2.move += pygame.math.Vector2(0,-10)
-                    
-            if len(self.fluffgroup) >= 3:
-                if pressed_keys[pygame.K_l]:
-                    self.fluff3.move += pygame.math.Vector2(10,0)
-                if pressed_keys[pygame.K_j]:
-                    self.fluff3.move += pygame.math.Vector2(-10,0)
-                if pressed_keys[pygame.K_i]:
-                    self.fluff3.move += pygame.math.Vector2(0,10)
-                if pressed_keys[pygame.K_k]:
-                    self.fluff3.move += pygame.math.Vector2(0,-10)
-                    
-                    
-            if len(self.fluffgroup) == 4:
-                if pressed_keys[pygame.K_n]:
-                    self.fluff4.move += pygame.math.Vector2(10,0)
-                if pressed_keys[pygame.K_v]:
-                    self.fluff4.move += pygame.math.Vector2(-10,0)
-                if pressed_keys[pygame.K_g]:
-                    self.fluff4.move += pygame.math.Vector2(0,10)
-                if pressed_keys[pygame.K_b]:
-                    self.fluff4.move += pygame.math.Vector2(0,-10)       
-           
-            
             # write text below sprites
             write(self.screen, "FPS: {:8.3}".format(
-                self.clock.get_fps() ), x=10, y=10)
+                self.pacer.get_fps() ), x=10, y=10)
             write(self.screen, "Collisions:{}".format(self.collisions), x=Viewer.width-200, y=10)
-            self.allgroup.update(seconds)
-            
-            
-            # -----------collision detection between fluffballs and food -----
-            for f in self.fluffgroup:
-                crashgroup = pygame.sprite.spritecollide(f, self.foodgroup,
-                             False,pygame.sprite.collide_mask)
-                for e in crashgroup:
-                    if e.__class__.__name__=="Donut":
-                        Flytext(f.pos.x,-f.pos.y,text="Mjam",color=(240,80,190),duration=5,fontsize=30)
-                        Explosion(pos=e.pos, what ="Crumb", maxspeed=900, minspeed=500, color=(210,110,210), maxduration=1.5, gravityy=0, sparksmin=100, sparksmax=300, acc=0.9)
-                    elif e.__class__.__name__=="Cookie":
-                        Flytext(f.pos.x,-f.pos.y,text="Knusper, Knusper!",color=(210,110,10),duration=5,fontsize=30)
-                        Explosion(pos=e.pos, what ="Crumb", maxspeed=150, minspeed=50, color=(220,160,40), maxduration=1.5, gravityy=0, sparksmin=100, sparksmax=300, acc=1.05)
-                    e.kill()
-                    #Explosion(pos=e.pos, what ="Crumb", maxspeed=100, minspeed=50, color=(220,160,40), maxduration=1.5, gravityy=0, sparksmin=20, sparksmax=50)
-                    if len(self.foodgroup) == 0 and not gameOver:
-                        Flytext(Viewer.width/2,Viewer.height/2,"Alles gemampft... Päuschen!", (0,0,255), duration=10, fontsize=145)
-                        #endtime = self.playtime + 5 # in 5 sekunden ist alles aus
-                        gameOver = True
-                        exittime = self.playtime + 3
-            # ----------collision detection between fluffballs and car wheel----
-            for f in self.fluffgroup:
-                crashgroup = pygame.sprite.spritecollide(f, self.car_wheelgroup,
-                             False,pygame.sprite.collide_mask)
-                for z in crashgroup:
-                    if z.__class__.__name__=="Autoreifen":
-                        if crazytime_cooldown <= self.playtime:
-                            crazytime = self.playtime + 0.1
-                            crazytime_cooldown = self.playtime + 0.75
-                            Flytext(f.pos.x,-f.pos.y,text="Uargh, ein Autoreifen!",color=(1,1,1),duration=5,fontsize=40)
-                       
-                        f.reifendamage +=100
-                        #Fluffball makes a little jump if bouncing against a car wheel
-                        f.move = f.move*-0.8
-                        j = f.move.normalize()*25
-                        f.pos += j
-                        if len(self.foodgroup):
-                            self.collisions += 1
-                        if self.collisions == 100:
-                            Flytext(Viewer.width/2,Viewer.height/2,"Game over", (0,0,0), duration=10, fontsize=350)
-                            gameOver = True
-                            exittime = self.playtime + 3
-                        #(self, pos, maxspeed=150, minspeed=20, color=(255,255,0),maxduration=2.5,gravity=3.7,sparksmin=5,sparksmax=20):
-                        dist = f.pos-z.pos
-                        point = z.pos + dist * 0.5
-                        a = -dist.angle_to(pygame.math.Vector2(1,0))
-                        a1 = a -15
-                        a2 = a + 15
-                        Explosion(pos=point, min_angle=a1, max_angle=a2, what ="Spark", maxspeed=100, minspeed=50, color=(0,0,0), maxduration=2.5, gravityy=0, sparksmin=10, sparksmax=30)
-            #------------collision detection between fluffball and other fluffball-----           
-            for f in self.fluffgroup:
-                crashgroup = pygame.sprite.spritecollide(f, self.fluffgroup, False, pygame.sprite.collide_mask)
-                for otherf in crashgroup:
-                    if f.number > otherf.number:
-                        elastic_collision(f, otherf)   
-       
-            
-            # ----- all paws in idle position ----- 
-            for k in self.kittygroup:
-                for p in self.pawgroup:
-                    if p.bossnumber == k.number:
-                        p.stop_play()
-
-            #------ flapping ? -------
-            #if pressed_keys[pygame.K_1]:              
-            for k in self.kittygroup:
-                if k.state == "flap":
-                    # todo: kitty bewegen
-                    for p in self.pawgroup:
-                        if p.bossnumber == k.number:
-                            p.flap()
-
-                for f in self.fluffgroup:
-                    # --------- kitty plays with ball -------
-                    
-                    diff= f.pos - (k.pos - pygame.math.Vector2(0,0))
-                    diff.y *= -1
-                    #print ("Test " + str(diff.length()))
-                    if diff.length()<100:
-
-                        a=diff.angle_to(pygame.math.Vector2(1,0))
-                        # alle pfoten von kitty1 suchen
-                        for p in self.pawgroup:
-                            if p.bossnumber == k.number:
-                                #print("Pfote gefunden")
-                                p.play(angle=a)
-                        
-                        f.move = pygame.math.Vector2(0,0)
-                        rv = pygame.math.Vector2(random.random()*150+150,0)
-                        rv=rv.rotate(random.randint(0,360))
-                        f.move+=rv
-                        
-                    
-                            # ----------- clear, draw , update, flip -----------------
-            self.allgroup.draw(self.screen)
-           
+            self.draw_sprites()
+            if Game.debug_surfaces:
+                surfaces.check_group(self.allgroup, self.screen)
+                surfaces.check_group(self.staticgroup, self.screen)
+            if self.overlay:
+                self.draw_overlay()
+            t = self.profile("draw", t)
                         
             # -------- next frame -------------
             pygame.display.flip()
+            self.profile("flip", t)
+            worktime = (time.perf_counter() - framestart) * 1000
+            self.governor.frame_done(worktime, seconds)
+            if self.telemetry is not None:
+                self.telemetry.frame(worktime, self.telemetry_gauges)
+            if self.stats is not None:
+                self.round_frame(worktime)
         #-----------------------------------------------------
         pygame.mouse.set_visible(True)    
         pygame.quit()
 
+def simulate(name, connection, width, height, fps, seed, settings):
+    """the simulation process of Viewer.split_run: the world without a
+       window, every step into the SharedFrames name. the input comes as
+       (slot, (x, y)) from connection, (slot, None): the slot is a bot
+       (Game.bots), None stops"""
+    for key, value in settings.items():
+        setattr(Game, key, value)
+    viewer = Viewer(width, height, fps=fps, headless=True, seed=seed)
+    frames = shmframes.SharedFrames(name)
+    viewer.netkinds = {kind: nr + 1 for nr, kind in enumerate(fluffnet.KINDS)}
+    viewer.netplayers = set(range(Game.players))
+    for slot in viewer.netplayers:
+        viewer.spawn_player(slot)
+    inputs = {}     # { slot: (x, y) or None }, held until it changes
+    try:
+        while True:
+            seconds = viewer.pacer.wait() / 1000
+            while connection.poll():
+                message = connection.recv()
+                if message is None:
+                    return
+                slot, direction = message
+                inputs[slot] = direction
+            for slot, direction in inputs.items():
+                if direction is not None:
+                    viewer.net_input(slot, *direction, seconds)
+                elif Game.bots and viewer.player_fluff(slot) is not None:
+                    viewer.steer_bot(viewer.player_fluff(slot), seconds)
+            if not viewer.net_step(seconds):
+                return
+            frames.write(viewer.shm_records(), viewer.net_info())
+    except (EOFError, BrokenPipeError):
+        pass    # the drawing process is gone
+    finally:
+        frames.close()
+        pygame.quit()
+
+# ---- launcher: what a profile in profiles.ini may contain (see profiles.py) ----
+def quality_setting(text):
+    """"auto" or a number 0.15 ... 1.0"""
+    if text.strip().lower() == "auto":
+        return "auto"
+    return max(0.0, min(1.0, float(text)))
+
+def pacing_setting(text):
+    if text not in pacing.STRATEGIES:
+        raise ValueError("use one of {}".format(", ".join(pacing.STRATEGIES)))
+    return text
+
+SETTINGS = {"resolution":   (profiles.resolution, (1430, 800)),
+            "fullscreen":   (profiles.boolean, False),
+            "fps":          (int, 30),
+            "pacing":       (pacing_setting, "hybrid"),
+            "quality":      (quality_setting, "auto"),
+            "dirty_rects":  (profiles.boolean, True),
+            "headless":     (profiles.boolean, False),
+            "menu":         (profiles.boolean, True),
+            "seconds":      (float, None),
+            "seed":         (int, None),
+            "difficulty":   (int, 1),
+            "players":      (int, 1),
+            "keyboards":    (int, None),
+            "world":        (int, 1),
+            "sound_buffer": (int, Game.sound_buffer),
+            "report":       (profiles.boolean, False),
+            "two_process":  (profiles.boolean, False),
+            }
+
+def apply_settings(settings):
+    """the settings of a profile that are class attributes"""
+    Viewer.fullscreen = settings["fullscreen"]
+    if settings["quality"] == "auto":
+        Game.quality_auto = True
+    else:
+        Game.quality_auto = False
+        Game.quality = settings["quality"]
+    Game.static_layer = settings["dirty_rects"]
+    Game.difficulty = max(1, min(4, settings["difficulty"]))
+    Game.players = max(1, min(Viewer.max_players, settings["players"]))
+    Game.keyboards = settings["keyboards"]
+    Game.world_size = max(1, settings["world"])
+    Game.sound_buffer = settings["sound_buffer"]
+
 if __name__ == '__main__':
-    Viewer(1430,800).run() # try Viewer(800,600).run()
+    import argparse
+    parser = argparse.ArgumentParser(description="Fluffball")
+    parser.add_argument("--profile", metavar="NAME",
+                        help="settings from the profiles file, e.g. low, balanced, high, benchmark")
+    parser.add_argument("--profiles", default=profiles.DEFAULT_FILE, metavar="FILE",
+                        help="the profiles file (default: %(default)s)")
+    parser.add_argument("--list-profiles", action="store_true", help="show the profiles and stop")
+    parser.add_argument("--resolution", type=profiles.resolution, metavar="WxH", help="e.g. 1430x800")
+    parser.add_argument("--fullscreen", action="store_const", const=True, help="fullscreen")
+    parser.add_argument("--windowed", action="store_const", const=False, dest="fullscreen", help="in a window")
+    parser.add_argument("--quality", type=quality_setting, help='effects: "auto" or 0.15 ... 1.0')
+    parser.add_argument("--dirty-rects", action=argparse.BooleanOptionalAction,
+                        help="car wheels and food from a prebuilt layer (StaticLayer)")
+    parser.add_argument("--headless", action=argparse.BooleanOptionalAction, help="no window, no sound")
+    parser.add_argument("--menu", action=argparse.BooleanOptionalAction, help="show the menu at the start")
+    parser.add_argument("--seconds", type=float, help="stop after SECONDS")
+    parser.add_argument("--difficulty", type=int, choices=range(1, 5))
+    parser.add_argument("--players", type=int, choices=range(1, 17), metavar="1..16")
+    parser.add_argument("--keyboards", type=int, choices=range(0, 5), metavar="0..4",
+                        help="key sets for Fluffball 1, 2, ..., joysticks get the next ones"
+                             " (default: one for every player without a joystick)")
+    parser.add_argument("--report", action=argparse.BooleanOptionalAction,
+                        help="print frame statistics at the end")
+    parser.add_argument("--two-process", action=argparse.BooleanOptionalAction,
+                        help="simulate in a second process, this one only draws (shared memory)")
+    parser.add_argument("--server", action="store_true", help="run a network server without window")
+    parser.add_argument("--connect", metavar="HOST", help="play on a network server")
+    parser.add_argument("--port", type=int, default=fluffnet.DEFAULT_PORT)
+    parser.add_argument("--tickrate", type=int, default=30, help="server ticks per second")
+    parser.add_argument("--load", metavar="FILE", help="start with a savegame (F5 saves, F9 loads)")
+    parser.add_argument("--debug-surfaces", action="store_true",
+                        help="warn about sprite images that are blitted the slow way")
+    parser.add_argument("--world", type=int, metavar="N",
+                        help="playfield of N x N screens, the camera follows the Fluffballs "
+                             "(one screen with --server, --connect and --two-process)")
+    parser.add_argument("--split", action="store_true", help="split screen, one camera for every Fluffball")
+    parser.add_argument("--throttle", action="store_true",
+                        help="sprites far away from the cameras move less often")
+    parser.add_argument("--fps", type=int, help="target frames per second")
+    parser.add_argument("--pacing", choices=pacing.STRATEGIES,
+                        help="how to wait for the next frame (see pacing.py)")
+    parser.add_argument("--sound-buffer", type=int, metavar="SAMPLES",
+                        help="mixer buffer, smaller: sounds come sooner, but may crackle")
+    parser.add_argument("--seed", type=int, help="random seed, the same seed gives the same game")
+    parser.add_argument("--memtrack", type=int, nargs="?", const=300, metavar="SECONDS",
+                        help="track memory (slower), warn about anything that grows for SECONDS (default 300)")
+    parser.add_argument("--telemetry-file", metavar="FILE",
+                        help="write frame times, sprites and memory to FILE (Prometheus text format)")
+    parser.add_argument("--statsd", metavar="HOST:PORT", help="send the same to a StatsD server (UDP)")
+    parser.add_argument("--telemetry-interval", type=float, default=10.0, metavar="SECONDS")
+    parser.add_argument("--stats", nargs="?", const=roundstats.DEFAULT_FILE, metavar="FILE",
+                        help="every round into an SQLite file (default {}), see roundstats.py".format(
+                        roundstats.DEFAULT_FILE))
+    parser.add_argument("--sampling", type=int, nargs="?", const=profiler.DEFAULT_RATE, metavar="HZ",
+                        help="sampling profiler from the start, HZ samples per second (F6 starts and stops it)")
+    parser.add_argument("--flamegraph", default=profiler.DEFAULT_FILE, metavar="FILE",
+                        help="collapsed stacks of the sampling profiler (default {})".format(profiler.DEFAULT_FILE))
+    parser.add_argument("--cabinet", metavar="NAME", help="name of this machine in the statistics (default: host name)")
+    args = parser.parse_args()
+    if args.list_profiles:
+        config = profiles.read(args.profiles)
+        for name in profiles.names(config):
+            print("{:<12}{}".format(name, ", ".join("{}={}".format(key, value) for key, value
+                  in config[name].items() if value != config.defaults().get(key))))
+        parser.exit()
+    name = args.profile
+    if name is None and "balanced" in profiles.names(profiles.read(args.profiles)):
+        name = "balanced"
+    try:
+        settings = profiles.override(profiles.load(args.profiles, name, SETTINGS), vars(args))
+    except ValueError as error:
+        parser.error(str(error))
+    apply_settings(settings)
+    Game.debug_surfaces = args.debug_surfaces
+    if args.server or args.connect or settings["two_process"]:
+        # the network mode and the drawing process of split_run get screen
+        # pixels without a camera, they keep the single screen playfield
+        Game.world_size = 1
+    Game.split_screen = args.split
+    Game.throttle_far = args.throttle
+    width, height = settings["resolution"]
+    if args.connect:
+        Viewer(width, height, fps=settings["fps"]).client_run(args.connect, args.port)
+    else:
+        viewer = Viewer(width, height, fps=settings["fps"], headless=args.server or settings["headless"],
+                        strategy=settings["pacing"], seed=settings["seed"])
+        if args.load:
+            viewer.load_game(args.load)
+        if args.memtrack:
+            viewer.track_memory(args.memtrack)
+        if args.telemetry_file or args.statsd:
+            address = None
+            if args.statsd:
+                host, _, port = args.statsd.rpartition(":")
+                address = (host or "127.0.0.1", int(port or telemetry.DEFAULT_PORT))
+            viewer.export_telemetry(args.telemetry_interval, args.telemetry_file, address)
+        if args.stats:
+            viewer.record_stats(args.stats, args.cabinet)
+        viewer.flamegraph = args.flamegraph
+        if args.sampling:
+            viewer.sampler.rate = args.sampling
+            viewer.sampler.start()
+        try:
+            if args.server:
+                viewer.serve(port=args.port, tickrate=args.tickrate)
+            elif settings["two_process"]:
+                viewer.split_run(duration=settings["seconds"])
+                if settings["report"]:
+                    for line in viewer.shared.report() + viewer.pacer.report():
+                        print(line)
+            else:
+                viewer.run(menu=settings["menu"] and not settings["headless"], duration=settings["seconds"])
+                if settings["report"]:
+                    print("{} frames, {:.2f} ms per frame".format(viewer.pacer.frames, viewer.governor.worktime))
+                    for phase, ms in viewer.phase_times.items():
+                        print("{:<11}{:6.2f} ms".format(phase, ms))
+                    for line in viewer.pacer.report():
+                        print(line)
+        except Exception:
+            viewer.crash_dump()
+            raise
+        finally:
+            if viewer.telemetry is not None:
+                viewer.telemetry.close()   # the last snapshot
+            viewer.close_stats()
+            viewer.stop_sampling()
 #© 2019 GitHub, Inc.
 #Terms
 #Privacy
@@ -0,0 +1,92 @@
+"""
+images that load while the game already shows something
+
+Loading and scaling the png files takes about half a second. An
+AssetLoader does it on a worker thread, in the order of the list, and
+the main thread only converts the finished images to the pixel format
+of the screen (convert needs the display, so that must happen on the
+main thread):
+
+    loader = AssetLoader([("paw", "data/paw1.png", (50, 150)), ...], images)
+    loader.start()
+    while not loader.done:
+        loader.finish(budget=0.004)   # once per menu frame, at most 4 ms
+        ... draw the menu, loader.progress ...
+    loader.finish()                   # waits for the rest
+
+images is a dict { name: Surface }, every image goes in there as soon
+as it is ready. Images that are already in there are not loaded again.
+An error of the worker (e.g. a missing file) is raised by finish().
+"""
+
+import queue
+import threading
+import time
+
+import pygame
+
+import surfaces
+
+
+class AssetLoader():
+    """loads (name, filename, size) on a worker thread, size None:
+       as it is. the main thread makes them screen ready in finish()"""
+
+    def __init__(self, jobs, images, prepare=surfaces.prepare):
+        self.images = images
+        self.jobs = [job for job in jobs if job[0] not in images]
+        self.prepare = prepare
+        self.decoded = queue.Queue()   # (name, Surface, exception) from the worker
+        self.thread = None
+        self.loaded = 0
+
+    @property
+    def total(self):
+        return len(self.jobs)
+
+    @property
+    def done(self):
+        return self.loaded == self.total
+
+    @property
+    def progress(self):
+        """0.0 ... 1.0"""
+        return self.loaded / self.total if self.jobs else 1.0
+
+    def start(self):
+        if self.thread is None and not self.done:
+            self.thread = threading.Thread(target=self.work, name="assets", daemon=True)
+            self.thread.start()
+
+    def work(self):
+        files = {}   # { filename: Surface }, some files are used in more sizes
+        for name, filename, size in self.jobs:
+            try:
+                if filename not in files:
+                    files[filename] = pygame.image.load(filename)
+                image = files[filename]
+                if size is not None:
+                    image = pygame.transform.scale(image, size)
+                self.decoded.put((name, image, None))
+            except Exception as error:
+                self.decoded.put((name, None, error))
+
+    def finish(self, budget=None):
+        """converts the images that the worker has finished, for about
+           budget seconds. None: all of them, waits for the worker.
+           returns True when every image is there"""
+        if budget is None:
+            self.start()
+        end = None if budget is None else time.perf_counter() + budget
+        while not self.done:
+            try:
+                name, image, error = self.decoded.get(block=end is None)
+            except queue.Empty:
+                break
+            if error is not None:
+                raise error
+            self.images[name] = self.prepare(image)
+            self.loaded += 1
+            if end is not None and time.perf_counter() > end:
+                break
+        return self.done
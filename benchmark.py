@@ -0,0 +1,268 @@
+"""
+benchmarks for Fluffball, without window and without music
+
+python benchmark.py snapshot      save and load the world on "Impossible"
+python benchmark.py pacing        jitter of every frame pacing strategy at 60 fps
+python benchmark.py kitties       simulation time with up to 400 kitties, with and without LOD
+python benchmark.py world         frame time on playfields of 1x1, 2x2 and 4x4 screens
+python benchmark.py tunnel        fast Fluffballs against a car wheel at low tick rates
+python benchmark.py party         Fluffball against Fluffball with 4, 8 and 16 players
+python benchmark.py profiler      frame time with the sampling profiler off and at 100 ... 1000 Hz
+"""
+
+import os
+import statistics
+import sys
+import time
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+import Fluffball
+
+
+def make_viewer(difficulty=4):
+    Fluffball.Game.difficulty = difficulty
+    return Fluffball.Viewer(1430, 800, headless=True)
+
+
+def bench_snapshot(rounds=50, explosions=20):
+    """round trip time and size of world_to_bytes / world_from_bytes"""
+    viewer = make_viewer(4)
+    for _ in range(explosions):   # like 20 eaten donuts at the same time
+        Fluffball.Explosion(pos=pygame.math.Vector2(700, -400), what="Crumb", maxspeed=900,
+                            minspeed=500, color=(210,110,210), maxduration=1.5, gravityy=0,
+                            sparksmin=100, sparksmax=300, acc=0.9)
+    viewer.update_world(1 / 30)
+    objects = len(viewer.allgroup)
+    save = load = 0.0
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        data = viewer.world_to_bytes()
+        t1 = time.perf_counter()
+        viewer.world_from_bytes(data)
+        t2 = time.perf_counter()
+        save += t1 - t0
+        load += t2 - t1
+    print("snapshot: {} objects, {} bytes ({:.1f} bytes/object)".format(
+          objects, len(data), len(data) / objects))
+    print("save {:7.2f} ms   load {:7.2f} ms   (average of {} rounds)".format(
+          save / rounds * 1000, load / rounds * 1000, rounds))
+
+
+def bench_pacing(fps=60, seconds=2.0):
+    """every strategy of pacing.py with random work of 0 to 80% of a frame"""
+    import pacing
+    import random
+    pygame.init()
+    for strategy in pacing.STRATEGIES:
+        pacer = pacing.FramePacer(fps, strategy)
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pacer.wait()
+            work = time.perf_counter() + random.uniform(0, 0.8) / fps
+            while time.perf_counter() < work:
+                pass
+        print("\n".join(pacer.report()))
+
+
+def bench_kitties(counts=(25, 50, 100, 200, 400), frames=150):
+    """milliseconds per frame with many kitties, kitty LOD on and off.
+       "behavior" is the kitty phase (paws, flapping, playing), "sim" the
+       whole simulation step including moving and collisions, "frame"
+       simulation and drawing. all kitties are on the one screen, so the
+       drawing grows with them, LOD or not"""
+    Game = Fluffball.Game
+    print("          ------ lod on ------       ------ lod off -----")
+    print("kitties   behavior  sim    frame    behavior  sim    frame    (ms)")
+    for count in counts:
+        times = []
+        for lod in (True, False):
+            Game.kitty_lod = lod
+            Game.rng.reseed(count)
+            viewer = make_viewer(4)
+            random = Game.rng.world
+            for _ in range(count - len(viewer.kittygroup)):
+                Fluffball.Kitty(warp_on_edge=True, pos=pygame.math.Vector2(
+                    random.randint(0, viewer.width), -random.randint(0, viewer.height)))
+            for _ in range(10):
+                viewer.update_world(1 / 30)     # warm up the rotation cache
+            behavior = simulation = 0.0
+            t0 = time.perf_counter()
+            for _ in range(frames):
+                t = time.perf_counter()
+                viewer.update_world(1 / 30)
+                simulation += time.perf_counter() - t
+                behavior += viewer.last_phase_times["kitties"]
+                for f in viewer.fluffgroup:     # the game is over much too soon otherwise
+                    f.reifendamage = 0
+                viewer.collisions = 0
+                viewer.gameOver = False
+                viewer.update_cameras()
+                viewer.draw_static()
+                viewer.draw_sprites()
+            times += [behavior / frames, simulation / frames * 1000, (time.perf_counter() - t0) / frames * 1000]
+        print("{:7}   {:7.2f}  {:5.2f}  {:6.2f}    {:7.2f}  {:5.2f}  {:6.2f}".format(count, *times))
+    Game.kitty_lod = True
+
+
+def bench_world(frames=100, seeds=range(8)):
+    """simulation and drawing with the camera on larger playfields.
+       the Fluffball rolls to the right, so the camera moves.
+       the kitties are somewhere else with every seed, so the camera
+       shows more or less of them. every seed plays every playfield in
+       turn (the computer gets slower and faster in between): the median
+       of the seeds, "blits" are the sprites drawn per frame"""
+    Game = Fluffball.Game
+    viewer = make_viewer(4)
+    setups = ((1, False, False), (2, False, False), (4, False, False), (4, True, False), (4, False, True))
+    results = {setup: [] for setup in setups}   # { setup: [(frame, simulation, blits, static, sprites), ...] }
+    for seed in seeds:
+        for setup in setups:
+            size, throttle, split = setup
+            Game.world_size, Game.throttle_far, Game.split_screen = size, throttle, split
+            Game.rng.reseed(seed)
+            viewer.new_round()
+            if split:
+                viewer.spawn_player(1)
+            simulation = 0.0
+            blits = 0
+            t0 = time.perf_counter()
+            for _ in range(frames):
+                t = time.perf_counter()
+                viewer.update_world(1 / 30)
+                simulation += time.perf_counter() - t
+                for f in viewer.fluffgroup:
+                    f.reifendamage = 0
+                    f.move.x = 200
+                viewer.collisions = 0
+                viewer.gameOver = False
+                viewer.update_cameras()
+                viewer.draw_static()
+                viewer.draw_sprites()
+                blits += viewer.draw_counts[1]
+            results[setup].append(((time.perf_counter() - t0) / frames * 1000, simulation / frames * 1000,
+                                   blits / frames, len(viewer.staticgroup), len(viewer.allgroup)))
+    print("world   static  sprites  throttle  split   frame ms   simulation ms   blits")
+    for (size, throttle, split), runs in results.items():
+        frame, simulation, blits, static, sprites = (statistics.median(column) for column in zip(*runs))
+        print("{0}x{0}   {1:6.0f} {2:8.0f}  {3!s:8}  {4!s:5}  {5:8.2f}   {6:8.2f}        {7:6.1f}".format(
+              size, static, sprites, throttle, split, frame, simulation, blits))
+    Game.world_size, Game.throttle_far, Game.split_screen = 1, False, False
+
+
+def bench_tunnel(offsets=range(-80, 81, 10)):
+    """a Fluffball is shot at a car wheel, from different distances with
+       different sideways offsets.
+       how often it bounces off, at different speeds and tick rates,
+       with the collision test at the end of every step and with the
+       swept test (Game.swept)"""
+    Game = Fluffball.Game
+    viewer = make_viewer(1)
+    print("ticks/s  px/s     hits discrete  hits swept  (of {})".format(len(offsets)))
+    for ticks in (30, 15, 10, 5):
+        for speed in (300, 600, 1200, 2400):
+            hits = []
+            for swept in (False, True):
+                Game.swept = swept
+                count = 0
+                for i, offset in enumerate(offsets):
+                    viewer.teardown_world()
+                    viewer.make_groups()
+                    Fluffball.Autoreifen(pos=pygame.math.Vector2(700, -400))
+                    f = Fluffball.Fluffball(bounce_on_edge=True, fluffball_color="fluffballb.",
+                                            pos=pygame.math.Vector2(500 - i * 29, -400 + offset),
+                                            move=pygame.math.Vector2(speed, 0))
+                    bounced = False
+                    for _ in range(int(800 / speed * ticks) + 2):
+                        viewer.update_world(1 / ticks)
+                        bounced = bounced or f.move.x < 0
+                    count += bounced
+                hits.append(count)
+            print("{:5}   {:6}     {:8}     {:8}".format(ticks, speed, *hits))
+    Game.swept = True
+
+
+def bench_party(counts=(4, 8, 16), frames=300):
+    """milliseconds of the Fluffball against Fluffball phase, collide_mask
+       only for the pairs numpy picks (Game.batch_fluffs) and for every
+       pair with spritecollide. the bots steer, so the
+       Fluffballs meet around the food"""
+    Game = Fluffball.Game
+    Game.keyboards = 0      # every Fluffball is a bot
+    print("players   batch ms   pairs ms")
+    for count in counts:
+        times = []
+        for batch in (True, False):
+            Game.batch_fluffs = batch
+            Game.rng.reseed(count)
+            viewer = make_viewer(1)
+            viewer.set_players(count)
+            total = 0.0
+            for _ in range(frames):
+                viewer.handle_input(1 / 30)
+                viewer.update_world(1 / 30)
+                total += viewer.last_phase_times["fluffs"]
+                for f in viewer.fluffgroup:     # the game is over much too soon otherwise
+                    f.reifendamage = 0
+                viewer.collisions = 0
+                viewer.gameOver = False
+            times.append(total / frames)
+        print("{:7}   {:8.3f}   {:8.3f}".format(count, *times))
+    Game.batch_fluffs = True
+    Game.keyboards = None
+
+
+def bench_profiler(rates=(0, 100, 200, 500, 1000), frames=300):
+    """what the sampling profiler costs: milliseconds of simulation and
+       drawing without it and at different rates, and the overhead the
+       profiler measures itself (how long the game waited for it).
+       at the end the sprite functions with the most samples"""
+    Game = Fluffball.Game
+    Game.quality_auto = False
+    viewer = make_viewer(4)
+    sampler = viewer.sampler
+    print("rate Hz   frame ms   samples/s   overhead   us/sample")
+    for rate in rates:
+        Game.rng.reseed(rate)
+        viewer.new_round()
+        viewer.set_players(4)
+        sampler.clear()
+        sampler.rate = rate
+        if rate:
+            sampler.start()
+        t0 = time.perf_counter()
+        for _ in range(frames):
+            viewer.handle_input(1 / 30)
+            viewer.update_world(1 / 30)
+            for f in viewer.fluffgroup:
+                f.reifendamage = 0
+            viewer.collisions = 0
+            viewer.gameOver = False
+            viewer.update_cameras()
+            viewer.draw_static()
+            viewer.draw_sprites()
+        ms = (time.perf_counter() - t0) / frames * 1000
+        sampler.stop()
+        share, per_sample = sampler.overhead()
+        print("{:7}   {:8.2f}   {:9.0f}   {:8.2%}   {:9.1f}".format(
+              rate, ms, sampler.samples / max(sampler.seconds(), 1e-9), share, per_sample))
+    for name, share in sampler.top(8):
+        print("{:6.1%}  {}".format(share, name))
+    Game.quality_auto = True
+
+
+BENCHMARKS = {"snapshot": bench_snapshot,
+              "pacing": bench_pacing,
+              "kitties": bench_kitties,
+              "world": bench_world,
+              "tunnel": bench_tunnel,
+              "party": bench_party,
+              "profiler": bench_profiler}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,132 @@
+"""
+camera and spatial grid for a playfield that is larger than the screen
+
+The world has its own coordinates (sprite.rect in world pixels). A Camera
+shows a part of the world (camera.rect) in a viewport, a rect of the
+screen. With more cameras the screen is split.
+
+SpatialGrid puts things into square cells by their center, so the
+things in a part of the world can be found without looking at all of
+them:
+
+    grid = SpatialGrid(cell=256)
+    grid.insert(sprite, sprite.rect.center)
+    grid.query(camera.rect, margin=150)     # everything that may be visible
+"""
+
+import math
+
+import pygame
+
+
+class SpatialGrid():
+    """uniform grid of cells, { (cx, cy): [item, ...] }"""
+
+    def __init__(self, cell=256):
+        self.cell = cell
+        self.cells = {}
+
+    def __len__(self):
+        return sum(len(items) for items in self.cells.values())
+
+    def clear(self):
+        self.cells = {}
+
+    def key(self, point):
+        return int(point[0]) // self.cell, int(point[1]) // self.cell
+
+    def insert(self, item, point):
+        self.cells.setdefault(self.key(point), []).append(item)
+
+    def remove(self, item, point):
+        key = self.key(point)
+        items = self.cells.get(key)
+        if items is not None and item in items:
+            items.remove(item)
+            if not items:
+                del self.cells[key]
+
+    def rebuild(self, items):
+        """new grid for things that move: items are (item, point)"""
+        self.cells = {}
+        cells = self.cells
+        cell = self.cell
+        for item, (x, y) in items:
+            key = (int(x) // cell, int(y) // cell)
+            if key in cells:
+                cells[key].append(item)
+            else:
+                cells[key] = [item]
+
+    def query(self, rect, margin=0):
+        """all items with their center in rect, grown by margin on every
+           side (margin: half the size of the largest item)"""
+        cell = self.cell
+        x0 = (rect.left - margin) // cell
+        x1 = (rect.right + margin) // cell
+        y0 = (rect.top - margin) // cell
+        y1 = (rect.bottom + margin) // cell
+        result = []
+        cells = self.cells
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(cells):
+            # the rect covers more cells than there are, look at every cell
+            for (cx, cy), items in cells.items():
+                if x0 <= cx <= x1 and y0 <= cy <= y1:
+                    result.extend(items)
+            return result
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                items = cells.get((cx, cy))
+                if items:
+                    result.extend(items)
+        return result
+
+
+class Camera():
+    """shows the part self.rect of the world in viewport (screen rect)"""
+
+    def __init__(self, viewport, world_size):
+        self.viewport = pygame.Rect(viewport)
+        self.world = pygame.Rect((0, 0), world_size)
+        self.rect = pygame.Rect((0, 0), self.viewport.size)
+        self.moved = (0, 0)    # by the last look_at, in world pixels
+
+    @property
+    def offset(self):
+        """world -> viewport: subtract this"""
+        return self.rect.topleft
+
+    def look_at(self, point):
+        """centers the camera on point (world pixels), but never shows
+           anything outside of the world"""
+        x, y = self.rect.topleft
+        self.rect.center = (round(point[0]), round(point[1]))
+        if self.world.width >= self.rect.width and self.world.height >= self.rect.height:
+            self.rect.clamp_ip(self.world)
+        else:
+            self.rect.topleft = (0, 0)
+        self.moved = (self.rect.left - x, self.rect.top - y)
+
+    def follow(self, points):
+        """looks at the middle of all points"""
+        if points:
+            self.look_at((sum(p[0] for p in points) / len(points),
+                          sum(p[1] for p in points) / len(points)))
+
+
+def viewports(screen_rect, n):
+    """screen rects for n cameras: 1 full screen, 2 side by side,
+       3 or 4 in the four corners, more in a grid (3 x 3, 4 x 4, ...)"""
+    r = pygame.Rect(screen_rect)
+    if n <= 1:
+        return [r]
+    if n == 2:
+        w = r.width // 2
+        return [pygame.Rect(r.left, r.top, w, r.height),
+                pygame.Rect(r.left + w, r.top, r.width - w, r.height)]
+    columns = math.ceil(math.sqrt(n))
+    rows = math.ceil(n / columns)
+    xs = [r.left + r.width * x // columns for x in range(columns + 1)]
+    ys = [r.top + r.height * y // rows for y in range(rows + 1)]
+    return [pygame.Rect(xs[x], ys[y], xs[x + 1] - xs[x], ys[y + 1] - ys[y])
+            for y in range(rows) for x in range(columns)][:n]
@@ -0,0 +1,447 @@
+"""
+network mode for Fluffball
+
+One server process runs the whole simulation (Fluffballs, kitties, food,
+car wheels, collisions) with a fixed tickrate. The clients only send their
+input and get the world back as small snapshots over UDP. A snapshot only
+contains what changed since the last snapshot the client has confirmed
+(delta encoding), the client draws the world a little bit in the past and
+interpolates between two snapshots, so the movement stays smooth even if
+the tickrate is lower than the fps.
+
+start a server:          python Fluffball.py --server
+play on a server:        python Fluffball.py --connect 127.0.0.1
+load test on localhost:  python fluffnet.py loadtest --clients 8
+
+The world that the server simulates needs these methods
+(Viewer in Fluffball.py has them):
+    net_join()              -> player slot or None if the game is full
+    net_leave(slot)
+    net_input(slot, x, y, seconds)   x, y between -1 and 1, seconds of the tick
+    net_step(seconds)       -> False when the server should stop
+    net_entities()          -> { number: (kind, frame, x, y, angle) }
+    net_info()              -> (collisions, food, flags)
+"""
+
+import asyncio
+import collections
+import math
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+
+PROTOCOL = 1
+DEFAULT_PORT = 5455
+HISTORY = 64          # how many old snapshots are kept for delta encoding
+TIMEOUT = 5.0         # seconds without a packet -> client is gone
+SPECTATOR = 255       # slot of a client that only watches
+
+# ---- entity kinds, index + 1 goes over the network ----
+KINDS = ("Fluffball", "Kitty", "Paw", "Donut", "Cookie", "Autoreifen")
+
+# ---- packet types ----
+HELLO, WELCOME, INPUT, SNAPSHOT, BYE = range(1, 6)
+
+HEADER = struct.Struct("!BB")             # packet type, protocol
+WELCOME_BODY = struct.Struct("!BBHH")     # slot, tickrate, width, height
+INPUT_BODY = struct.Struct("!IIbb")       # seq, ack (newest snapshot tick), x, y in -100..100
+SNAPSHOT_BODY = struct.Struct("!IIHHBHH") # tick, basetick (0 = full), collisions, food, flags, changed, removed
+RECORD = struct.Struct("!IB")             # entity number, mask of the fields that follow
+REMOVED = struct.Struct("!I")
+# entity fields in the order of their mask bit: kind, frame, x, y, angle
+FIELDS = (struct.Struct("!B"), struct.Struct("!B"), struct.Struct("!h"),
+          struct.Struct("!h"), struct.Struct("!H"))
+FULLMASK = (1 << len(FIELDS)) - 1
+
+FLAG_GAMEOVER = 1
+
+
+def encode_snapshot(tick, basetick, info, entities, base=None):
+    """returns the bytes of a SNAPSHOT packet. with base (the entities of
+       snapshot basetick) only changed fields and removed numbers are sent"""
+    records = []
+    for number, entity in entities.items():
+        old = None if base is None else base.get(number)
+        if old is None:
+            mask = FULLMASK
+        else:
+            mask = 0
+            for bit in range(len(FIELDS)):
+                if entity[bit] != old[bit]:
+                    mask |= 1 << bit
+            if mask == 0:
+                continue
+        record = [RECORD.pack(number, mask)]
+        for bit, field in enumerate(FIELDS):
+            if mask & (1 << bit):
+                record.append(field.pack(entity[bit]))
+        records.append(b"".join(record))
+    removed = []
+    if base is not None:
+        removed = [REMOVED.pack(number) for number in base if number not in entities]
+    collisions, food, flags = info
+    return b"".join([HEADER.pack(SNAPSHOT, PROTOCOL),
+                     SNAPSHOT_BODY.pack(tick, basetick if base is not None else 0,
+                                        min(collisions, 65535), food, flags,
+                                        len(records), len(removed))]
+                    + records + removed)
+
+
+def decode_snapshot(data, base=None):
+    """reverse of encode_snapshot. data is the packet without the HEADER.
+       returns tick, basetick, info, entities"""
+    tick, basetick, collisions, food, flags, changed, removed = SNAPSHOT_BODY.unpack_from(data)
+    offset = SNAPSHOT_BODY.size
+    entities = {} if basetick == 0 or base is None else dict(base)
+    for _ in range(changed):
+        number, mask = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        entity = list(entities.get(number, (0, 0, 0, 0, 0)))
+        for bit, field in enumerate(FIELDS):
+            if mask & (1 << bit):
+                entity[bit] = field.unpack_from(data, offset)[0]
+                offset += field.size
+        entities[number] = tuple(entity)
+    for _ in range(removed):
+        entities.pop(REMOVED.unpack_from(data, offset)[0], None)
+        offset += REMOVED.size
+    return tick, basetick, (collisions, food, flags), entities
+
+
+def packet_type(data):
+    """returns the packet type or None for packets from other programs"""
+    if len(data) < HEADER.size:
+        return None
+    ptype, protocol = HEADER.unpack_from(data)
+    if protocol != PROTOCOL:
+        return None
+    return ptype
+
+
+class RemoteClient():
+    """what the server knows about one client"""
+
+    def __init__(self, addr, slot):
+        self.addr = addr
+        self.slot = slot
+        self.ack = 0           # newest snapshot tick the client has
+        self.seq = 0           # newest input
+        self.x, self.y = 0.0, 0.0
+        self.last_seen = time.monotonic()
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+
+class GameServer(asyncio.DatagramProtocol):
+    """authoritative server. ticks the world with a fixed tickrate and
+       sends every client a snapshot after each tick"""
+
+    def __init__(self, world, tickrate=30, report=5.0):
+        self.world = world
+        self.tickrate = tickrate
+        self.report = report      # seconds between metric lines, 0 = quiet
+        self.clients = {}         # { addr: RemoteClient }
+        self.history = collections.OrderedDict()  # { tick: entities }
+        self.tick = 0
+        self.transport = None
+        self.running = True
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.metric_start = time.monotonic()
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.packets_out = 0
+        self.packets_in = 0
+        self.ticks = 0
+        self.tick_time = 0.0      # simulation, seconds
+        self.tick_time_max = 0.0
+        self.net_time = 0.0       # encoding and sending, seconds
+
+    def metrics(self):
+        """bandwidth and tick times since the last reset_metrics()"""
+        duration = max(0.001, time.monotonic() - self.metric_start)
+        ticks = max(1, self.ticks)
+        return {"clients": len(self.clients),
+                "players": len([c for c in self.clients.values() if c.slot != SPECTATOR]),
+                "ticks_per_second": self.ticks / duration,
+                "tick_ms": self.tick_time / ticks * 1000,
+                "tick_ms_max": self.tick_time_max * 1000,
+                "net_ms": self.net_time / ticks * 1000,
+                "kbytes_out_per_second": self.bytes_out / duration / 1024,
+                "kbytes_in_per_second": self.bytes_in / duration / 1024,
+                "packets_out_per_second": self.packets_out / duration,
+                "packets_in_per_second": self.packets_in / duration,
+                "bytes_per_snapshot": self.bytes_out / max(1, self.packets_out)}
+
+    def print_metrics(self):
+        m = self.metrics()
+        print("tick {tick_ms:5.2f} ms (max {tick_ms_max:5.2f}) net {net_ms:5.2f} ms | "
+              "{ticks_per_second:4.1f} ticks/s | clients {clients} ({players} playing) | "
+              "out {kbytes_out_per_second:7.1f} kB/s in {kbytes_in_per_second:5.1f} kB/s | "
+              "{bytes_per_snapshot:6.0f} bytes/snapshot".format(**m), flush=True)
+
+    # ---- asyncio callbacks ----
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.bytes_in += len(data)
+        self.packets_in += 1
+        ptype = packet_type(data)
+        client = self.clients.get(addr)
+        if ptype == HELLO:
+            if client is None:
+                slot = self.world.net_join()
+                client = RemoteClient(addr, SPECTATOR if slot is None else slot)
+                self.clients[addr] = client
+            self.send(client, HEADER.pack(WELCOME, PROTOCOL) + WELCOME_BODY.pack(
+                      client.slot, self.tickrate, self.world.width, self.world.height))
+        elif client is None:
+            return
+        elif ptype == INPUT and len(data) >= HEADER.size + INPUT_BODY.size:
+            seq, ack, x, y = INPUT_BODY.unpack_from(data, HEADER.size)
+            client.last_seen = time.monotonic()
+            client.bytes_in += len(data)
+            if seq > client.seq:     # udp packets can arrive out of order
+                client.seq = seq
+                client.x, client.y = x / 100, y / 100
+            if ack > client.ack:
+                client.ack = ack
+        elif ptype == BYE:
+            self.drop(client)
+
+    def send(self, client, packet):
+        self.transport.sendto(packet, client.addr)
+        client.bytes_out += len(packet)
+        self.bytes_out += len(packet)
+        self.packets_out += 1
+
+    def drop(self, client):
+        if client.slot != SPECTATOR:
+            self.world.net_leave(client.slot)
+        del self.clients[client.addr]
+
+    # ---- the fixed tick ----
+    def step(self):
+        """one server tick: input, simulation, snapshots"""
+        t0 = time.perf_counter()
+        now = time.monotonic()
+        for client in list(self.clients.values()):
+            if now - client.last_seen > TIMEOUT:
+                self.drop(client)
+            elif client.slot != SPECTATOR:
+                self.world.net_input(client.slot, client.x, client.y, 1 / self.tickrate)
+        if self.world.net_step(1 / self.tickrate) is False:
+            self.running = False
+        self.tick += 1
+        t1 = time.perf_counter()
+        entities = self.world.net_entities()
+        info = self.world.net_info()
+        self.history[self.tick] = entities
+        while len(self.history) > HISTORY:
+            self.history.popitem(last=False)
+        packets = {}   # clients with the same base get the same bytes
+        for client in self.clients.values():
+            base = client.ack if client.ack in self.history else 0
+            if base not in packets:
+                packets[base] = encode_snapshot(self.tick, base, info, entities,
+                                                self.history.get(base))
+            self.send(client, packets[base])
+        t2 = time.perf_counter()
+        self.ticks += 1
+        self.tick_time += t1 - t0
+        self.tick_time_max = max(self.tick_time_max, t1 - t0)
+        self.net_time += t2 - t1
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        next_report = loop.time() + self.report
+        while self.running:
+            self.step()
+            next_tick += 1 / self.tickrate
+            if loop.time() > next_tick + 1:
+                next_tick = loop.time()   # way too slow, do not try to catch up
+            if self.report and loop.time() > next_report:
+                self.print_metrics()
+                self.reset_metrics()
+                next_report = loop.time() + self.report
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+
+
+async def serve(world, host="0.0.0.0", port=DEFAULT_PORT, tickrate=30, report=5.0):
+    loop = asyncio.get_running_loop()
+    server = GameServer(world, tickrate, report)
+    transport, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=(host, port))
+    print("Fluffball server on {}:{}, {} ticks per second".format(host, port, tickrate), flush=True)
+    try:
+        await server.serve()
+    finally:
+        transport.close()
+
+
+def run_server(world, host="0.0.0.0", port=DEFAULT_PORT, tickrate=30, report=5.0):
+    try:
+        asyncio.run(serve(world, host, port, tickrate, report))
+    except KeyboardInterrupt:
+        pass
+
+
+class GameClient(asyncio.DatagramProtocol):
+    """receives snapshots from a GameServer and keeps them for interpolation"""
+
+    def __init__(self, interpolation_delay=0.1):
+        self.delay = interpolation_delay   # seconds we draw behind the server
+        self.transport = None
+        self.slot = None
+        self.tickrate = 30
+        self.width, self.height = 0, 0
+        self.states = collections.OrderedDict()  # { tick: entities } for delta decoding
+        self.timeline = collections.deque(maxlen=32)  # (tick, entities) in tick order
+        self.info = (0, 0, 0)
+        self.newest = 0
+        self.offset = None       # local time - server time
+        self.seq = 0
+        self.bytes_in = 0
+        self.snapshots = 0
+        self.dropped = 0         # snapshots that could not be decoded or came too late
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.transport.sendto(HEADER.pack(HELLO, PROTOCOL))
+
+    def datagram_received(self, data, addr):
+        self.bytes_in += len(data)
+        ptype = packet_type(data)
+        if ptype == WELCOME:
+            self.slot, self.tickrate, self.width, self.height = WELCOME_BODY.unpack_from(data, HEADER.size)
+        elif ptype == SNAPSHOT:
+            self.receive_snapshot(data[HEADER.size:])
+
+    def receive_snapshot(self, data):
+        tick, basetick = SNAPSHOT_BODY.unpack_from(data)[:2]
+        if tick <= self.newest or (basetick != 0 and basetick not in self.states):
+            self.dropped += 1
+            return
+        tick, basetick, info, entities = decode_snapshot(data, self.states.get(basetick))
+        self.snapshots += 1
+        self.newest = tick
+        self.info = info
+        self.states[tick] = entities
+        while len(self.states) > HISTORY:
+            self.states.popitem(last=False)
+        self.timeline.append((tick, entities))
+        # --- clock offset: the smallest one is the one with the least lag ---
+        offset = time.monotonic() - tick / self.tickrate
+        if self.offset is None or offset < self.offset:
+            self.offset = offset
+        else:
+            self.offset += (offset - self.offset) * 0.01
+
+    def send_input(self, x, y):
+        """x, y between -1 and 1, like a joystick"""
+        if self.transport is None or self.slot is None:
+            if self.transport is not None:
+                self.transport.sendto(HEADER.pack(HELLO, PROTOCOL))  # hello got lost?
+            return
+        self.seq += 1
+        x = max(-100, min(100, int(x * 100)))
+        y = max(-100, min(100, int(y * 100)))
+        self.transport.sendto(HEADER.pack(INPUT, PROTOCOL) + INPUT_BODY.pack(self.seq, self.newest, x, y))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.sendto(HEADER.pack(BYE, PROTOCOL))
+            self.transport.close()
+
+    def interpolated(self):
+        """entities as they were self.delay seconds ago, positions and
+           angles interpolated between the two snapshots around that time"""
+        if not self.timeline:
+            return {}
+        servertime = time.monotonic() - self.offset - self.delay
+        t = servertime * self.tickrate      # in ticks
+        older, newer = self.timeline[0], self.timeline[-1]
+        for tick, entities in self.timeline:
+            if tick <= t:
+                older = (tick, entities)
+            else:
+                newer = (tick, entities)
+                break
+        if t >= newer[0] or older[0] == newer[0]:
+            return newer[1]
+        f = (t - older[0]) / (newer[0] - older[0])
+        result = {}
+        old = older[1]
+        for number, entity in newer[1].items():
+            before = old.get(number)
+            if before is None or before[0] != entity[0]:
+                result[number] = entity
+                continue
+            kind, frame, x, y, angle = entity
+            turn = (angle - before[4] + 180) % 360 - 180   # shortest way round
+            result[number] = (kind, frame,
+                              before[2] + (x - before[2]) * f,
+                              before[3] + (y - before[3]) * f,
+                              (before[4] + turn * f) % 360)
+        return result
+
+
+async def connect(host, port=DEFAULT_PORT, interpolation_delay=0.1):
+    loop = asyncio.get_running_loop()
+    transport, client = await loop.create_datagram_endpoint(
+        lambda: GameClient(interpolation_delay), remote_addr=(host, port))
+    return client
+
+
+# ---- load test: bots without screen, each one in its own process ----
+
+async def bot(host, port, seconds):
+    """a client that only rolls around, for load tests"""
+    client = await connect(host, port)
+    angle = random.random() * 360
+    start = time.monotonic()
+    while time.monotonic() - start < seconds:
+        angle += random.randint(-20, 20)
+        client.send_input(math.cos(math.radians(angle)), math.sin(math.radians(angle)))
+        client.interpolated()
+        await asyncio.sleep(1 / 30)
+    client.close()
+    duration = time.monotonic() - start
+    print("bot slot {}: {} snapshots, {} dropped, {:.1f} kB/s, {:.0f} bytes/snapshot".format(
+          client.slot, client.snapshots, client.dropped, client.bytes_in / duration / 1024,
+          client.bytes_in / max(1, client.snapshots)), flush=True)
+
+
+def loadtest(clients=4, seconds=20, port=DEFAULT_PORT, tickrate=30):
+    """starts a server and some bot clients as processes on localhost"""
+    folder = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen([sys.executable, "Fluffball.py", "--server",
+                               "--port", str(port), "--tickrate", str(tickrate)], cwd=folder)
+    time.sleep(3)   # loading images
+    bots = [subprocess.Popen([sys.executable, "fluffnet.py", "bot", "--port", str(port),
+                              "--seconds", str(seconds)], cwd=folder) for _ in range(clients)]
+    for b in bots:
+        b.wait()
+    server.terminate()
+    server.wait()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Fluffball network tools")
+    parser.add_argument("command", choices=["bot", "loadtest"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--clients", type=int, default=4, help="loadtest: number of bot processes")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--tickrate", type=int, default=30)
+    args = parser.parse_args()
+    if args.command == "bot":
+        asyncio.run(bot(args.host, args.port, args.seconds))
+    else:
+        loadtest(args.clients, args.seconds, args.port, args.tickrate)
@@ -0,0 +1,384 @@
+"""
+golden frames: do the fast paths still play and draw the same game?
+
+A recording is one game without window (dummy video driver): the random
+streams are seeded, prepare_sprites makes the world, then N frames of
+update_world and drawing with a fixed time step. After every frame it
+keeps a hash of the world (the savegame bytes, see world_hash), a
+checksum of the screen and the screen itself, and how long the frame took.
+
+Every entry of PATHS is a fast path with the Game settings of its
+reference. Both are recorded and compared frame by frame. An exact path
+must keep the same world in every frame, and its pictures may only
+differ as much as its bound says. An approximation goes another way on
+purpose, check only says from which frame on:
+
+python golden.py check                      every fast path against its reference
+python golden.py check static_layer         only some of them
+python golden.py record golden.zip          the reference game of this version ...
+python golden.py verify golden.zip          ... against the one of a later version
+
+check prints the milliseconds per frame of reference and fast path and
+ends with exit code 1 if an exact path is not the same (or a path was
+not tested).
+"""
+
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+import zipfile
+import zlib
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+import Fluffball
+
+try:
+    import numpy
+except ImportError:
+    numpy = None    # slower pixel diffs
+
+tobytes = getattr(pygame.image, "tobytes", None) or pygame.image.tostring   # pygame < 2.1.3
+
+SIZE = (1430, 800)
+
+# settings of every recording, the fast paths change some of them.
+# quality_auto is off: the governor would follow the speed of the computer
+BASE = {"quality": 1.0, "quality_auto": False, "rotation_step": 1, "static_layer": True,
+        "kitty_lod": True, "swept": True, "batch_fluffs": True, "bots": True,
+        "world_size": 1, "split_screen": False, "throttle_far": False}
+
+# name: (reference, fast path, exact, pixel bound, scenario)
+# exact: the world must be the same in every frame. the other paths are
+# approximations, they are never "ok", only "approximate, diverges at
+# frame N", and they have no pixel bound: what they leave out shows up
+# later and somewhere else on the screen.
+# pixel bound: share of the color values that may differ in a frame,
+# TURNED: turned_share of the frame.
+# - static_layer: 0, the same pictures at the same places, only blitted
+#   from a prebuilt layer
+# - batch_fluffs: 0, the same tests in the same order, numpy only leaves
+#   out the pairs whose rects do not overlap
+# - rotation_step: TURNED, only the sprites the rounding turns differ
+# - throttle_far: sleepers move in bigger steps, kitty_lod: the far
+#   kitties take their random numbers in another order
+# scenario: players and frames instead of the ones of check, bumps: at least
+# so many Fluffball collisions in both games, else the path was not tested
+# (Fluffball 1 to 4 have keys, nobody presses them: only bots ever meet)
+TURNED = "turned"
+PATHS = {
+    "static_layer": ({"static_layer": False}, {"static_layer": True}, True, 0.0, {}),
+    "batch_fluffs": ({"batch_fluffs": False}, {"batch_fluffs": True}, True, 0.0,
+                     {"players": 16, "frames": 120, "bumps": 1}),
+    "rotation_step": ({"rotation_step": 1}, {"rotation_step": 5}, True, TURNED, {}),
+    "throttle_far": ({"world_size": 2}, {"world_size": 2, "throttle_far": True}, False, None, {}),
+    "kitty_lod": ({"kitty_lod": False}, {"kitty_lod": True}, False, None, {}),
+}
+
+THRESHOLD = 48      # a color value differs if it differs by more than this
+
+
+class Recording():
+    """one played game, frame by frame"""
+
+    def __init__(self, settings, seed, difficulty, players):
+        self.settings = settings
+        self.seed = seed
+        self.difficulty = difficulty
+        self.players = players
+        self.world = []        # world_hash of every frame
+        self.checksums = []    # crc32 of the screen
+        self.frames = []       # RGB bytes of the screen, compressed, None if not kept
+        self.times = []        # milliseconds of simulation and drawing
+        self.turned = []       # turned_share of every frame
+        self.bumps = 0         # Fluffball against Fluffball, all rounds
+
+    def milliseconds(self):
+        return statistics.median(self.times) if self.times else 0.0
+
+    def picture(self, nr):
+        return None if self.frames[nr] is None else zlib.decompress(self.frames[nr])
+
+
+def world_hash(viewer):
+    """hash of world_to_bytes without the random streams and batches: they
+       are made when they are used the first time, so which ones there are
+       depends on the games before. another number drawn shows in the
+       sprites anyway"""
+    data = viewer.world_to_bytes()
+    start = Fluffball.SAVE_HEADER.size
+    end = start + len(viewer.random_to_bytes())
+    return hashlib.blake2b(data[:start] + data[end:], digest_size=16).hexdigest()
+
+
+def premultiplied(surface):
+    """(height, width, 4) array of surface: the colors times the alpha,
+       and the alpha, 0..255"""
+    width, height = surface.get_size()
+    data = numpy.frombuffer(tobytes(surface.convert_alpha(), "RGBA"), numpy.uint8)
+    data = data.reshape(height, width, 4).astype(float)
+    data[:, :, :3] *= data[:, :, 3:] / 255
+    return data
+
+
+def turned_share(viewer, step):
+    """share of the screen where a color value may differ by more than
+       THRESHOLD when the angles are rounded to step degrees
+       (Game.rotation_step) instead of 1 (the reference).
+       a sprite with color c and alpha a blitted over b gives
+       a*c + (1-a)*b, so its two pictures change a color value by at most
+       |a1*c1 - a2*c2| + |a1 - a2| * 255, and 2 more for the rounding of
+       both blits. what is blitted above only makes that smaller: the
+       bound of a pixel is the sum over the sprites the rounding turns.
+       without numpy every pixel of their rects counts"""
+    if step <= 1:
+        return 0.0
+    width, height = viewer.screen.get_size()
+    error = None if numpy is None else numpy.zeros((height, width))
+    screen = pygame.Mask((width, height))
+    for s in viewer.staticgroup.sprites() + viewer.allgroup.shown:
+        angle = getattr(s, "angle", None)
+        if angle is None or not hasattr(s, "image0"):
+            continue
+        exact = angle if getattr(s, "imagename", None) is None else round(angle)
+        rounded = round(angle / step) * step
+        if (rounded - exact) % 360 == 0:
+            continue
+        fast = pygame.transform.rotate(s.image0, rounded)
+        if fast.get_size() != s.image.get_size():
+            continue    # not a turned picture (a sleeping kitty): the same in both
+        slow = pygame.transform.rotate(s.image0, exact)
+        rects = [picture.get_rect(center=s.rect.center) for picture in (fast, slow)]
+        area = rects[0].union(rects[1])
+        if error is not None:
+            layers = numpy.zeros((2, area.height, area.width, 4))
+            for layer, picture, rect in zip(layers, (fast, slow), rects):
+                x, y = rect.x - area.x, rect.y - area.y
+                layer[y:y + rect.height, x:x + rect.width] = premultiplied(picture)
+            diff = numpy.abs(layers[0] - layers[1])
+            bound = diff[:, :, :3].max(axis=2) + diff[:, :, 3] + 2 * (layers[:, :, :, 3].max(axis=0) > 0)
+        for cam in viewer.cameras:
+            shift = (cam.viewport.x - cam.offset[0], cam.viewport.y - cam.offset[1])
+            target = area.move(shift).clip(cam.viewport)
+            if not target.width or not target.height:
+                continue
+            if error is None:
+                screen.draw(pygame.Mask(target.size, fill=True), target.topleft)
+                continue
+            x, y = target.x - area.x - shift[0], target.y - area.y - shift[1]
+            error[target.top:target.bottom, target.left:target.right] += \
+                bound[y:y + target.height, x:x + target.width]
+    if error is not None:
+        return numpy.count_nonzero(error > THRESHOLD) / (width * height)
+    return screen.count() / (width * height)
+
+
+def play(settings=None, frames=120, seed=1234, difficulty=4, players=4, viewer=None):
+    """a Recording of frames frames with BASE and settings"""
+    values = dict(BASE, **(settings or {}))
+    for key, value in values.items():
+        setattr(Fluffball.Game, key, value)
+    Fluffball.Game.difficulty = difficulty
+    Fluffball.Game.players = players
+    viewer = viewer or Fluffball.Viewer(*SIZE, headless=True)
+    Fluffball.VectorSprite.rotated.clear()    # both paths start with cold caches
+    Fluffball.Game.rng.reseed(seed)
+    viewer.playtime = 0.0
+    viewer.prepare_sprites()
+    for slot in range(1, players):
+        viewer.spawn_player(slot)
+    recording = Recording(values, seed, difficulty, players)
+    seconds = 1 / 30
+    for _ in range(frames):
+        start = time.perf_counter()
+        viewer.playtime += seconds
+        if viewer.gameOver and viewer.playtime > viewer.exittime:
+            viewer.new_round()
+        viewer.handle_input(seconds)
+        bumps = viewer.bumps
+        viewer.update_world(seconds)
+        recording.bumps += viewer.bumps - bumps
+        viewer.update_cameras()
+        viewer.draw_static(crazy=viewer.playtime < viewer.crazytime)
+        viewer.draw_sprites()
+        recording.times.append((time.perf_counter() - start) * 1000)
+        recording.turned.append(turned_share(viewer, Fluffball.Game.rotation_step))
+        picture = tobytes(viewer.screen, "RGB")
+        recording.world.append(world_hash(viewer))
+        recording.checksums.append(zlib.crc32(picture))
+        recording.frames.append(zlib.compress(picture, 1))
+    return recording
+
+
+def pixel_diff(a, b, threshold=THRESHOLD):
+    """share (0..1) of the color values of the RGB bytes a and b that differ
+       by more than threshold"""
+    if numpy is not None:
+        x = numpy.frombuffer(a, numpy.uint8).astype(numpy.int16)
+        y = numpy.frombuffer(b, numpy.uint8).astype(numpy.int16)
+        return numpy.count_nonzero(numpy.abs(x - y) > threshold) / max(1, len(a))
+    return sum(1 for p, q in zip(a, b) if abs(p - q) > threshold) / max(1, len(a))
+
+
+class Comparison():
+    """reference against candidate: where the world went another way and
+       how different the pictures are. exact: the candidate must keep the
+       world of the reference. bound: share of the color values that may
+       differ, a number, one per frame (a list) or None (no bound)"""
+
+    def __init__(self, reference, candidate, exact=True, bound=0.0, threshold=THRESHOLD, bumps=0):
+        frames = min(len(reference.world), len(candidate.world))
+        self.frames = frames
+        self.first_world = next((nr for nr in range(frames)
+                                 if reference.world[nr] != candidate.world[nr]), None)
+        self.pictures = 0      # frames with another checksum
+        self.worst = 0.0       # largest pixel_diff of a frame
+        self.worst_frame = None
+        self.over = None       # first frame above the bound: (frame, pixel_diff, bound)
+        for nr in range(frames):
+            if reference.checksums[nr] != candidate.checksums[nr]:
+                self.pictures += 1
+                a, b = reference.picture(nr), candidate.picture(nr)
+                # without both pictures there is only the checksum
+                diff = 1.0 if a is None or b is None else pixel_diff(a, b, threshold)
+                if diff > self.worst:
+                    self.worst, self.worst_frame = diff, nr
+                limit = bound[nr] if isinstance(bound, list) else bound
+                if limit is not None and diff > limit and self.over is None:
+                    self.over = (nr, diff, limit)
+        self.exact = exact
+        self.bumps = (reference.bumps, candidate.bumps)
+        self.tested = min(self.bumps) >= bumps
+        self.speedup = reference.milliseconds() / max(candidate.milliseconds(), 1e-9)
+
+    @property
+    def ok(self):
+        """an exact path that was tested, with the same world in every frame
+           and no picture above the bound. an approximation is never ok"""
+        return self.exact and self.tested and self.first_world is None and self.over is None
+
+    @property
+    def failed(self):
+        """an exact path that is not ok, or a path that was not tested"""
+        return not self.tested or (self.exact and not self.ok)
+
+    def status(self):
+        if self.failed:
+            return "FAILED"
+        if self.ok:
+            return "ok"
+        if self.first_world is None:
+            return "approximate, same world"
+        return "approximate, diverges at frame {}".format(self.first_world)
+
+    def text(self):
+        world = "same" if self.first_world is None else "differs from frame {}".format(self.first_world)
+        pixels = "same" if not self.pictures else "{} frames, worst {:.3%} (frame {})".format(
+                 self.pictures, self.worst, self.worst_frame)
+        text = "world {}, pixels {}".format(world, pixels)
+        if self.over is not None:
+            text += ", frame {} {:.3%} above the bound {:.3%}".format(*self.over)
+        if not self.tested:
+            text = "not tested (bumps {} / {}), ".format(*self.bumps) + text
+        return text
+
+
+def check(names=None, frames=None, seed=1234, difficulty=4, players=None, warmup=15):
+    """every fast path of names (default: all of PATHS) against its
+       reference. frames and players: None is the scenario of the path,
+       or 120 frames with 4 players. returns False if one of them failed"""
+    viewer = Fluffball.Viewer(*SIZE, headless=True)
+    good = True
+    print("path            reference ms   fast ms   speedup")
+    for name in names or PATHS:
+        reference, fast, exact, bound, scenario = PATHS[name]
+        n = frames or scenario.get("frames", 120)
+        p = players or scenario.get("players", 4)
+        # a short game of both first: what only the first game pays
+        # (fonts, imports, the first use of a path) must not count
+        play(reference, warmup, seed, difficulty, p, viewer)
+        play(fast, warmup, seed, difficulty, p, viewer)
+        a = play(reference, n, seed, difficulty, p, viewer)
+        b = play(fast, n, seed, difficulty, p, viewer)
+        if bound == TURNED:
+            bound = b.turned
+        comparison = Comparison(a, b, exact, bound, bumps=scenario.get("bumps", 0))
+        print("{:<15} {:12.2f} {:9.2f} {:8.2f}x   {}  {}".format(
+              name, a.milliseconds(), b.milliseconds(), comparison.speedup,
+              comparison.status(), comparison.text()))
+        good = good and not comparison.failed
+    for key, value in BASE.items():
+        setattr(Fluffball.Game, key, value)
+    return good
+
+
+def save(recording, filename, every=10):
+    """the recording as zip: manifest.json and the RGB picture of every
+       every-th frame (a picture is 3 MB, the other frames only have the
+       checksum)"""
+    manifest = {"settings": recording.settings, "seed": recording.seed, "size": SIZE, "every": every,
+                "difficulty": recording.difficulty, "players": recording.players,
+                "world": recording.world, "checksums": recording.checksums, "times": recording.times}
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("manifest.json", json.dumps(manifest, indent=1))
+        for nr in range(0, len(recording.frames), every):
+            archive.writestr("frame{:04}.rgb".format(nr), recording.picture(nr))
+
+
+def load(filename):
+    with zipfile.ZipFile(filename) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        recording = Recording(manifest["settings"], manifest["seed"], manifest["difficulty"],
+                              manifest["players"])
+        recording.world = manifest["world"]
+        recording.checksums = manifest["checksums"]
+        recording.times = manifest["times"]
+        every = manifest["every"]
+        recording.frames = [zlib.compress(archive.read("frame{:04}.rgb".format(nr)), 1) if nr % every == 0
+                            else None for nr in range(len(recording.world))]
+    return recording
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="golden frames of Fluffball")
+    parser.add_argument("command", choices=["check", "record", "verify"])
+    parser.add_argument("names", nargs="*", help="check: fast paths (default: all), record / verify: the zip file")
+    parser.add_argument("--frames", type=int, help="default: the scenario of the path, 120")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--difficulty", type=int, default=4, choices=range(1, 5))
+    parser.add_argument("--players", type=int, choices=range(1, 17), metavar="1..16",
+                        help="default: the scenario of the path, 4")
+    parser.add_argument("--every", type=int, default=10, metavar="N", help="record: keep the picture of every N-th frame")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="verify: share of color values that may differ")
+    args = parser.parse_args()
+    if args.command == "check":
+        unknown = [name for name in args.names if name not in PATHS]
+        if unknown:
+            parser.error("unknown path {}, there are: {}".format(", ".join(unknown), ", ".join(PATHS)))
+        sys.exit(0 if check(args.names, args.frames, args.seed, args.difficulty, args.players) else 1)
+    if len(args.names) != 1:
+        parser.error("{} needs one file".format(args.command))
+    if args.command == "record":
+        recording = play(None, args.frames or 120, args.seed, args.difficulty, args.players or 4)
+        save(recording, args.names[0], args.every)
+        print("{} frames, {:.2f} ms per frame -> {}".format(len(recording.world), recording.milliseconds(),
+                                                            args.names[0]))
+    else:
+        golden = load(args.names[0])
+        changed = ["{}: {} -> {}".format(key, golden.settings.get(key), BASE.get(key))
+                   for key in sorted(set(golden.settings) | set(BASE)) if golden.settings.get(key) != BASE.get(key)]
+        if changed:
+            print("the settings changed since the recording ({}), the old ones are used".format(", ".join(changed)))
+        recording = play(golden.settings, len(golden.world), golden.seed, golden.difficulty, golden.players)
+        comparison = Comparison(golden, recording, True, args.tolerance)
+        print("{}  {}   {:.2f} ms per frame, was {:.2f} ({:.2f}x)".format(
+              comparison.status(), comparison.text(), recording.milliseconds(),
+              golden.milliseconds(), comparison.speedup))
+        sys.exit(1 if comparison.failed else 0)
@@ -0,0 +1,160 @@
+"""
+memory of a game that runs for days
+
+MemoryTracker looks at the memory in every frame (tracemalloc and the
+number of memory blocks of python) and, once per sample, at the number
+of live objects that the game reports (sprites per class, caches, ...).
+
+Memory goes up and down in every frame, garbage comes and goes. A leak
+is memory that never comes back: for every sample the tracker keeps the
+lowest value since the last sample. If that low water mark grows in
+every sample of a whole window, the value is "growing" and a LeakWarning
+is shown (once for every value).
+
+    tracker = MemoryTracker(interval=1.0, window=60)   # one sample per second, one minute
+    tracker.start()
+    while running:
+        ...
+        tracker.frame(lambda: {"Kitty": len(kittygroup), ...})
+    tracker.report()    # text lines for an overlay
+    tracker.dump()      # the places in the code that hold the most memory
+
+tracemalloc makes python slower, so all of this only runs when it is
+switched on.
+
+The samples come by the clock, not every n frames: the window stays the
+same number of seconds when the fps change.
+"""
+
+import atexit
+import collections
+import sys
+import time
+import tracemalloc
+import warnings
+
+
+class LeakWarning(UserWarning):
+    """a value grew in every sample of the window"""
+
+
+def size(n):
+    """bytes -> text, e.g. 1.5 MB"""
+    if abs(n) < 1024:
+        return "{} B".format(n)
+    for unit in ("kB", "MB", "GB"):
+        n /= 1024
+        if abs(n) < 1024 or unit == "GB":
+            return "{:.1f} {}".format(n, unit)
+
+
+class MemoryTracker():
+    """per frame allocations, live objects per sample, growth detection"""
+
+    def __init__(self, interval=1.0, window=60, nframes=5, clock=time.monotonic):
+        """interval: seconds per sample. window: samples that must all grow
+           before a value is reported. nframes: depth of the tracebacks"""
+        self.interval = interval
+        self.window = window
+        self.nframes = nframes
+        self.clock = clock
+        self.next_sample = clock() + interval
+        self.frames = 0
+        self.series = {}     # { name: deque of the last window samples }
+        self.warned = set()
+        self.growing = []    # names of the growing values
+        self.frame_bytes = 0     # net bytes of the last frame
+        self.frame_blocks = 0    # net memory blocks of the last frame
+        self.last_bytes = self.last_blocks = 0
+        self.low = {}            # lowest values since the last sample
+        self.counts = {}         # live objects of the last sample
+
+    def start(self, dump_on_exit=True):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+        self.last_bytes = tracemalloc.get_traced_memory()[0]
+        self.last_blocks = sys.getallocatedblocks()
+        if dump_on_exit:
+            atexit.register(self.dump)
+
+    def stop(self):
+        atexit.unregister(self.dump)
+        tracemalloc.stop()
+
+    def frame(self, counts=None):
+        """once per frame. counts: function that returns { name: number }
+           of live objects, it is only called for a sample"""
+        traced = tracemalloc.get_traced_memory()[0]
+        blocks = sys.getallocatedblocks()
+        self.frame_bytes = traced - self.last_bytes
+        self.frame_blocks = blocks - self.last_blocks
+        self.last_bytes, self.last_blocks = traced, blocks
+        for name, value in (("traced bytes", traced), ("memory blocks", blocks)):
+            self.low[name] = min(self.low.get(name, value), value)
+        self.frames += 1
+        now = self.clock()
+        if now >= self.next_sample:
+            # a long pause (menu) gives one sample, not many at once
+            self.next_sample = max(self.next_sample + self.interval, now)
+            self.counts = counts() if counts is not None else {}
+            self.sample(dict(self.low, **self.counts))
+            self.low = {}
+
+    def sample(self, values):
+        """one value for every series. a series that is missing in
+           values (e.g. no Crumbs at the moment) gets 0"""
+        for name in set(self.series) | set(values):
+            if name not in self.series:
+                self.series[name] = collections.deque(maxlen=self.window)
+            self.series[name].append(values.get(name, 0))
+        self.growing = [name for name, series in self.series.items() if self.grows(series)]
+        for name in self.growing:
+            if name not in self.warned:
+                self.warned.add(name)
+                series = self.series[name]
+                warnings.warn("{} grew in each of {} samples: {} -> {}".format(
+                              name, len(series), series[0], series[-1]), LeakWarning, stacklevel=2)
+
+    def grows(self, series):
+        """True if series is full, never went down and went up"""
+        if len(series) < self.window or series[-1] <= series[0]:
+            return False
+        previous = series[0]
+        for value in series:
+            if value < previous:
+                return False
+            previous = value
+        return True
+
+    def report(self):
+        """text lines, for the overlay or the console"""
+        traced, peak = tracemalloc.get_traced_memory()
+        lines = ["memory     {} (peak {})".format(size(traced), size(peak)),
+                 "per frame  {:+} B {:+} blocks".format(self.frame_bytes, self.frame_blocks)]
+        for name, count in sorted(self.counts.items()):
+            lines.append("  {:<17}{:6}".format(name[:17], count))
+        if self.growing:
+            lines.append("growing    " + ", ".join(self.growing))
+        return lines
+
+    def top(self, limit=15):
+        """text lines: the places in the code with the most memory"""
+        if not tracemalloc.is_tracing():
+            return ["tracemalloc is not running"]
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")))
+        lines = []
+        for stat in snapshot.statistics("lineno")[:limit]:
+            frame = stat.traceback[0]
+            lines.append("{:>10} {:7} blocks  {}:{}".format(size(stat.size), stat.count,
+                         frame.filename, frame.lineno))
+        return lines
+
+    def dump(self, file=None):
+        """report and top allocation sites, to file (default: stdout)"""
+        file = file or sys.stdout
+        print("---- memory after {} frames ----".format(self.frames), file=file)
+        for line in self.report() + self.top():
+            print(line, file=file)
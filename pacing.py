@@ -0,0 +1,145 @@
+"""
+frame pacing for Fluffball
+
+clock.tick(fps) sleeps with the granularity of the operating system
+(on Windows often 10-16 ms), so at 30 fps some frames take 30 ms and
+others 40 ms and the Fluffballs judder. FramePacer can wait in
+different ways:
+
+    "tick"     pygame.time.Clock.tick, sleeps (coarse, uses no cpu)
+    "busy"     pygame.time.Clock.tick_busy_loop, spins (exact, one cpu core)
+    "hybrid"   sleeps until shortly before the deadline, then spins
+    "vsync"    pygame.display.flip waits for the monitor, see set_mode
+
+Every strategy keeps the same statistics: a histogram of the jitter
+(how far each frame interval is away from 1/fps) and the missed
+deadlines (the frame was not finished when the next one should start).
+
+    pacer = FramePacer(fps=60, strategy="hybrid")
+    while running:
+        milliseconds = pacer.wait()
+        ...
+        pygame.display.flip()
+"""
+
+import collections
+import time
+
+import pygame
+
+STRATEGIES = ("tick", "busy", "hybrid", "vsync")
+# upper edges of the jitter histogram in milliseconds, the last bin is "more"
+JITTER_BINS = (0.25, 0.5, 1, 2, 4, 8, 16)
+
+
+def set_mode(size, flags=0, vsync=False):
+    """pygame.display.set_mode, with vsync if SDL can do it.
+       vsync needs the SCALED (or OPENGL) flag in pygame 2.
+       returns (screen, vsync) with vsync False if it did not work"""
+    if vsync:
+        try:
+            return pygame.display.set_mode(size, flags | pygame.SCALED, vsync=1), True
+        except pygame.error:
+            pass
+    return pygame.display.set_mode(size, flags), False
+
+
+class FramePacer():
+    """waits for the next frame and measures how exact that was"""
+
+    def __init__(self, fps=30, strategy="hybrid", spin=0.002):
+        """spin: seconds before the deadline where "hybrid" stops
+           sleeping and starts spinning"""
+        self.clock = pygame.time.Clock()
+        self.spin = spin
+        self.vsync = False          # True if the display really has vsync
+        self.strategy = "hybrid"
+        self.set_strategy(strategy)
+        self.set_fps(fps)
+        self.reset()
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.interval = 1 / fps
+
+    def set_strategy(self, strategy):
+        if strategy not in STRATEGIES:
+            raise ValueError("unknown pacing strategy {!r}, use one of {}".format(strategy, STRATEGIES))
+        self.strategy = strategy
+
+    def reset(self):
+        """forget all statistics, e.g. after a change of fps or strategy"""
+        self.last = time.perf_counter()
+        self.deadline = self.last + self.interval
+        self.frames = 0
+        self.missed = 0
+        self.histogram = [0] * (len(JITTER_BINS) + 1)
+        self.worst = 0.0                                # milliseconds
+        self.intervals = collections.deque(maxlen=60)   # seconds, for get_fps
+
+    def wait(self):
+        """waits until the next frame should start.
+           returns the milliseconds since the last call, like clock.tick"""
+        now = time.perf_counter()
+        limit = self.interval
+        if self.strategy == "vsync" and self.vsync:
+            limit *= 1.5    # flip waits for the monitor, so every frame is about 1/fps
+        if now - self.last > limit:
+            self.missed += 1    # the frame took longer than 1/fps
+        if now > self.deadline:
+            # too late: start a new schedule from now instead of
+            # hurrying to catch up with several short frames
+            self.deadline = now
+        if self.strategy == "tick":
+            self.clock.tick(self.fps)
+        elif self.strategy == "busy":
+            self.clock.tick_busy_loop(self.fps)
+        elif self.strategy == "vsync" and self.vsync and now - self.last > self.interval * 0.5:
+            pass   # flip has already waited for the monitor
+        else:
+            # hybrid, and vsync when flip did not wait (driver ignores vsync)
+            rest = self.deadline - time.perf_counter()
+            if rest > self.spin:
+                time.sleep(rest - self.spin)
+            while time.perf_counter() < self.deadline:
+                pass
+        now = time.perf_counter()
+        seconds = now - self.last
+        self.last = now
+        self.deadline += self.interval
+        self.record(seconds)
+        return seconds * 1000
+
+    def record(self, seconds):
+        self.frames += 1
+        self.intervals.append(seconds)
+        jitter = abs(seconds - self.interval) * 1000
+        self.worst = max(self.worst, jitter)
+        for i, edge in enumerate(JITTER_BINS):
+            if jitter < edge:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def get_fps(self):
+        if not self.intervals:
+            return 0.0
+        return len(self.intervals) / sum(self.intervals)
+
+    def report(self):
+        """the statistics as text lines, for the overlay or the console"""
+        lines = ["pacing     {} {} fps{}".format(self.strategy, self.fps,
+                 "" if self.strategy != "vsync" or self.vsync else " (no vsync)"),
+                 "missed     {} of {} frames".format(self.missed, self.frames),
+                 "jitter max {:6.2f} ms".format(self.worst)]
+        total = max(1, self.frames)
+        low = 0
+        for edge, count in zip(JITTER_BINS + (None,), self.histogram):
+            if edge is None:
+                name = ">{} ms".format(low)
+            else:
+                name = "<{} ms".format(edge)
+            lines.append("  {:<9}{:5.1%} {}".format(name, count / total, "#" * round(count / total * 20)))
+            low = edge
+        return lines
@@ -0,0 +1,201 @@
+"""
+a sampling profiler: which function is the game in, right now?
+
+A background thread wakes up rate times per second and looks at the stack
+of the game thread (sys._current_frames). Nothing in the game is
+measured or changed, so it can run on a cabinet while people play.
+
+Every sample is one stack, root first. A function is named by its
+qualified name, e.g. "VectorSprite.wallbounce", and by the class of self
+in brackets when that is another one (a Kitty that bounces:
+"VectorSprite.wallbounce[Kitty]"). For the classes given to the profiler
+(e.g. the sprites) every sample also counts for the innermost function
+of such an object, so update() of every sprite class gets its own share:
+
+    sampler = SamplingProfiler(rate=200, classes=(pygame.sprite.Sprite,))
+    sampler.start()              # samples the thread that calls start
+    ...
+    sampler.stop()
+    sampler.top(5)               # [(label, share), ...] by class
+    sampler.write("fluffball.folded")
+
+The .folded file has the collapsed stacks ("main;run;update_world 42"),
+for flamegraph.pl, speedscope or inferno.
+
+The sampling thread needs the GIL, while it reads a stack the game
+stands still. report() shows how long that was (overhead) and how many
+samples per second it really got (the GIL is handed over only every
+sys.getswitchinterval() seconds, see there).
+"""
+
+import collections
+import sys
+import threading
+import time
+
+DEFAULT_RATE = 200      # samples per second
+DEFAULT_FILE = "fluffball.folded"
+
+
+def label(frame, classes=()):
+    """(name of the function of frame, True if self is one of classes)"""
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)   # python < 3.11: no class
+    if code.co_argcount and code.co_varnames[0] == "self":
+        this = frame.f_locals.get("self")
+        if this is not None:
+            kind = type(this).__name__
+            if not name.startswith(kind + "."):
+                name = "{}[{}]".format(name, kind)
+            return name, isinstance(this, classes)
+    return name, False
+
+
+class SamplingProfiler():
+    """samples the stack of one thread from a background thread"""
+
+    def __init__(self, rate=DEFAULT_RATE, classes=()):
+        """rate: samples per second. classes: a sample counts for the
+           innermost function of an object of these classes, see top"""
+        self.rate = rate
+        self.classes = tuple(classes)
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.target = None
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.stacks = collections.Counter()    # { (root, ..., leaf): samples }
+            self.by_class = collections.Counter()  # { label: samples }
+            self.samples = 0
+            self.busy = 0.0        # seconds of sampling, the game waited this long
+            self.elapsed = 0.0     # seconds of the finished runs
+        self.started = None
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def start(self, thread=None):
+        """thread: the ident of the thread to sample, default: this one"""
+        if self.thread is not None:
+            return
+        self.target = threading.get_ident() if thread is None else thread
+        self.stopping.clear()
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self.work, name="profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+        self.elapsed += time.perf_counter() - self.started
+        self.started = None
+
+    def toggle(self):
+        """starts (with no samples) or stops, returns True if it runs now"""
+        if self.running:
+            self.stop()
+        else:
+            self.clear()
+            self.start()
+        return self.running
+
+    def work(self):
+        interval = 1 / self.rate
+        wake = time.perf_counter()
+        while not self.stopping.is_set():
+            wake += interval
+            delay = wake - time.perf_counter()
+            if delay > 0:
+                self.stopping.wait(delay)
+            else:
+                wake = time.perf_counter()    # too late, no catching up
+            start = time.perf_counter()
+            frame = sys._current_frames().get(self.target)
+            if frame is not None:
+                self.sample(frame)
+            frame = None
+            with self.lock:
+                self.busy += time.perf_counter() - start
+
+    def sample(self, frame):
+        stack = []
+        owner = None     # innermost function of an object of self.classes
+        while frame is not None:
+            name, mine = label(frame, self.classes)
+            stack.append(name)
+            if mine and owner is None:
+                owner = name
+            frame = frame.f_back
+        stack.reverse()
+        with self.lock:
+            self.stacks[tuple(stack)] += 1
+            if owner is not None:
+                self.by_class[owner] += 1
+            self.samples += 1
+
+    def seconds(self):
+        """seconds of sampling, the running one included"""
+        return self.elapsed + (time.perf_counter() - self.started if self.started is not None else 0.0)
+
+    def top(self, n=10):
+        """[(label, share of all samples), ...] of the functions of
+           self.classes, the largest first"""
+        with self.lock:
+            samples = max(1, self.samples)
+            return [(name, count / samples) for name, count in self.by_class.most_common(n)]
+
+    def collapsed(self):
+        """lines of the collapsed stack format: "root;...;leaf samples" """
+        with self.lock:
+            stacks = sorted(self.stacks.items())
+        return ["{} {}".format(";".join(stack), count) for stack, count in stacks]
+
+    def write(self, filename=DEFAULT_FILE):
+        with open(filename, "w", encoding="utf-8") as folded:
+            for line in self.collapsed():
+                folded.write(line + "\n")
+
+    def overhead(self):
+        """(share of the time the sampled thread waited, microseconds per sample)"""
+        seconds = self.seconds()
+        with self.lock:
+            return self.busy / max(seconds, 1e-9), self.busy / max(self.samples, 1) * 1e6
+
+    def report(self, n=5):
+        """text lines, for the overlay"""
+        share, per_sample = self.overhead()
+        lines = ["profiler   {} samples, {:.0f}/s{}".format(self.samples, self.samples / max(self.seconds(), 1e-9),
+                                                           "" if self.running else " (stopped)"),
+                 "  overhead {:.2%} ({:.0f} us per sample)".format(share, per_sample)]
+        for name, part in self.top(n):
+            lines.append("  {:5.1%} {}".format(part, name))
+        return lines
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="functions with the most samples in a .folded file")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    inclusive = collections.Counter()
+    exclusive = collections.Counter()
+    total = 0
+    with open(args.file, encoding="utf-8") as folded:
+        for line in folded:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            names = stack.split(";")
+            total += int(count)
+            exclusive[names[-1]] += int(count)
+            for name in set(names):
+                inclusive[name] += int(count)
+    print("{} samples\n  total    self  function".format(total))
+    for name, count in inclusive.most_common(args.limit):
+        print("{:6.1%}  {:6.1%}  {}".format(count / max(total, 1), exclusive[name] / max(total, 1), name))
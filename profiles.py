@@ -0,0 +1,88 @@
+"""
+named settings for the launcher, from an ini file
+
+Every cabinet class gets its own section in profiles.ini, a command line
+flag overrides a single value of the profile:
+
+    [low]
+    resolution = 1024x576
+    fps = 30
+    quality = 0.5
+
+    python Fluffball.py --profile low --fps 25
+
+SETTINGS (in Fluffball.py) says what a profile may contain, every name
+with a function that makes the value out of the text and a default:
+
+    SETTINGS = {"fps": (int, 30), "fullscreen": (boolean, False), ...}
+    values = load("profiles.ini", "low", SETTINGS)   # { name: value }
+
+The [DEFAULT] section of the file counts for every profile. An empty
+value ("seed =") is None.
+"""
+
+import configparser
+import os
+
+DEFAULT_FILE = "profiles.ini"
+
+
+def boolean(text):
+    """yes/no, on/off, true/false, 1/0"""
+    value = text.strip().lower()
+    if value in configparser.ConfigParser.BOOLEAN_STATES:
+        return configparser.ConfigParser.BOOLEAN_STATES[value]
+    raise ValueError("not yes or no: {!r}".format(text))
+
+
+def resolution(text):
+    """"1430x800" -> (1430, 800)"""
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def read(filename=DEFAULT_FILE):
+    """the ConfigParser of filename, an empty one if there is no such file"""
+    config = configparser.ConfigParser()
+    if os.path.exists(filename):
+        with open(filename, encoding="utf-8") as file:
+            config.read_file(file)
+    return config
+
+
+def names(config):
+    return config.sections()
+
+
+def load(filename, name, settings):
+    """{ setting: value } of profile name. name None: only the defaults
+       (of settings and of [DEFAULT]). raises ValueError for an unknown
+       profile or setting and for a value that does not fit"""
+    config = read(filename)
+    if name is None:
+        section = config.defaults()
+    elif config.has_section(name):
+        section = config[name]
+    else:
+        raise ValueError("no profile {!r} in {}, there are: {}".format(
+                         name, filename, ", ".join(names(config)) or "none"))
+    values = {key: default for key, (convert, default) in settings.items()}
+    for key, text in section.items():
+        if key not in settings:
+            raise ValueError("{}: unknown setting {!r} in profile {!r}".format(filename, key, name))
+        convert = settings[key][0]
+        try:
+            values[key] = convert(text) if text.strip() else None
+        except ValueError as error:
+            raise ValueError("{}: {} = {!r} in profile {!r}: {}".format(filename, key, text, name, error))
+    return values
+
+
+def override(values, flags):
+    """values with every flag that is not None, flags: { setting: value }
+       (e.g. vars() of the argparse namespace)"""
+    values = dict(values)
+    for key in values:
+        if flags.get(key) is not None:
+            values[key] = flags[key]
+    return values
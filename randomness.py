@@ -0,0 +1,130 @@
+"""
+random numbers that can be repeated
+
+Every part of the game (placing things, kitties, paws, effects, ...)
+draws from its own stream. All streams come from one seed, so a world
+with the same seed and the same inputs is the same world again, and
+more sparks in an explosion do not change what the kitties do.
+
+    rng = RandomService(seed=1234)
+    rng.kitty.randint(3, 20)                # a random.Random for every subsystem
+    batch = rng.batch("effects")            # many numbers in one call
+    angles = batch.integers(0, 361, 50)     # list of 50 ints, 0 <= a < 361
+
+batch() uses numpy if it is installed. There is one numpy Generator per
+name, made once (making one costs as much as drawing a few dozen numbers)
+and kept, like the streams; getbatches() / setbatches() are its state for
+savegames. Without numpy the numbers come one by one from random.Random,
+they are different numbers then, but just as repeatable.
+"""
+
+import hashlib
+import os
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def derive(seed, name):
+    """the seed of stream name, from the seed of the world"""
+    digest = hashlib.sha256("{}/{}".format(seed, name).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+class Batch():
+    """many random numbers in one call, as lists"""
+
+    def __init__(self, seed):
+        self.generator = None
+        self.stream = None
+        self.seed(seed)
+
+    def seed(self, seed):
+        if numpy is not None:
+            self.generator = numpy.random.default_rng(seed)
+        else:
+            self.stream = random.Random(seed)
+
+    def getstate(self):
+        """the bit_generator.state of numpy (a dict) or random.Random.getstate()"""
+        if self.generator is not None:
+            return self.generator.bit_generator.state
+        return self.stream.getstate()
+
+    def setstate(self, state):
+        """a state of the other kind (saved with or without numpy) is ignored"""
+        if self.generator is not None and isinstance(state, dict):
+            self.generator.bit_generator.state = state
+        elif self.generator is None and isinstance(state, tuple):
+            self.stream.setstate(state)
+
+    def integers(self, low, high, size):
+        """size ints with low <= i < high"""
+        if self.generator is not None:
+            return self.generator.integers(low, high, size).tolist()
+        return [self.stream.randrange(low, high) for _ in range(size)]
+
+    def random(self, size):
+        """size floats with 0.0 <= f < 1.0"""
+        if self.generator is not None:
+            return self.generator.random(size).tolist()
+        return [self.stream.random() for _ in range(size)]
+
+
+class RandomService():
+    """one random.Random for every subsystem, all made from one seed.
+       rng.name is the stream name, it is made the first time it is used"""
+
+    def __init__(self, seed=None):
+        self.streams = {}    # { name: random.Random }
+        self.batches = {}    # { name: Batch }
+        self.reseed(seed)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.stream(name)
+
+    def stream(self, name):
+        if name not in self.streams:
+            stream = random.Random(derive(self.seed, name))
+            self.streams[name] = stream
+            setattr(self, name, stream)   # next time without __getattr__
+        return self.streams[name]
+
+    def reseed(self, seed=None):
+        """starts every stream again from seed (None: a new random seed).
+           the random.Random objects stay the same, so whoever keeps
+           one (e.g. the scheduler) gets the new numbers too"""
+        if seed is None:
+            seed = int.from_bytes(os.urandom(4), "big")
+        self.seed = seed % 2 ** 64    # a 64 bit number, for savegames
+        for name, stream in self.streams.items():
+            stream.seed(derive(self.seed, name))
+        for name, batch in self.batches.items():
+            batch.seed(derive(self.seed, "batch/" + name))
+
+    def batch(self, name):
+        """the Batch of name, made the first time it is used"""
+        if name not in self.batches:
+            self.batches[name] = Batch(derive(self.seed, "batch/" + name))
+        return self.batches[name]
+
+    def getstate(self):
+        """{ name: random.Random.getstate() }, for savegames"""
+        return {name: stream.getstate() for name, stream in self.streams.items()}
+
+    def setstate(self, states):
+        for name, state in states.items():
+            self.stream(name).setstate(state)
+
+    def getbatches(self):
+        """{ name: Batch.getstate() }, for savegames"""
+        return {name: batch.getstate() for name, batch in self.batches.items()}
+
+    def setbatches(self, states):
+        for name, state in states.items():
+            self.batch(name).setstate(state)
@@ -0,0 +1,254 @@
+"""
+statistics of every round and session, in a local SQLite file
+
+The game only puts what happened into a queue (a session starts, a round
+is over, ...). A background thread writes it, several rows in one
+transaction, so the game never waits for the disk:
+
+    stats = StatsStore("fluffball.db", cabinet="halle-3")
+    session = stats.start_session(difficulty=1, players=2, seed=1234)
+    stats.record_round(session, outcome="won", duration=83.2, collisions=41,
+                       food_left=0, difficulty=1, players=2, frames=2496,
+                       frame_avg=4.2, frame_worst=31.0,
+                       fluffs=[(0, "fluffballr.", 12), (1, "fluffballb.", 8)])
+    stats.end_session(session)
+    stats.close()                   # writes what is left
+
+Reading is separate (another connection, also from another process):
+
+    highscores("fluffball.db", difficulty=4)
+    performance("fluffball.db")     # frame times per cabinet and day
+
+    python roundstats.py highscores --difficulty 4
+    python roundstats.py performance --cabinet halle-3
+    python roundstats.py sessions
+"""
+
+import contextlib
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_FILE = "fluffball.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    cabinet TEXT,
+    started REAL,
+    ended REAL,
+    difficulty INTEGER,
+    players INTEGER,
+    seed INTEGER
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    session TEXT REFERENCES sessions(id),
+    ended REAL,
+    outcome TEXT,             -- won, lost or aborted
+    duration REAL,            -- seconds of play
+    collisions INTEGER,
+    food_left INTEGER,
+    difficulty INTEGER,
+    players INTEGER,
+    frames INTEGER,
+    frame_avg REAL,           -- milliseconds of work per frame
+    frame_worst REAL
+);
+CREATE TABLE IF NOT EXISTS fluffs (
+    round INTEGER REFERENCES rounds(id),
+    slot INTEGER,
+    color TEXT,
+    eaten INTEGER
+);
+CREATE INDEX IF NOT EXISTS rounds_session ON rounds(session);
+CREATE INDEX IF NOT EXISTS fluffs_round ON fluffs(round);
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=10)
+    connection.execute("PRAGMA journal_mode=WAL")    # reading while the game writes
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class StatsStore():
+    """write-behind: the methods only queue, a thread writes in batches"""
+
+    def __init__(self, path=DEFAULT_FILE, cabinet=None, batch=64, delay=1.0):
+        """cabinet: name of this machine (default: host name). batch: most
+           rows in one transaction, delay: seconds the thread waits for
+           more rows before it writes"""
+        self.path = path
+        self.cabinet = cabinet or socket.gethostname()
+        self.batch = batch
+        self.delay = delay
+        self.pending = queue.Queue()
+        self.written = 0        # rows in the file
+        self.transactions = 0
+        self.errors = 0
+        self.last_error = None
+        self.thread = threading.Thread(target=self.work, name="roundstats", daemon=True)
+        self.thread.start()
+
+    # ------ main thread: only queue.put ------
+    def start_session(self, difficulty=None, players=None, seed=None):
+        """returns the id of the new session"""
+        session = uuid.uuid4().hex
+        self.pending.put(("session", (session, self.cabinet, time.time(), difficulty, players, seed)))
+        return session
+
+    def end_session(self, session):
+        self.pending.put(("end", (time.time(), session)))
+
+    def record_round(self, session, outcome, duration, collisions, food_left, difficulty,
+                     players, frames=0, frame_avg=0.0, frame_worst=0.0, fluffs=()):
+        """fluffs: (slot, color, eaten) of every Fluffball"""
+        self.pending.put(("round", ((session, time.time(), outcome, duration, collisions, food_left,
+                                     difficulty, players, frames, frame_avg, frame_worst), list(fluffs))))
+
+    def close(self, timeout=5.0):
+        """writes everything that is queued and stops the thread"""
+        self.pending.put(None)
+        self.thread.join(timeout)
+
+    # ------ background thread ------
+    def work(self):
+        try:
+            connection = connect(self.path)
+        except sqlite3.Error as error:
+            # e.g. no such directory: nothing is written, the queue must not grow
+            self.errors += 1
+            self.last_error = error
+            connection = None
+        running = True
+        while running:
+            items = [self.pending.get()]
+            end = time.monotonic() + self.delay
+            while items[-1] is not None and len(items) < self.batch:
+                try:
+                    items.append(self.pending.get(timeout=max(0.0, end - time.monotonic())))
+                except queue.Empty:
+                    break
+            if items[-1] is None:
+                running = False
+                items.pop()
+            if items and connection is not None:
+                self.write(connection, items)
+        if connection is not None:
+            connection.close()
+
+    def write(self, connection, items):
+        """all items in one transaction"""
+        try:
+            with connection:
+                for kind, values in items:
+                    if kind == "session":
+                        connection.execute("INSERT INTO sessions (id, cabinet, started, difficulty, players, seed)"
+                                           " VALUES (?, ?, ?, ?, ?, ?)", values)
+                    elif kind == "end":
+                        connection.execute("UPDATE sessions SET ended = ? WHERE id = ?", values)
+                    elif kind == "round":
+                        row, fluffs = values
+                        cursor = connection.execute(
+                            "INSERT INTO rounds (session, ended, outcome, duration, collisions, food_left,"
+                            " difficulty, players, frames, frame_avg, frame_worst)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                        connection.executemany("INSERT INTO fluffs (round, slot, color, eaten) VALUES (?, ?, ?, ?)",
+                                               [(cursor.lastrowid, *fluff) for fluff in fluffs])
+            self.written += len(items)
+            self.transactions += 1
+        except sqlite3.Error as error:
+            # e.g. the disk is full: the game goes on, the rows are lost
+            self.errors += 1
+            self.last_error = error
+
+    def report(self):
+        """text lines, for the overlay"""
+        lines = ["stats      {} rows in {} transactions".format(self.written, self.transactions)]
+        if self.errors:
+            lines.append("  errors {}: {}".format(self.errors, self.last_error))
+        return lines
+
+
+# ------ queries ------
+def highscores(path=DEFAULT_FILE, difficulty=None, players=None, limit=10):
+    """the fastest won rounds, fewer collisions first when they are just as fast.
+       rows: (duration, collisions, difficulty, players, cabinet, ended, best eater)"""
+    where, args = ["r.outcome = 'won'"], []
+    if difficulty is not None:
+        where.append("r.difficulty = ?")
+        args.append(difficulty)
+    if players is not None:
+        where.append("r.players = ?")
+        args.append(players)
+    with contextlib.closing(connect(path)) as connection:
+        return connection.execute(
+            "SELECT r.duration, r.collisions, r.difficulty, r.players, s.cabinet, r.ended,"
+            " (SELECT f.slot + 1 FROM fluffs f WHERE f.round = r.id ORDER BY f.eaten DESC LIMIT 1)"
+            " FROM rounds r JOIN sessions s ON s.id = r.session"
+            " WHERE " + " AND ".join(where) +
+            " ORDER BY r.duration, r.collisions LIMIT ?", args + [limit]).fetchall()
+
+
+def performance(path=DEFAULT_FILE, cabinet=None, days=30):
+    """frame times per cabinet and day.
+       rows: (cabinet, day, rounds, frames, average ms, worst ms)"""
+    where, args = ["r.ended >= ?"], [time.time() - days * 86400]
+    if cabinet is not None:
+        where.append("s.cabinet = ?")
+        args.append(cabinet)
+    with contextlib.closing(connect(path)) as connection:
+        return connection.execute(
+            "SELECT s.cabinet, date(r.ended, 'unixepoch', 'localtime') AS day, count(*), sum(r.frames),"
+            " sum(r.frame_avg * r.frames) / max(sum(r.frames), 1), max(r.frame_worst)"
+            " FROM rounds r JOIN sessions s ON s.id = r.session"
+            " WHERE " + " AND ".join(where) +
+            " GROUP BY s.cabinet, day ORDER BY s.cabinet, day", args).fetchall()
+
+
+def sessions(path=DEFAULT_FILE, limit=20):
+    """rows: (cabinet, started, ended, rounds, won, lost)"""
+    with contextlib.closing(connect(path)) as connection:
+        return connection.execute(
+            "SELECT s.cabinet, s.started, s.ended, count(r.id),"
+            " sum(r.outcome = 'won'), sum(r.outcome = 'lost')"
+            " FROM sessions s LEFT JOIN rounds r ON r.session = s.id"
+            " GROUP BY s.id ORDER BY s.started DESC LIMIT ?", (limit,)).fetchall()
+
+
+def when(timestamp):
+    return "-" if timestamp is None else time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Fluffball round statistics")
+    parser.add_argument("command", choices=["highscores", "performance", "sessions"])
+    parser.add_argument("--db", default=DEFAULT_FILE, metavar="FILE")
+    parser.add_argument("--difficulty", type=int)
+    parser.add_argument("--players", type=int)
+    parser.add_argument("--cabinet")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    if args.command == "highscores":
+        print("  #  seconds  collisions  difficulty  players  best    cabinet          when")
+        for nr, (duration, collisions, difficulty, players, cabinet, ended, best) in enumerate(
+                highscores(args.db, args.difficulty, args.players, args.limit)):
+            print("{:3}  {:7.1f}  {:10}  {:10}  {:7}  {:>4}    {:<16} {}".format(
+                  nr + 1, duration, collisions, difficulty, players, best or "-", cabinet, when(ended)))
+    elif args.command == "performance":
+        print("cabinet          day         rounds    frames   avg ms  worst ms")
+        for cabinet, day, rounds, frames, average, worst in performance(args.db, args.cabinet, args.days):
+            print("{:<16} {}  {:6}  {:8}  {:7.2f}  {:8.2f}".format(cabinet, day, rounds, frames or 0,
+                                                                 average or 0.0, worst or 0.0))
+    else:
+        print("cabinet          started           ended             rounds  won  lost")
+        for cabinet, started, ended, rounds, won, lost in sessions(args.db, args.limit):
+            print("{:<16} {}  {}  {:6}  {:3}  {:4}".format(cabinet, when(started), when(ended),
+                                                          rounds, won or 0, lost or 0))
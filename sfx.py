@@ -0,0 +1,156 @@
+"""
+sound effects with a fixed number of channels
+
+Every sound is made once (from a file, or synthesized with synth) and
+played on one of a few mixer channels. When all channels are busy, a new
+sound takes the channel of the oldest sound with a lower (or the same)
+priority ("voice stealing"), or it is not played at all ("dropped").
+Every effect has a limit per frame and a shortest time between two
+starts, so 300 crumbs or a kitty that plays in every frame do not flood
+the mixer.
+
+    pre_init(buffer=512)        # before pygame.init(): small buffer, low latency
+    engine = SoundEngine(channels=8)
+    engine.add("mjam", synth(600, 0.15, end_frequency=400), priority=2, per_frame=1, interval=0.1)
+    engine.play("mjam")
+    engine.frame(seconds)       # once per frame: new limits
+    engine.report()             # played, limited, dropped, stolen
+
+Without a sound device (server, no audio driver) the engine is switched
+off and play() does nothing.
+"""
+
+import array
+import math
+import random
+
+import pygame
+
+FREQUENCY = 44100
+
+
+def pre_init(buffer=512, frequency=FREQUENCY):
+    """mixer settings for pygame.init(). the buffer is in samples, 512
+       at 44100 Hz are about 12 ms from play() to the speaker (pygame's
+       default is larger). too small and the sound crackles"""
+    pygame.mixer.pre_init(frequency, -16, 2, buffer)
+
+
+def synth(frequency, seconds, volume=0.5, end_frequency=None, noise=0.0):
+    """a short sound without a file: a sine from frequency to
+       end_frequency, noise 0..1 mixed in, fading out.
+       needs an initialized mixer (for its sample format)"""
+    rate, fmt, channels = pygame.mixer.get_init()
+    end_frequency = frequency if end_frequency is None else end_frequency
+    n = max(1, int(rate * seconds))
+    rng = random.Random(frequency)   # the same sound every time
+    phase = 0.0
+    values = []
+    for i in range(n):
+        t = i / n
+        phase += 2 * math.pi * (frequency + (end_frequency - frequency) * t) / rate
+        value = math.sin(phase) * (1 - noise) + rng.uniform(-1, 1) * noise
+        envelope = min(1.0, i / (rate * 0.005)) * (1 - t) ** 2   # 5 ms attack, then fade out
+        values.append(value * envelope * volume)
+    if fmt == 32:   # float samples
+        samples = array.array("f", values)
+    elif fmt == 8:
+        samples = array.array("B", (int(v * 127) + 128 for v in values))
+    elif fmt == -8:
+        samples = array.array("b", (int(v * 127) for v in values))
+    else:
+        samples = array.array("h", (int(v * 32767) for v in values))
+    if channels > 1:
+        samples = array.array(samples.typecode, (s for s in samples for _ in range(channels)))
+    return pygame.mixer.Sound(buffer=samples.tobytes())
+
+
+class Effect():
+    __slots__ = ("sound", "priority", "per_frame", "interval", "volume", "count", "last")
+
+    def __init__(self, sound, priority, per_frame, interval, volume):
+        self.sound = sound
+        self.priority = priority
+        self.per_frame = per_frame
+        self.interval = interval
+        self.volume = volume
+        self.count = 0          # starts in this frame
+        self.last = -math.inf   # time of the last start
+
+
+class SoundEngine():
+    """a pool of mixer channels for named effects"""
+
+    def __init__(self, channels=8, enabled=True):
+        """enabled False: no sound, e.g. on a server"""
+        self.enabled = enabled and pygame.mixer.get_init() is not None
+        self.effects = {}   # { name: Effect }
+        self.time = 0.0
+        self.played = self.limited = self.dropped = self.stolen = 0
+        self.channels = []
+        self.voices = {}    # { channel index: (priority, start time) }
+        if self.enabled:
+            pygame.mixer.set_num_channels(channels)
+            self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+
+    def add(self, name, sound, priority=1, per_frame=1, interval=0.0, volume=1.0):
+        """sound: pygame.mixer.Sound (or a filename), priority: higher
+           wins a channel. per_frame: most starts in one frame, interval:
+           shortest time in seconds between two starts"""
+        if not self.enabled:
+            return
+        if isinstance(sound, str):
+            sound = pygame.mixer.Sound(sound)
+        self.effects[name] = Effect(sound, priority, per_frame, interval, volume)
+
+    def frame(self, seconds):
+        self.time += seconds
+        for effect in self.effects.values():
+            effect.count = 0
+
+    def play(self, name):
+        """starts effect name, if the limits and the channels allow it.
+           returns True if it plays"""
+        effect = self.effects.get(name)
+        if effect is None:
+            return False
+        if effect.count >= effect.per_frame or self.time - effect.last < effect.interval:
+            self.limited += 1
+            return False
+        index = self.free_channel(effect.priority)
+        if index is None:
+            self.dropped += 1
+            return False
+        effect.count += 1
+        effect.last = self.time
+        channel = self.channels[index]
+        channel.set_volume(effect.volume)
+        channel.play(effect.sound)
+        self.voices[index] = (effect.priority, self.time)
+        self.played += 1
+        return True
+
+    def free_channel(self, priority):
+        """index of an idle channel, or of the channel to steal: the
+           oldest sound with the lowest priority, not higher than
+           priority. None if every channel plays something more important"""
+        victim = None
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return index
+            voice = self.voices.get(index, (-math.inf, -math.inf))
+            if voice[0] <= priority and (victim is None or voice < self.voices.get(victim, voice)):
+                victim = index
+        if victim is not None:
+            self.channels[victim].stop()
+            self.stolen += 1
+        return victim
+
+    def report(self):
+        """text lines, for the overlay"""
+        if not self.enabled:
+            return ["sounds     off"]
+        busy = sum(channel.get_busy() for channel in self.channels)
+        return ["sounds     {} of {} channels".format(busy, len(self.channels)),
+                "  played {} limited {}".format(self.played, self.limited),
+                "  dropped {} stolen {}".format(self.dropped, self.stolen)]
@@ -0,0 +1,128 @@
+"""
+frames of the world in shared memory, from one process to another
+
+The simulation process writes every finished step as a compact list of
+records (number, kind, image, x, y, angle, layer) into one of a few
+slots of a shared memory block (a ring, 2 slots = double buffer) and
+then says in the header that this is the newest frame. The render
+process always reads the newest frame, it never waits for the
+simulation and the simulation never waits for it.
+
+If the render process is slow, the writer may come around the ring and
+write into the slot that is being read ("tearing"). Every slot starts
+and ends with the number of its frame (a seqlock): when the two numbers
+are not the same after the copy, the frame is thrown away and counted.
+
+    frames = SharedFrames(create=True)                # render process, owns the memory
+    ... start the simulation process with frames.name ...
+    writer = SharedFrames(name)                       # simulation process
+    writer.write(records, info=(collisions, food, flags))
+    frame = frames.read()                             # None: nothing new
+    frames.report()                                   # torn, skipped, latency
+    frames.close(); frames.unlink()
+
+The times are time.monotonic(), the same clock in both processes. The
+writer should be a child process (multiprocessing) of the owner, then
+both share one resource tracker and the memory is removed only once.
+"""
+
+import collections
+import struct
+import time
+from multiprocessing import shared_memory
+
+HEADER = struct.Struct("=Q")           # number of the newest complete frame
+LAYOUT = struct.Struct("=II")          # capacity, slots, after HEADER
+SLOT = struct.Struct("=QdI3i")         # frame number, time, records, info
+SLOT_END = struct.Struct("=Q")         # frame number again, after the records
+RECORD = struct.Struct("=IBBhhHb")     # number, kind, image, x, y, angle, layer
+
+Frame = collections.namedtuple("Frame", "number time info records")
+
+
+class SharedFrames():
+    """a ring of frames in shared memory, for one writer and one reader"""
+
+    def __init__(self, name=None, create=False, capacity=4096, slots=2):
+        """capacity: most records in one frame. without create, capacity
+           and slots come from the memory"""
+        self.owner = create
+        if create:
+            size = HEADER.size + LAYOUT.size + slots * (SLOT.size + capacity * RECORD.size + SLOT_END.size)
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.memory.buf[:size] = bytes(size)
+            LAYOUT.pack_into(self.memory.buf, HEADER.size, capacity, slots)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            capacity, slots = LAYOUT.unpack_from(self.memory.buf, HEADER.size)
+        self.buffer = self.memory.buf
+        self.capacity = capacity
+        self.slots = slots
+        self.slotsize = SLOT.size + capacity * RECORD.size + SLOT_END.size
+        self.written = 0        # writer: number of the last frame
+        self.last = 0           # reader: number of the last frame it got
+        self.frames = 0         # reader: frames read
+        self.torn = 0           # reader: frames thrown away, overwritten while copying
+        self.skipped = 0        # reader: frames the reader never saw
+        self.latency = collections.deque(maxlen=120)   # reader: milliseconds from write to read
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def offset(self, number):
+        return HEADER.size + LAYOUT.size + (number % self.slots) * self.slotsize
+
+    def write(self, records, info=(0, 0, 0)):
+        """records: list of (number, kind, image, x, y, angle, layer).
+           more than capacity records are cut off"""
+        records = records[:self.capacity]
+        number = self.written + 1
+        offset = self.offset(number)
+        buffer = self.buffer
+        SLOT_END.pack_into(buffer, offset + self.slotsize - SLOT_END.size, 0)   # not complete
+        position = offset + SLOT.size
+        for record in records:
+            RECORD.pack_into(buffer, position, *record)
+            position += RECORD.size
+        SLOT.pack_into(buffer, offset, number, time.monotonic(), len(records), *info)
+        SLOT_END.pack_into(buffer, offset + self.slotsize - SLOT_END.size, number)
+        HEADER.pack_into(buffer, 0, number)
+        self.written = number
+
+    def read(self):
+        """the newest complete Frame, None if there is no new one (or it
+           was overwritten while it was copied)"""
+        number = HEADER.unpack_from(self.buffer, 0)[0]
+        if number == self.last:
+            return None
+        offset = self.offset(number)
+        data = bytes(self.buffer[offset:offset + self.slotsize])
+        start, written, count, *info = SLOT.unpack_from(data, 0)
+        end = SLOT_END.unpack_from(data, self.slotsize - SLOT_END.size)[0]
+        if start != number or end != number:
+            self.torn += 1
+            return None
+        if self.last:
+            self.skipped += number - self.last - 1
+        self.last = number
+        self.frames += 1
+        self.latency.append((time.monotonic() - written) * 1000)
+        records = list(RECORD.iter_unpack(data[SLOT.size:SLOT.size + count * RECORD.size]))
+        return Frame(number, written, tuple(info), records)
+
+    def report(self):
+        """text lines, for the overlay or the console"""
+        lines = ["frames     {} read, {} skipped, {} torn".format(self.frames, self.skipped, self.torn)]
+        if self.latency:
+            latency = sorted(self.latency)
+            lines.append("latency    {:5.2f} ms (max {:5.2f})".format(latency[len(latency) // 2], latency[-1]))
+        return lines
+
+    def close(self):
+        self.buffer = None
+        self.memory.close()
+
+    def unlink(self):
+        if self.owner:
+            self.memory.unlink()
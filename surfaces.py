@@ -0,0 +1,67 @@
+"""
+pixel formats of sprite images
+
+A blit is only fast if the image has the pixel format of the screen:
+convert() for images without transparency or with a colorkey,
+convert_alpha() for images with per pixel alpha. A colorkey image is
+even faster with RLEACCEL (runs of transparent pixels are skipped).
+Everything else makes pygame convert every pixel again in every blit.
+
+    image = surfaces.prepare(pygame.Surface((10, 10)))   # every sprite image goes through here
+    surfaces.check_group(allgroup, screen)               # debug: warns about slow blits
+
+convert() needs a display mode (pygame.display.set_mode), before that
+prepare() returns the image unchanged.
+"""
+
+import warnings
+
+import pygame
+
+
+class SurfaceWarning(UserWarning):
+    """a blit that has to convert pixel formats"""
+
+
+def problem(surface, target):
+    """why blitting surface onto target is slow, or None if it is fast"""
+    rgb = target.get_masks()[:3]
+    if surface.get_colorkey() is not None and not surface.get_flags() & pygame.RLEACCELOK:
+        return "colorkey without RLEACCEL"
+    if surface.get_flags() & pygame.SRCALPHA:
+        if surface.get_bitsize() != 32 or surface.get_masks()[:3] != rgb:
+            return "alpha pixel format {} {} is not the format of the screen".format(
+                   surface.get_bitsize(), surface.get_masks())
+    elif surface.get_bitsize() != target.get_bitsize() or surface.get_masks()[:3] != rgb:
+        return "pixel format {} {} is not the format of the screen".format(
+               surface.get_bitsize(), surface.get_masks())
+    return None
+
+
+def prepare(surface):
+    """returns surface in the pixel format of the screen.
+       colorkey images get RLEACCEL. surfaces that are already fine
+       are returned without a copy"""
+    screen = pygame.display.get_surface()
+    if screen is None or problem(surface, screen) is None:
+        return surface
+    colorkey = surface.get_colorkey()
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    surface = surface.convert()
+    if colorkey is not None:
+        surface.set_colorkey(colorkey, pygame.RLEACCEL)
+    return surface
+
+
+def check_group(group, target):
+    """debug mode: warns (once for every class and problem) about sprites
+       of group that would not be blitted on target the fast way"""
+    for sprite in group.sprites():
+        image = getattr(sprite, "image", None)
+        if image is None:
+            continue
+        reason = problem(image, target)
+        if reason is not None:
+            # same text -> python shows the warning only once
+            warnings.warn("{}: {}".format(type(sprite).__name__, reason), SurfaceWarning, stacklevel=2)
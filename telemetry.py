@@ -0,0 +1,313 @@
+"""
+telemetry for many cabinets that nobody watches
+
+The game only collects: frame times (one float per frame) and counters.
+Every interval seconds it takes a snapshot (the frame times, the counters
+and a few gauges like sprites per group, asked on the main thread, because
+the sprite groups are not thread safe) and puts it in a queue. A
+background thread does everything slow: sorting for the percentiles,
+formatting, writing the file, sending. If the thread falls behind,
+snapshots are dropped, the game never waits for it.
+
+Two outputs, both optional:
+
+    Prometheus text format, for the textfile collector of node_exporter:
+        fluffball_frame_milliseconds{quantile="0.99"} 35.2
+        fluffball_sprites{group="kittygroup"} 2
+    StatsD over UDP, one datagram holds as many lines as fit:
+        fluffball.frame_ms.p99:35.2|g
+        fluffball.rounds.won:1|c
+
+    telemetry = Telemetry(interval=10, textfile="fluffball.prom", statsd=("127.0.0.1", 8125))
+    telemetry.start()
+    while running:
+        telemetry.frame(milliseconds, gauges)   # gauges: function -> { name: value }
+        telemetry.count("rounds.won")
+    telemetry.close()                           # sends the last snapshot
+
+Listener is a small StatsD stand-in that receives and parses the lines:
+
+    python telemetry.py listen --port 8125
+"""
+
+import math
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:    # windows
+    resource = None
+
+DEFAULT_PORT = 8125
+PACKET_SIZE = 1432     # bytes per datagram, fits in one ethernet frame
+QUANTILES = (0.5, 0.9, 0.99)
+LABELS = {"sprites": "group", "rounds": "outcome"}   # label of "sprites.kittygroup", default "name"
+
+
+def rss():
+    """resident memory of this process in bytes, 0 if unknown.
+       without /proc (not linux) it is the peak, not the current value"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024   # bytes on mac, kB elsewhere
+    return 0
+
+
+def percentile(values, q):
+    """q (0..1) of the sorted list values, nearest rank"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def split(name):
+    """"sprites.kittygroup" -> ("sprites", "kittygroup"), "rss" -> ("rss", None)"""
+    base, _, label = name.partition(".")
+    return base, label or None
+
+
+class Snapshot():
+    """everything of one interval, made on the main thread"""
+    __slots__ = ("time", "seconds", "frames", "counters", "gauges")
+
+    def __init__(self, time, seconds, frames, counters, gauges):
+        self.time = time
+        self.seconds = seconds      # length of the interval
+        self.frames = frames        # frame times in milliseconds, not sorted
+        self.counters = counters    # { name: total since the start }
+        self.gauges = gauges        # { name: value }
+
+
+def prometheus(snapshot, prefix="fluffball"):
+    """the snapshot in the Prometheus text format. names with a dot
+       ("sprites.kittygroup") become one metric with a label"""
+    frames = sorted(snapshot.frames)
+    lines = ["# HELP {}_frame_milliseconds frame times of the last interval".format(prefix),
+             "# TYPE {}_frame_milliseconds summary".format(prefix)]
+    for q in QUANTILES:
+        lines.append('{}_frame_milliseconds{{quantile="{}"}} {:.3f}'.format(prefix, q, percentile(frames, q)))
+    lines.append("{}_frame_milliseconds_sum {:.3f}".format(prefix, sum(frames)))
+    lines.append("{}_frame_milliseconds_count {}".format(prefix, len(frames)))
+    for kind, values in (("gauge", snapshot.gauges), ("counter", snapshot.counters)):
+        done = set()
+        for name in sorted(values):
+            base, label = split(name)
+            metric = "{}_{}{}".format(prefix, base, "_total" if kind == "counter" else "")
+            if metric not in done:
+                done.add(metric)
+                lines.append("# TYPE {} {}".format(metric, kind))
+            if label is None:
+                lines.append("{} {}".format(metric, values[name]))
+            else:
+                lines.append('{}{{{}="{}"}} {}'.format(metric, LABELS.get(base, "name"), label, values[name]))
+    return "\n".join(lines) + "\n"
+
+
+def statsd(snapshot, previous=None, prefix="fluffball"):
+    """the snapshot as StatsD lines. counters are sent as the difference
+       to the previous snapshot, frame times as gauges of the percentiles
+       (30 timings per second per cabinet would be too many packets)"""
+    frames = sorted(snapshot.frames)
+    lines = []
+    if frames:
+        for q in QUANTILES:
+            lines.append("{}.frame_ms.p{}:{:.3f}|g".format(prefix, round(q * 100), percentile(frames, q)))
+        lines.append("{}.frame_ms.max:{:.3f}|g".format(prefix, frames[-1]))
+        lines.append("{}.fps:{:.2f}|g".format(prefix, len(frames) / max(snapshot.seconds, 1e-9)))
+    for name in sorted(snapshot.gauges):
+        lines.append("{}.{}:{}|g".format(prefix, name, snapshot.gauges[name]))
+    before = previous.counters if previous is not None else {}
+    for name in sorted(snapshot.counters):
+        delta = snapshot.counters[name] - before.get(name, 0)
+        if delta:
+            lines.append("{}.{}:{}|c".format(prefix, name, delta))
+    return lines
+
+
+def packets(lines, size=PACKET_SIZE):
+    """lines -> datagrams (bytes) of at most size bytes, lines separated by newline"""
+    packet = b""
+    for line in lines:
+        line = line.encode("ascii")
+        if packet and len(packet) + 1 + len(line) > size:
+            yield packet
+            packet = b""
+        packet = packet + b"\n" + line if packet else line
+    if packet:
+        yield packet
+
+
+def parse(line):
+    """"name:value|type" -> (name, value, type)"""
+    name, _, rest = line.partition(":")
+    value, _, kind = rest.partition("|")
+    return name, float(value), kind.split("|")[0]
+
+
+class Telemetry():
+    """collects on the main thread, exports on a background thread"""
+
+    def __init__(self, interval=10.0, textfile=None, statsd=None, prefix="fluffball", backlog=4):
+        """textfile: path of the .prom file, statsd: (host, port), either can
+           be None. backlog: snapshots waiting for the thread before new ones
+           are dropped"""
+        self.interval = interval
+        self.textfile = textfile
+        self.address = statsd
+        self.prefix = prefix
+        self.snapshots = queue.Queue(maxsize=backlog)
+        self.thread = None
+        self.socket = None
+        self.frames = []
+        self.counters = {}
+        self.gauges = {}     # the last ones, close() has no game to ask any more
+        self.start_time = self.last_flush = time.perf_counter()
+        self.dropped = 0     # snapshots the thread did not take in time
+        self.exported = 0
+        self.errors = 0      # failed writes and sends, they do not stop the game
+        self.last_error = None
+
+    def start(self):
+        if self.thread is None:
+            if self.address is not None:
+                self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.thread = threading.Thread(target=self.work, name="telemetry", daemon=True)
+            self.thread.start()
+        self.start_time = self.last_flush = time.perf_counter()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def frame(self, milliseconds, gauges=None):
+        """once per frame. gauges: function that returns { name: value },
+           it is only called once per interval"""
+        self.frames.append(milliseconds)
+        now = time.perf_counter()
+        if now - self.last_flush >= self.interval:
+            self.flush(gauges, now)
+
+    def flush(self, gauges=None, now=None):
+        """snapshot of everything since the last flush, for the thread"""
+        now = time.perf_counter() if now is None else now
+        values = {"rss_bytes": rss(), "uptime_seconds": round(now - self.start_time, 1)}
+        if gauges is not None:
+            self.gauges = gauges()
+        values.update(self.gauges)
+        snapshot = Snapshot(time.time(), now - self.last_flush, self.frames, dict(self.counters), values)
+        self.frames = []
+        self.last_flush = now
+        try:
+            self.snapshots.put_nowait(snapshot)
+        except queue.Full:
+            self.dropped += 1
+
+    def work(self):
+        previous = None
+        while True:
+            snapshot = self.snapshots.get()
+            if snapshot is None:
+                break
+            self.export(snapshot, previous)
+            previous = snapshot
+
+    def export(self, snapshot, previous=None):
+        try:
+            if self.textfile is not None:
+                # a new file and rename: the collector never reads half a file
+                temp = self.textfile + ".tmp"
+                with open(temp, "w") as prom:
+                    prom.write(prometheus(snapshot, self.prefix))
+                os.replace(temp, self.textfile)
+            if self.socket is not None:
+                for packet in packets(statsd(snapshot, previous, self.prefix)):
+                    self.socket.sendto(packet, self.address)
+            self.exported += 1
+        except OSError as error:
+            self.errors += 1
+            self.last_error = error
+
+    def close(self, timeout=2.0):
+        """exports what is left and stops the thread"""
+        if self.thread is None:
+            return
+        if self.frames:
+            self.flush()
+        try:
+            self.snapshots.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.thread = None
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def report(self):
+        """text lines, for the overlay"""
+        targets = [t for t in (self.textfile, self.address and "{}:{}".format(*self.address)) if t]
+        lines = ["telemetry  " + ", ".join(targets),
+                 "  exported {} dropped {}".format(self.exported, self.dropped)]
+        if self.errors:
+            lines.append("  errors {}: {}".format(self.errors, self.last_error))
+        return lines
+
+
+class Listener():
+    """a StatsD server stand-in: receives datagrams on localhost"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        """port 0: a free port, see self.address"""
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.address = self.socket.getsockname()
+
+    def receive(self, timeout=1.0):
+        """lines of all datagrams that come within timeout seconds after the
+           first one, [] if nothing comes"""
+        lines = []
+        self.socket.settimeout(timeout)
+        while True:
+            try:
+                data = self.socket.recv(65535)
+            except socket.timeout:
+                return lines
+            lines.extend(data.decode("ascii").split("\n"))
+            self.socket.settimeout(0.05)   # the rest of this snapshot
+
+    def metrics(self, timeout=1.0):
+        """{ name: (value, type) } of the received lines"""
+        received = {}
+        for line in self.receive(timeout):
+            name, value, kind = parse(line)
+            received[name] = (value, kind)
+        return received
+
+    def close(self):
+        self.socket.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Fluffball telemetry tools")
+    parser.add_argument("command", choices=["listen"])
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    listener = Listener(port=args.port)
+    print("listening on {}:{}".format(*listener.address))
+    try:
+        while True:
+            for line in listener.receive(timeout=None):
+                name, value, kind = parse(line)
+                print("{:<40}{:>14} {}".format(name, value, kind))
+    except KeyboardInterrupt:
+        listener.close()
@@ -0,0 +1,109 @@
+"""
+scheduler for things that happen later
+
+Instead of asking in every frame "is it time yet?" (or rolling
+random.random() < chance in every frame), a sprite tells the scheduler
+once when something should happen. The scheduler keeps all timers in a
+heap and in every frame only looks at the ones that are due.
+
+    scheduler = Scheduler()
+    timer = scheduler.after(2.5, sprite.kill)           # in 2.5 seconds
+    scheduler.after_random(rate(0.001), kitty.start_glowing)
+    scheduler.cancel(timer)
+    scheduler.advance(seconds)                         # once per frame
+
+A per frame chance p is a random waiting time: after_random draws it
+once from the exponential distribution, so the behaviour is the same as
+rolling the dice in every frame, but it does not depend on the fps.
+"""
+
+import heapq
+import itertools
+import math
+import random
+
+
+def rate(chance, fps=30):
+    """per frame chance (random.random() < chance, fps times per second)
+       -> events per second"""
+    if chance <= 0:
+        return 0.0
+    if chance >= 1:
+        return math.inf
+    return -math.log(1 - chance) * fps
+
+
+class Timer():
+    __slots__ = ("time", "callback", "args", "cancelled")
+
+    def __init__(self, time, callback, args):
+        self.time = time
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class Scheduler():
+    """timers in a heap, with its own clock (seconds of game time)"""
+
+    def __init__(self, rng=random):
+        """rng: where after_random gets its numbers (a random.Random
+           for repeatable games, default the random module)"""
+        self.rng = rng
+        self.now = 0.0
+        self.heap = []                      # (time, counter, Timer)
+        self.counter = itertools.count()    # same time -> first come, first served
+        self.cancelled = 0                  # cancelled timers still in the heap
+
+    def __len__(self):
+        return len(self.heap) - self.cancelled
+
+    def at(self, time, callback, *args):
+        """callback(*args) at time. returns the Timer, for cancel"""
+        timer = Timer(time, callback, args)
+        heapq.heappush(self.heap, (time, next(self.counter), timer))
+        return timer
+
+    def after(self, delay, callback, *args):
+        """callback(*args) in delay seconds"""
+        return self.at(self.now + max(0.0, delay), callback, *args)
+
+    def after_random(self, rate, callback, *args):
+        """callback(*args) after an exponentially distributed delay with
+           rate events per second (see rate()). None if rate is 0"""
+        if rate <= 0:
+            return None
+        if rate == math.inf:
+            return self.after(0.0, callback, *args)
+        return self.after(self.rng.expovariate(rate), callback, *args)
+
+    def cancel(self, timer):
+        if timer is None or timer.cancelled:
+            return
+        timer.cancelled = True
+        self.cancelled += 1
+        # cancelled timers are removed lazily, but not too lazily. in place:
+        # advance may be in the middle of popping this list
+        if self.cancelled > 256 and self.cancelled > len(self.heap) // 2:
+            self.heap[:] = [entry for entry in self.heap if not entry[2].cancelled]
+            heapq.heapify(self.heap)
+            self.cancelled = 0
+
+    def advance(self, seconds):
+        """moves the clock forward and calls every timer that is due.
+           a callback may start new timers, those that are due come
+           in this call too"""
+        self.now += seconds
+        heap = self.heap
+        while heap and heap[0][0] <= self.now:
+            timer = heapq.heappop(heap)[2]
+            if timer.cancelled:
+                self.cancelled -= 1
+                continue
+            timer.cancelled = True   # done, cancel() does nothing anymore
+            timer.callback(*timer.args)
+
+    def clear(self):
+        """forgets all timers, the clock keeps running"""
+        self.heap.clear()    # the same list, see cancel
+        self.cancelled = 0